@@ -11,6 +11,9 @@ from src.models.base import Base
 from src.models.user import User
 from src.models.hr import HRContact
 from src.models.resume import Resume
+from src.models.idempotency import IdempotencyKey
+from src.models.generated_email import GeneratedEmail
+from src.models.contact_term import ContactTerm
 from src.config import config as app_config
 
 # this is the Alembic Config object, which provides
@@ -0,0 +1,33 @@
+"""drop_generated_email_hnsw_index
+
+Revision ID: 4b9e1d7c6a20
+Revises: c7a3f9e2d184
+Create Date: 2026-10-19 09:14:52.806317
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4b9e1d7c6a20'
+down_revision: Union[str, None] = 'c7a3f9e2d184'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # The semantic cache only ever searches one user's emails. A global HNSW
+    # scan returns its ef_search nearest rows across all users before the
+    # user and version filters apply, so it misses most users' emails; the
+    # per-user set is small enough to scan exactly through ix_generated_emails_user_id
+    op.execute('DROP INDEX IF EXISTS idx_generated_emails_job_embedding')
+
+
+def downgrade() -> None:
+    op.execute("""
+        CREATE INDEX idx_generated_emails_job_embedding
+        ON generated_emails
+        USING hnsw (job_embedding vector_cosine_ops)
+    """)
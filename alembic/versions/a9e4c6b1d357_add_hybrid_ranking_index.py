@@ -0,0 +1,58 @@
+"""add_hybrid_ranking_index
+
+Revision ID: a9e4c6b1d357
+Revises: f3c7d2e8a416
+Create Date: 2026-10-18 15:32:08.271946
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+from pgvector.sqlalchemy import Vector
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a9e4c6b1d357'
+down_revision: Union[str, None] = 'f3c7d2e8a416'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('hr_contacts', sa.Column('doc_length', sa.Integer(), nullable=True))
+    op.add_column('hr_contacts', sa.Column('post_embedding', Vector(1536), nullable=True))
+    op.create_table(
+        'contact_terms',
+        sa.Column('user_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('term', sa.String(), nullable=False),
+        sa.Column('hr_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('tf', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+        sa.ForeignKeyConstraint(['hr_id'], ['hr_contacts.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('user_id', 'term', 'hr_id')
+    )
+    
+    # Backfill postings and document lengths for existing contacts
+    op.execute("""
+        INSERT INTO contact_terms (user_id, term, hr_id, tf)
+        SELECT c.user_id, t.lexeme, c.id, array_length(t.positions, 1)
+        FROM hr_contacts c,
+             unnest(to_tsvector('english',
+                 coalesce(c.post_preview, '') || ' ' ||
+                 CASE WHEN jsonb_typeof(c.matched_keywords) = 'array'
+                      THEN array_to_string(ARRAY(SELECT jsonb_array_elements_text(c.matched_keywords)), ' ')
+                      ELSE '' END
+             )) AS t
+    """)
+    op.execute("""
+        UPDATE hr_contacts
+        SET doc_length = coalesce((SELECT sum(tf) FROM contact_terms WHERE hr_id = hr_contacts.id), 0)
+    """)
+
+
+def downgrade() -> None:
+    op.drop_table('contact_terms')
+    op.drop_column('hr_contacts', 'post_embedding')
+    op.drop_column('hr_contacts', 'doc_length')
@@ -0,0 +1,38 @@
+"""resume_embedding_hnsw_index
+
+Revision ID: b2d8e5f4c913
+Revises: a9e4c6b1d357
+Create Date: 2026-10-18 16:48:55.640218
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b2d8e5f4c913'
+down_revision: Union[str, None] = 'a9e4c6b1d357'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # The ivfflat index was built on an empty table, so its lists never
+    # reflected the data; HNSW needs no training and keeps recall as it grows
+    op.execute('DROP INDEX IF EXISTS idx_resumes_embedding')
+    op.execute("""
+        CREATE INDEX idx_resumes_embedding
+        ON resumes
+        USING hnsw (resume_embedding vector_cosine_ops)
+    """)
+
+
+def downgrade() -> None:
+    op.execute('DROP INDEX IF EXISTS idx_resumes_embedding')
+    op.execute("""
+        CREATE INDEX idx_resumes_embedding
+        ON resumes
+        USING ivfflat (resume_embedding vector_cosine_ops)
+        WITH (lists = 100)
+    """)
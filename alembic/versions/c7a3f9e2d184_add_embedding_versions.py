@@ -0,0 +1,43 @@
+"""add_embedding_versions
+
+Revision ID: c7a3f9e2d184
+Revises: b2d8e5f4c913
+Create Date: 2026-10-18 18:05:41.337902
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c7a3f9e2d184'
+down_revision: Union[str, None] = 'b2d8e5f4c913'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Table -> embedding column
+EMBEDDING_COLUMNS = {
+    'resumes': 'resume_embedding',
+    'hr_contacts': 'post_embedding',
+    'generated_emails': 'job_embedding',
+}
+
+
+def upgrade() -> None:
+    for table, column in EMBEDDING_COLUMNS.items():
+        op.add_column(table, sa.Column('embedding_model', sa.String(64), nullable=True))
+        op.add_column(table, sa.Column('embedding_version', sa.Integer(), nullable=True))
+        # Every embedding stored so far came from the original model
+        op.execute(f"""
+            UPDATE {table}
+            SET embedding_model = 'text-embedding-3-small', embedding_version = 1
+            WHERE {column} IS NOT NULL
+        """)
+
+
+def downgrade() -> None:
+    for table in EMBEDDING_COLUMNS:
+        op.drop_column(table, 'embedding_version')
+        op.drop_column(table, 'embedding_model')
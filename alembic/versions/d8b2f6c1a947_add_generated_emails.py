@@ -0,0 +1,52 @@
+"""add_generated_emails
+
+Revision ID: d8b2f6c1a947
+Revises: c41e7a9d2b58
+Create Date: 2026-10-18 11:02:17.548392
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+from pgvector.sqlalchemy import Vector
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd8b2f6c1a947'
+down_revision: Union[str, None] = 'c41e7a9d2b58'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'generated_emails',
+        sa.Column('id', postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column('user_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('hr_id', postgresql.UUID(as_uuid=True), nullable=True),
+        sa.Column('subject', sa.Text(), nullable=False),
+        sa.Column('body', sa.Text(), nullable=False),
+        sa.Column('hr_name', sa.String(), nullable=True),
+        sa.Column('company', sa.String(), nullable=True),
+        sa.Column('job_embedding', Vector(1536), nullable=True),
+        sa.Column('source', sa.String(length=16), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+        sa.ForeignKeyConstraint(['hr_id'], ['hr_contacts.id'], ondelete='SET NULL')
+    )
+    op.create_index('ix_generated_emails_user_id', 'generated_emails', ['user_id'])
+    
+    # ANN index for the semantic cache lookup (nearest job post per user)
+    op.execute("""
+        CREATE INDEX idx_generated_emails_job_embedding
+        ON generated_emails
+        USING hnsw (job_embedding vector_cosine_ops)
+    """)
+
+
+def downgrade() -> None:
+    op.execute('DROP INDEX IF EXISTS idx_generated_emails_job_embedding')
+    op.drop_index('ix_generated_emails_user_id', table_name='generated_emails')
+    op.drop_table('generated_emails')
@@ -0,0 +1,45 @@
+"""add_hr_contact_search_vector
+
+Revision ID: e5f1a3b9c720
+Revises: d8b2f6c1a947
+Create Date: 2026-10-18 13:21:40.117305
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5f1a3b9c720'
+down_revision: Union[str, None] = 'd8b2f6c1a947'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('hr_contacts', sa.Column(
+        'search_vector',
+        postgresql.TSVECTOR(),
+        sa.Computed(
+            "setweight(to_tsvector('english', coalesce(name, '')), 'A') || "
+            "setweight(to_tsvector('english', coalesce(company, '')), 'A') || "
+            "setweight(to_tsvector('english', coalesce(title, '')), 'B') || "
+            "setweight(to_tsvector('english', coalesce(post_preview, '')), 'C')",
+            persisted=True
+        ),
+        nullable=True
+    ))
+    op.create_index(
+        'ix_hr_contacts_search_vector',
+        'hr_contacts',
+        ['search_vector'],
+        postgresql_using='gin'
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_hr_contacts_search_vector', table_name='hr_contacts')
+    op.drop_column('hr_contacts', 'search_vector')
@@ -0,0 +1,50 @@
+"""matched_keywords_jsonb
+
+Revision ID: f3c7d2e8a416
+Revises: e5f1a3b9c720
+Create Date: 2026-10-18 14:05:12.903871
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3c7d2e8a416'
+down_revision: Union[str, None] = 'e5f1a3b9c720'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.alter_column(
+        'hr_contacts',
+        'matched_keywords',
+        existing_type=sa.JSON(),
+        type_=postgresql.JSONB(),
+        existing_nullable=True,
+        postgresql_using='matched_keywords::jsonb'
+    )
+    # jsonb_path_ops only supports containment (@>), which is all the keyword filters use
+    op.create_index(
+        'ix_hr_contacts_matched_keywords',
+        'hr_contacts',
+        ['matched_keywords'],
+        postgresql_using='gin',
+        postgresql_ops={'matched_keywords': 'jsonb_path_ops'}
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_hr_contacts_matched_keywords', table_name='hr_contacts')
+    op.alter_column(
+        'hr_contacts',
+        'matched_keywords',
+        existing_type=postgresql.JSONB(),
+        type_=sa.JSON(),
+        existing_nullable=True,
+        postgresql_using='matched_keywords::json'
+    )
@@ -0,0 +1 @@
+"""Benchmark and load-test suite for the Job Email Generator API."""
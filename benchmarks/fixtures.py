@@ -0,0 +1,97 @@
+"""Sample resume files and HR contact payloads for benchmarks."""
+import io
+from pathlib import Path
+from typing import Dict, List
+
+SAMPLE_RESUME_PATH = Path(__file__).resolve().parent.parent / "sample_resume.txt"
+
+def resume_text() -> str:
+    """Resume text shared by every sample file format."""
+    return SAMPLE_RESUME_PATH.read_text(encoding="utf-8")
+
+def _pdf_escape(line: str) -> str:
+    line = line.encode("latin-1", "replace").decode("latin-1")
+    return line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+def make_pdf(text: str) -> bytes:
+    """Build a minimal single-font PDF with one text line per resume line."""
+    lines = [line for line in text.splitlines() if line.strip()]
+    content = ["BT", "/F1 10 Tf", "12 TL", "40 800 Td"]
+    for line in lines:
+        content.append(f"({_pdf_escape(line)}) Tj T*")
+    content.append("ET")
+    stream = "\n".join(content).encode("latin-1")
+
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 1000] "
+        b"/Contents 4 0 R /Resources << /Font << /F1 5 0 R >> >> >>",
+        b"<< /Length " + str(len(stream)).encode() + b" >>\nstream\n" + stream + b"\nendstream",
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(out.tell())
+        out.write(f"{number} 0 obj\n".encode() + body + b"\nendobj\n")
+    xref_offset = out.tell()
+    out.write(f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode())
+    for offset in offsets:
+        out.write(f"{offset:010d} 00000 n \n".encode())
+    out.write(
+        f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n".encode()
+    )
+    return out.getvalue()
+
+def make_docx(text: str) -> bytes:
+    """Build a DOCX with one paragraph per resume line."""
+    from docx import Document
+
+    document = Document()
+    for line in text.splitlines():
+        if line.strip():
+            document.add_paragraph(line)
+    out = io.BytesIO()
+    document.save(out)
+    return out.getvalue()
+
+def resume_files() -> Dict[str, tuple]:
+    """
+    Sample uploads keyed by format.
+
+    Returns:
+        Mapping of format name to (filename, content, content type)
+    """
+    text = resume_text()
+    return {
+        "txt": ("resume.txt", text.encode("utf-8"), "text/plain"),
+        "pdf": ("resume.pdf", make_pdf(text), "application/pdf"),
+        "docx": (
+            "resume.docx",
+            make_docx(text),
+            "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+        ),
+    }
+
+def hr_contacts(count: int, offset: int = 0) -> List[dict]:
+    """Generate scraper-shaped HR contact payloads."""
+    return [
+        {
+            "name": f"Recruiter {offset + i}",
+            "title": "Senior Technical Recruiter",
+            "company": f"Company {(offset + i) % 50}",
+            "profileUrl": f"https://www.linkedin.com/in/recruiter-{offset + i}",
+            "postUrl": f"https://www.linkedin.com/posts/recruiter-{offset + i}",
+            "email": f"recruiter{offset + i}@example.com",
+            "jobLink": f"https://jobs.example.com/{offset + i}",
+            "postPreview": (
+                "We're hiring a Backend Engineer with Python, FastAPI and PostgreSQL "
+                f"experience to build scalable APIs. Req #{offset + i}."
+            ),
+            "matchedKeywords": ["python", "fastapi", "postgresql"],
+            "extractedAt": "2026-01-15T10:00:00",
+        }
+        for i in range(count)
+    ]
@@ -0,0 +1,345 @@
+"""
+Benchmark runner for the Job Email Generator API.
+
+Starts the API (uvicorn subprocess) against a local PostgreSQL database and
+the fake OpenAI backend from src.lib.fake_openai (served over HTTP by default,
+or in-process with --openai-mode inprocess), drives every endpoint at a
+configurable concurrency, and records throughput and latency percentiles.
+
+Usage:
+    python -m benchmarks.run --database-url postgresql://localhost/job_email_bench
+    python -m benchmarks.run --base-url http://localhost:8000 --concurrency 16
+    python -m benchmarks.run --update-baseline
+"""
+import argparse
+import json
+import math
+import os
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import requests
+
+from benchmarks import fixtures
+from src.lib.fake_openai import FakeOpenAIBackend, start_http_server
+
+ROOT = Path(__file__).resolve().parent.parent
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+BASELINE_PATH = Path(__file__).resolve().parent / "baseline.json"
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(math.ceil(pct / 100.0 * len(sorted_values)) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+def run_scenario(
+    name: str,
+    request_fn: Callable[[requests.Session, int], requests.Response],
+    total: int,
+    concurrency: int
+) -> Dict:
+    """
+    Issue ``total`` requests with ``concurrency`` workers and summarise them.
+
+    ``request_fn`` receives a per-worker session and the request index.
+    """
+    latencies: List[float] = []
+    errors: Dict[str, int] = {}
+    lock = threading.Lock()
+    local = threading.local()
+
+    def one(index: int) -> None:
+        session = getattr(local, "session", None)
+        if session is None:
+            session = local.session = requests.Session()
+        start = time.perf_counter()
+        error = None
+        try:
+            response = request_fn(session, index)
+            elapsed = time.perf_counter() - start
+            if response.status_code >= 400:
+                error = str(response.status_code)
+        except requests.RequestException as e:
+            error = type(e).__name__
+        with lock:
+            if error:
+                errors[error] = errors.get(error, 0) + 1
+            else:
+                latencies.append(elapsed)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(total)))
+    wall = time.perf_counter() - started
+
+    latencies.sort()
+    summary = {
+        "requests": total,
+        "concurrency": concurrency,
+        "succeeded": len(latencies),
+        "errors": errors,
+        "wall_seconds": round(wall, 4),
+        "throughput_rps": round(len(latencies) / wall, 2) if wall else 0.0,
+        "latency_ms": {
+            "mean": round(sum(latencies) / len(latencies) * 1000, 2) if latencies else 0.0,
+            "p50": round(percentile(latencies, 50) * 1000, 2),
+            "p95": round(percentile(latencies, 95) * 1000, 2),
+            "p99": round(percentile(latencies, 99) * 1000, 2),
+            "max": round(latencies[-1] * 1000, 2) if latencies else 0.0,
+        },
+    }
+    print(
+        f"  {name:<28} {summary['throughput_rps']:>8.1f} rps  "
+        f"p50 {summary['latency_ms']['p50']:>8.1f} ms  "
+        f"p95 {summary['latency_ms']['p95']:>8.1f} ms  "
+        f"p99 {summary['latency_ms']['p99']:>8.1f} ms  "
+        f"errors {sum(errors.values())}"
+    )
+    return summary
+
+def _register(base_url: str, session: requests.Session, prefix: str) -> str:
+    response = session.post(f"{base_url}/register", json={"username": f"{prefix}-{uuid.uuid4().hex[:12]}"})
+    response.raise_for_status()
+    return response.json()["user_id"]
+
+def run_suite(base_url: str, concurrency: int, requests_per_scenario: int, contacts_per_batch: int) -> Dict:
+    """Run every endpoint scenario and return results keyed by scenario name."""
+    setup = requests.Session()
+    run_id = uuid.uuid4().hex[:8]
+    results: Dict[str, Dict] = {}
+
+    # Fixtures shared by the scenarios below
+    bench_user_id = _register(base_url, setup, f"bench-{run_id}")
+    files = fixtures.resume_files()
+    filename, content, content_type = files["txt"]
+    setup.post(
+        f"{base_url}/upload-resume",
+        data={"user_id": bench_user_id},
+        files={"file": (filename, content, content_type)}
+    ).raise_for_status()
+    created = setup.post(
+        f"{base_url}/hr-contacts",
+        json={"user_id": bench_user_id, "hr_contacts": fixtures.hr_contacts(max(concurrency, 10))}
+    )
+    created.raise_for_status()
+    hr_ids = created.json()["hr_ids"]
+
+    print(f"Running {requests_per_scenario} requests per scenario at concurrency {concurrency}")
+
+    results["register"] = run_scenario(
+        "POST /register",
+        lambda s, i: s.post(f"{base_url}/register", json={"username": f"bench-{run_id}-{i}"}),
+        requests_per_scenario,
+        concurrency
+    )
+
+    for fmt, (filename, content, content_type) in files.items():
+        results[f"upload_resume_{fmt}"] = run_scenario(
+            f"POST /upload-resume ({fmt})",
+            lambda s, i, f=filename, c=content, t=content_type: s.post(
+                f"{base_url}/upload-resume",
+                data={"user_id": bench_user_id},
+                files={"file": (f, c, t)}
+            ),
+            requests_per_scenario,
+            concurrency
+        )
+
+    results["hr_contacts_bulk_create"] = run_scenario(
+        f"POST /hr-contacts (x{contacts_per_batch})",
+        lambda s, i: s.post(
+            f"{base_url}/hr-contacts",
+            json={
+                "user_id": bench_user_id,
+                "hr_contacts": fixtures.hr_contacts(contacts_per_batch, offset=i * contacts_per_batch)
+            }
+        ),
+        requests_per_scenario,
+        concurrency
+    )
+
+    results["hr_contacts_list"] = run_scenario(
+        "GET /hr-contacts",
+        lambda s, i: s.get(f"{base_url}/hr-contacts", params={"user_id": bench_user_id, "limit": 100}),
+        requests_per_scenario,
+        concurrency
+    )
+
+    results["gen_email"] = run_scenario(
+        "POST /gen-email",
+        lambda s, i: s.post(
+            f"{base_url}/gen-email",
+            json={"user_id": bench_user_id, "hr_id": hr_ids[i % len(hr_ids)]}
+        ),
+        requests_per_scenario,
+        concurrency
+    )
+    return results
+
+def compare_to_baseline(results: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """
+    Compare a run against the baseline.
+
+    A scenario regresses when p95 or p99 latency grows, or throughput drops,
+    by more than ``tolerance`` (a fraction, e.g. 0.2 for 20%).
+
+    Returns:
+        Human-readable regression messages (empty when there are none)
+    """
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if not previous:
+            continue
+        for pct in ("p95", "p99"):
+            before = previous["latency_ms"][pct]
+            after = current["latency_ms"][pct]
+            if before and after > before * (1 + tolerance):
+                regressions.append(f"{name}: {pct} {before:.1f} ms -> {after:.1f} ms")
+        before_rps = previous["throughput_rps"]
+        after_rps = current["throughput_rps"]
+        if before_rps and after_rps < before_rps * (1 - tolerance):
+            regressions.append(f"{name}: throughput {before_rps:.1f} -> {after_rps:.1f} rps")
+        if sum(current["errors"].values()) > sum(previous["errors"].values()):
+            regressions.append(f"{name}: errors {previous['errors']} -> {current['errors']}")
+    return regressions
+
+def _wait_for_server(base_url: str, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if requests.get(f"{base_url}/", timeout=1).status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.25)
+    raise RuntimeError(f"API did not become ready at {base_url}")
+
+def _start_api(database_url: str, openai_env: Dict[str, str], port: int, migrate: bool) -> subprocess.Popen:
+    env = dict(os.environ)
+    env.update({
+        "DATABASE_URL": database_url,
+        "OPENAI_API_KEY": env.get("OPENAI_API_KEY") or "sk-benchmark",
+    })
+    env.update(openai_env)
+    if migrate:
+        subprocess.run([sys.executable, "-m", "alembic", "upgrade", "head"], cwd=ROOT, env=env, check=True)
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "src.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT,
+        env=env
+    )
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the Job Email Generator API")
+    parser.add_argument("--base-url", help="Benchmark an already running API instead of starting one")
+    parser.add_argument(
+        "--database-url",
+        default=os.getenv("BENCH_DATABASE_URL") or os.getenv("DATABASE_URL"),
+        help="Local PostgreSQL used when starting the API (default: BENCH_DATABASE_URL or DATABASE_URL)"
+    )
+    parser.add_argument("--port", type=int, default=8765, help="Port for the API started by the runner")
+    parser.add_argument("--no-migrate", action="store_true", help="Skip 'alembic upgrade head' before starting")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=200, help="Requests per scenario")
+    parser.add_argument("--contacts-per-batch", type=int, default=25)
+    parser.add_argument(
+        "--openai-mode",
+        choices=("http", "inprocess"),
+        default="http",
+        help="Serve the fake OpenAI backend over HTTP (exercises the real SDK client) or in-process"
+    )
+    parser.add_argument("--openai-latency-ms", type=float, default=0.0, help="Latency injected by the fake OpenAI backend")
+    parser.add_argument("--openai-jitter-ms", type=float, default=0.0, help="Uniform +/- jitter on the injected latency")
+    parser.add_argument("--openai-error-rate", type=float, default=0.0, help="Fraction of fake OpenAI calls that fail")
+    parser.add_argument("--output", help="Result file (default: benchmarks/results/<timestamp>.json)")
+    parser.add_argument("--baseline", default=str(BASELINE_PATH))
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed regression as a fraction")
+    parser.add_argument("--update-baseline", action="store_true", help="Store this run as the new baseline")
+    args = parser.parse_args(argv)
+
+    fake_openai = None
+    api_process = None
+    base_url = args.base_url
+    try:
+        if not base_url:
+            if not args.database_url:
+                parser.error("--database-url (or BENCH_DATABASE_URL) is required to start the API")
+            if args.openai_mode == "http":
+                fake_openai = start_http_server(FakeOpenAIBackend(
+                    latency_ms=args.openai_latency_ms,
+                    jitter_ms=args.openai_jitter_ms,
+                    error_rate=args.openai_error_rate,
+                ))
+                openai_env = {
+                    "OPENAI_PROVIDER": "openai",
+                    "OPENAI_BASE_URL": f"http://127.0.0.1:{fake_openai.server_port}/v1",
+                }
+            else:
+                openai_env = {
+                    "OPENAI_PROVIDER": "fake",
+                    "FAKE_OPENAI_LATENCY_MS": str(args.openai_latency_ms),
+                    "FAKE_OPENAI_JITTER_MS": str(args.openai_jitter_ms),
+                    "FAKE_OPENAI_ERROR_RATE": str(args.openai_error_rate),
+                }
+            api_process = _start_api(args.database_url, openai_env, args.port, not args.no_migrate)
+            base_url = f"http://127.0.0.1:{args.port}"
+        _wait_for_server(base_url)
+        results = run_suite(base_url, args.concurrency, args.requests, args.contacts_per_batch)
+    finally:
+        if api_process is not None:
+            api_process.terminate()
+            api_process.wait(timeout=10)
+        if fake_openai is not None:
+            fake_openai.shutdown()
+
+    report = {
+        "timestamp": datetime.utcnow().isoformat() + "Z",
+        "config": {
+            "concurrency": args.concurrency,
+            "requests_per_scenario": args.requests,
+            "contacts_per_batch": args.contacts_per_batch,
+            "openai_mode": args.openai_mode,
+            "openai_latency_ms": args.openai_latency_ms,
+            "openai_jitter_ms": args.openai_jitter_ms,
+            "openai_error_rate": args.openai_error_rate,
+        },
+        "results": results,
+    }
+    output = Path(args.output) if args.output else RESULTS_DIR / f"{datetime.utcnow():%Y%m%dT%H%M%S}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2))
+    print(f"Results written to {output}")
+
+    baseline_path = Path(args.baseline)
+    if args.update_baseline:
+        baseline_path.write_text(json.dumps(report, indent=2))
+        print(f"Baseline updated: {baseline_path}")
+        return 0
+    if not baseline_path.exists():
+        print(f"No baseline at {baseline_path}; run with --update-baseline to create one")
+        return 0
+
+    baseline = json.loads(baseline_path.read_text())
+    if baseline.get("config") != report["config"]:
+        print("Warning: baseline was recorded with a different configuration")
+    regressions = compare_to_baseline(results, baseline["results"], args.tolerance)
+    if regressions:
+        print("Regressions against baseline:")
+        for message in regressions:
+            print(f"  - {message}")
+        return 1
+    print("No regressions against baseline")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
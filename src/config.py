@@ -4,29 +4,159 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
+def _env_bool(name: str, default: bool) -> bool:
+    """Read a boolean flag from the environment."""
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
 class Config:
     """Application configuration."""
     
     # Database
     DATABASE_URL = os.getenv("DATABASE_URL")
     
+    # Database connection pool
+    DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+    DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+    DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))  # seconds to wait for a connection
+    DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))  # seconds, -1 disables recycling
+    DB_POOL_PRE_PING = _env_bool("DB_POOL_PRE_PING", True)
+    DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "30000"))  # 0 disables
+    # Set when connecting through PgBouncer in transaction pooling mode: the app
+    # stops pooling itself and only uses transaction-scoped session settings.
+    DB_PGBOUNCER_TRANSACTION_MODE = _env_bool("DB_PGBOUNCER_TRANSACTION_MODE", False)
+    
     # OpenAI
     OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+    OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL")  # None uses the public API
+    OPENAI_PROVIDER = os.getenv("OPENAI_PROVIDER", "openai")  # openai | fake
+    
+    # OpenAI client-side rate limiting ("model:rpm:tpm" entries, comma separated)
+    OPENAI_RATE_LIMITS = os.getenv(
+        "OPENAI_RATE_LIMITS",
+        "gpt-4o-mini:500:200000,text-embedding-3-small:3000:1000000"
+    )
+    OPENAI_DEFAULT_RPM = int(os.getenv("OPENAI_DEFAULT_RPM", "500"))
+    OPENAI_DEFAULT_TPM = int(os.getenv("OPENAI_DEFAULT_TPM", "200000"))
+    OPENAI_MAX_QUEUE_WAIT_S = float(os.getenv("OPENAI_MAX_QUEUE_WAIT_S", "30"))
+    OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "4"))
+    OPENAI_BACKOFF_BASE_S = float(os.getenv("OPENAI_BACKOFF_BASE_S", "0.5"))
+    OPENAI_BACKOFF_MAX_S = float(os.getenv("OPENAI_BACKOFF_MAX_S", "20"))
+    
+    # Hedged chat completions: a slow call is duplicated to the secondary
+    # endpoint (or the primary again) after the rolling latency percentile
+    OPENAI_HEDGE_ENABLED = _env_bool("OPENAI_HEDGE_ENABLED", False)
+    OPENAI_HEDGE_PERCENTILE = float(os.getenv("OPENAI_HEDGE_PERCENTILE", "90"))
+    OPENAI_HEDGE_INITIAL_DELAY_MS = float(os.getenv("OPENAI_HEDGE_INITIAL_DELAY_MS", "8000"))
+    OPENAI_HEDGE_MIN_DELAY_MS = float(os.getenv("OPENAI_HEDGE_MIN_DELAY_MS", "1000"))
+    OPENAI_SECONDARY_BASE_URL = os.getenv("OPENAI_SECONDARY_BASE_URL")
+    OPENAI_SECONDARY_API_KEY = os.getenv("OPENAI_SECONDARY_API_KEY")  # defaults to OPENAI_API_KEY
+    
+    # Circuit breakers (OpenAI calls and database session acquisition)
+    CIRCUIT_WINDOW_S = float(os.getenv("CIRCUIT_WINDOW_S", "30"))
+    CIRCUIT_MIN_CALLS = int(os.getenv("CIRCUIT_MIN_CALLS", "20"))
+    CIRCUIT_FAILURE_RATE = float(os.getenv("CIRCUIT_FAILURE_RATE", "0.5"))
+    CIRCUIT_SLOW_CALL_RATE = float(os.getenv("CIRCUIT_SLOW_CALL_RATE", "0.8"))
+    CIRCUIT_OPEN_S = float(os.getenv("CIRCUIT_OPEN_S", "30"))
+    CIRCUIT_HALF_OPEN_CALLS = int(os.getenv("CIRCUIT_HALF_OPEN_CALLS", "5"))
+    CIRCUIT_OPENAI_SLOW_CALL_S = float(os.getenv("CIRCUIT_OPENAI_SLOW_CALL_S", "30"))
+    CIRCUIT_DB_SLOW_CALL_S = float(os.getenv("CIRCUIT_DB_SLOW_CALL_S", "5"))
+    
+    # Bulkheads ("class:concurrency:queue:queue_timeout_ms", comma separated)
+    BULKHEADS = os.getenv("BULKHEADS", "llm:8:32:10000,parse:4:16:5000,db_read:16:64:2000")
+    BULKHEAD_RESERVED_THREADS = int(os.getenv("BULKHEAD_RESERVED_THREADS", "10"))
+    
+    # Request deadlines ("/route:timeout_ms" overrides, comma separated; 0 disables).
+    # Clients may send X-Request-Timeout-Ms, capped at REQUEST_TIMEOUT_MAX_MS.
+    REQUEST_TIMEOUT_MS = float(os.getenv("REQUEST_TIMEOUT_MS", "30000"))
+    REQUEST_TIMEOUTS = os.getenv("REQUEST_TIMEOUTS", "/gen-email:60000,/upload-resume:60000,/hr-contacts/stream:120000")
+    REQUEST_TIMEOUT_MAX_MS = float(os.getenv("REQUEST_TIMEOUT_MAX_MS", "120000"))
+    
+    # Idempotency-Key support for retried POST requests
+    IDEMPOTENT_ROUTES = os.getenv("IDEMPOTENT_ROUTES", "/gen-email,/hr-contacts,/upload-resume")
+    IDEMPOTENCY_TTL_S = int(os.getenv("IDEMPOTENCY_TTL_S", "86400"))  # how long responses replay
+    IDEMPOTENCY_LOCK_TIMEOUT_S = int(os.getenv("IDEMPOTENCY_LOCK_TIMEOUT_S", "300"))  # abandoned in-flight claims
+    IDEMPOTENCY_WAIT_S = float(os.getenv("IDEMPOTENCY_WAIT_S", "30"))  # duplicate waits for the original
+    IDEMPOTENCY_SWEEP_INTERVAL_S = float(os.getenv("IDEMPOTENCY_SWEEP_INTERVAL_S", "300"))
+    
+    # Fake OpenAI backend (OPENAI_PROVIDER=fake or python -m src.lib.fake_openai)
+    FAKE_OPENAI_LATENCY_MS = float(os.getenv("FAKE_OPENAI_LATENCY_MS", "0"))
+    FAKE_OPENAI_JITTER_MS = float(os.getenv("FAKE_OPENAI_JITTER_MS", "0"))
+    FAKE_OPENAI_ERROR_RATE = float(os.getenv("FAKE_OPENAI_ERROR_RATE", "0"))
+    FAKE_OPENAI_ERROR_STATUS = int(os.getenv("FAKE_OPENAI_ERROR_STATUS", "500"))
+    FAKE_OPENAI_SEED = int(os.getenv("FAKE_OPENAI_SEED", "0"))
     
     # OpenAI Models
-    EMBEDDING_MODEL = "text-embedding-3-small"
+    EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "text-embedding-3-small")
     CHAT_MODEL = "gpt-4o-mini"
     
     # Vector embedding dimensions
     EMBEDDING_DIMENSIONS = 1536  # for text-embedding-3-small
     
+    # Semantic email cache: reuse an email when a job post is this similar (cosine) to an earlier one
+    SEMANTIC_CACHE_ENABLED = _env_bool("SEMANTIC_CACHE_ENABLED", True)
+    SEMANTIC_CACHE_MIN_SIMILARITY = float(os.getenv("SEMANTIC_CACHE_MIN_SIMILARITY", "0.95"))
+    
+    # Hybrid contact ranking: BM25 over post text and keywords fused with resume cosine similarity
+    HYBRID_LEXICAL_WEIGHT = float(os.getenv("HYBRID_LEXICAL_WEIGHT", "0.4"))
+    HYBRID_VECTOR_WEIGHT = float(os.getenv("HYBRID_VECTOR_WEIGHT", "0.6"))
+    BM25_K1 = float(os.getenv("BM25_K1", "1.2"))
+    BM25_B = float(os.getenv("BM25_B", "0.75"))
+    
+    # Candidate matching (POST /match/candidates): HNSW candidate pool = page end x rerank factor
+    MATCH_RERANK_FACTOR = int(os.getenv("MATCH_RERANK_FACTOR", "4"))
+    MATCH_EF_SEARCH = int(os.getenv("MATCH_EF_SEARCH", "100"))
+    
+    # In-memory contact scoring: per-user embedding matrices kept in an LRU cache of this size
+    CONTACT_MATRIX_CACHE_MB = float(os.getenv("CONTACT_MATRIX_CACHE_MB", "256"))
+    
+    # Contact export (GET /hr-contacts/export): rows per server-side cursor fetch and per streamed write
+    EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+    
+    # Streaming contact ingest (POST /hr-contacts/stream): NDJSON lines per COPY batch,
+    # longest accepted line, and failed lines listed in the response
+    STREAM_INGEST_BATCH_SIZE = int(os.getenv("STREAM_INGEST_BATCH_SIZE", "1000"))
+    STREAM_INGEST_MAX_LINE_BYTES = int(os.getenv("STREAM_INGEST_MAX_LINE_BYTES", "1000000"))
+    STREAM_INGEST_MAX_ERRORS = int(os.getenv("STREAM_INGEST_MAX_ERRORS", "1000"))
+    
+    # Embedding versions: bump EMBEDDING_VERSION when the embedded text changes without a model change.
+    # While re-embedding, EMBEDDING_PREVIOUS_MODEL/VERSION name the old version so queries still match its rows
+    EMBEDDING_VERSION = int(os.getenv("EMBEDDING_VERSION", "1"))
+    EMBEDDING_PREVIOUS_MODEL = os.getenv("EMBEDDING_PREVIOUS_MODEL", "")
+    EMBEDDING_PREVIOUS_VERSION = int(os.getenv("EMBEDDING_PREVIOUS_VERSION", "1"))
+    REEMBED_BATCH_SIZE = int(os.getenv("REEMBED_BATCH_SIZE", "256"))
+    REEMBED_TOKENS_PER_MINUTE = int(os.getenv("REEMBED_TOKENS_PER_MINUTE", "200000"))
+    
+    # Embedding micro-batching (EMBEDDING_BATCH_WAIT_MS=0 sends every text on its own)
+    EMBEDDING_BATCH_WAIT_MS = float(os.getenv("EMBEDDING_BATCH_WAIT_MS", "10"))
+    EMBEDDING_BATCH_MAX_SIZE = int(os.getenv("EMBEDDING_BATCH_MAX_SIZE", "64"))
+    EMBEDDING_BATCH_MAX_TOKENS = int(os.getenv("EMBEDDING_BATCH_MAX_TOKENS", "100000"))
+    # Longest POST /hr-contacts waits for post embeddings before storing the contacts without them
+    HR_CONTACT_EMBED_TIMEOUT_MS = float(os.getenv("HR_CONTACT_EMBED_TIMEOUT_MS", "10000"))
+    
+    # Offline bulk generation (Batch API) status polling
+    OPENAI_BATCH_POLL_S = float(os.getenv("OPENAI_BATCH_POLL_S", "60"))
+    
+    # Tracing
+    TRACING_EXPORTER = os.getenv("TRACING_EXPORTER", "none")  # none | console | file
+    TRACING_FILE_PATH = os.getenv("TRACING_FILE_PATH", "traces/spans.jsonl")
+    TRACING_SERVICE_NAME = os.getenv("TRACING_SERVICE_NAME", "job-email-generator")
+    
+    # Per-request profiling
+    PROFILE_ADMIN_TOKEN = os.getenv("PROFILE_ADMIN_TOKEN")  # unset disables header/query triggers
+    PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))  # fraction of requests, 0-1
+    PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+    PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+    PROFILE_FORMAT = os.getenv("PROFILE_FORMAT", "speedscope")  # speedscope | pstats
+    
     @classmethod
     def validate(cls):
         """Validate that all required config values are set."""
-        required = [
-            "DATABASE_URL",
-            "OPENAI_API_KEY"
-        ]
+        required = ["DATABASE_URL"]
+        if cls.OPENAI_PROVIDER == "openai":
+            required.append("OPENAI_API_KEY")
         missing = [key for key in required if not getattr(cls, key)]
         if missing:
             raise ValueError(f"Missing required configuration: {', '.join(missing)}")
@@ -0,0 +1,167 @@
+"""Micro-batching of concurrent calls.
+
+Callers submit single items and block for their result. The first caller to
+arrive opens a batch and waits up to ``max_wait`` seconds (or until the batch
+reaches its size or weight limit) for others to join, then runs the batch
+function once on its own thread and hands each caller its own result. There
+is no background worker, so the batch runs inside the leader's trace context.
+The batch itself runs under the most generous request deadline among its
+members, so one impatient caller does not cut the call short for the rest.
+When a batch fails with one of ``split_on`` (an error caused by the input,
+such as one oversized text), its items are retried one by one so only the
+caller with the bad input gets the error.
+"""
+import threading
+import time
+from typing import Callable, Generic, List, Optional, Tuple, Type, TypeVar
+
+from src.lib import deadline, metrics
+from src.lib.deadline import Deadline
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+BATCH_SIZE = metrics.histogram(
+    "batcher_batch_size",
+    "Items sent per batched call",
+    ("batcher",),
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 2048)
+)
+BATCH_SPLITS = metrics.counter(
+    "batcher_split_batches",
+    "Batches retried item by item after an input error",
+    ("batcher",)
+)
+BATCH_WAIT = metrics.histogram(
+    "batcher_wait_seconds",
+    "Time the leading caller held a batch open before sending it",
+    ("batcher",)
+)
+
+def _widest(deadlines: List[Optional[Deadline]]) -> Optional[Deadline]:
+    """The latest deadline among callers still waiting (None if any is unbounded)."""
+    live = [d for d in deadlines if d is None or not d.cancelled]
+    if not live:
+        return deadlines[0]
+    if any(d is None or d.expires_at is None for d in live):
+        return None
+    return max(live, key=lambda d: d.expires_at)
+
+class _Batch:
+    __slots__ = ("items", "deadlines", "weight", "closed", "done", "results", "errors")
+
+    def __init__(self):
+        self.items: list = []
+        self.deadlines: List[Optional[Deadline]] = []
+        self.weight = 0
+        self.closed = threading.Event()
+        self.done = threading.Event()
+        self.results: Optional[list] = None
+        self.errors: Optional[List[Optional[BaseException]]] = None
+
+class MicroBatcher(Generic[T, R]):
+    """
+    Merges concurrent single-item calls into batched calls.
+
+    Args:
+        name: Label used in metrics
+        fn: Batch function; must return one result per item, in order
+        max_batch_size: Most items per batch
+        max_batch_weight: Most total weight per batch (e.g. estimated tokens)
+        max_wait: Seconds the first caller waits for others; 0 disables batching
+        weigh: Weight of a single item
+        split_on: Batch errors after which items are retried one by one
+    """
+
+    def __init__(
+        self,
+        name: str,
+        fn: Callable[[List[T]], List[R]],
+        max_batch_size: int,
+        max_batch_weight: int,
+        max_wait: float,
+        weigh: Callable[[T], int] = lambda item: 1,
+        split_on: Tuple[Type[BaseException], ...] = ()
+    ):
+        self.name = name
+        self._fn = fn
+        self.max_batch_size = max(max_batch_size, 1)
+        self.max_batch_weight = max_batch_weight
+        self.max_wait = max_wait
+        self._weigh = weigh
+        self._split_on = split_on
+        self._open: Optional[_Batch] = None
+        self._lock = threading.Lock()
+
+    def _is_full(self, batch: _Batch) -> bool:
+        return len(batch.items) >= self.max_batch_size or batch.weight >= self.max_batch_weight
+
+    def _call(self, items: List[T]) -> List[R]:
+        results = self._fn(items)
+        if len(results) != len(items):
+            raise RuntimeError(f"{self.name} batch returned {len(results)} results for {len(items)} items")
+        return results
+
+    def _run_each(self, batch: _Batch) -> None:
+        """Retry a failed batch item by item, keeping each item's own result or error."""
+        BATCH_SPLITS.inc(batcher=self.name)
+        batch.results = [None] * len(batch.items)
+        batch.errors = [None] * len(batch.items)
+        for i, item in enumerate(batch.items):
+            try:
+                batch.results[i] = self._call([item])[0]
+            except BaseException as e:
+                batch.errors[i] = e
+
+    def _run(self, batch: _Batch) -> None:
+        BATCH_SIZE.observe(len(batch.items), batcher=self.name)
+        try:
+            batch.results = self._call(batch.items)
+        except BaseException as e:
+            if len(batch.items) > 1 and isinstance(e, self._split_on):
+                self._run_each(batch)
+            else:
+                batch.errors = [e] * len(batch.items)
+        finally:
+            batch.done.set()
+
+    def submit(self, item: T) -> R:
+        """Add ``item`` to the current batch and block until its result is ready."""
+        if self.max_wait <= 0:
+            return self._fn([item])[0]
+
+        weight = self._weigh(item)
+        with self._lock:
+            batch = self._open
+            # An item that would overflow the open batch starts a new one
+            if batch is not None and batch.items and batch.weight + weight > self.max_batch_weight:
+                batch.closed.set()
+                batch = None
+            leader = batch is None
+            if leader:
+                batch = self._open = _Batch()
+            index = len(batch.items)
+            batch.items.append(item)
+            batch.deadlines.append(deadline.current())
+            batch.weight += weight
+            if self._is_full(batch):
+                batch.closed.set()
+            if batch.closed.is_set():
+                self._open = None
+
+        if leader:
+            started = time.monotonic()
+            batch.closed.wait(self.max_wait)
+            with self._lock:
+                if self._open is batch:
+                    self._open = None
+                batch.closed.set()
+            BATCH_WAIT.observe(time.monotonic() - started, batcher=self.name)
+            with deadline.use(_widest(batch.deadlines)):
+                self._run(batch)
+        else:
+            deadline.wait(batch.done, f"{self.name} batch")
+
+        if batch.errors is not None and batch.errors[index] is not None:
+            raise batch.errors[index]
+        return batch.results[index]
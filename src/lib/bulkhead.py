@@ -0,0 +1,165 @@
+"""Admission control with per-class concurrency pools (bulkheads).
+
+Expensive endpoints are grouped into classes (LLM, parse, DB read). Each
+class has its own concurrency limit, a bounded wait queue and a queue-time
+deadline; a request that finds the queue full or waits past the deadline is
+shed with a 503 instead of holding a worker thread. Routes attach to a class
+with ``Depends(admit("llm"))``, or hold a class around one stage with
+``async with admitted("llm")``. The shared anyio thread pool is sized so that
+the bulkheaded classes cannot use up the threads unclassified routes need.
+"""
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Tuple
+
+import anyio
+import anyio.to_thread
+
+from src.config import config
+from src.lib import metrics
+from src.lib.errors import ServiceUnavailableError
+
+IN_FLIGHT = metrics.gauge("bulkhead_in_flight", "Requests currently admitted per bulkhead", ("bulkhead",))
+QUEUED = metrics.gauge("bulkhead_queued", "Requests waiting for admission per bulkhead", ("bulkhead",))
+QUEUE_WAIT = metrics.histogram(
+    "bulkhead_queue_wait_seconds",
+    "Time requests waited for admission",
+    ("bulkhead",)
+)
+SHED = metrics.counter("bulkhead_rejected", "Requests shed by a bulkhead", ("bulkhead", "reason"))
+
+class BulkheadFullError(ServiceUnavailableError):
+    """A bulkhead's queue is full or its queue-time deadline passed."""
+
+class Bulkhead:
+    """
+    Concurrency pool with a bounded queue.
+
+    Args:
+        name: Class name used in metrics and errors
+        max_concurrent: Requests admitted at once
+        max_queue: Requests allowed to wait for admission
+        max_queue_wait: Seconds a request may wait before it is shed
+    """
+
+    def __init__(self, name: str, max_concurrent: int, max_queue: int, max_queue_wait: float):
+        self.name = name
+        self.max_concurrent = max(max_concurrent, 1)
+        self.max_queue = max_queue
+        self.max_queue_wait = max_queue_wait
+        self._limiter = anyio.CapacityLimiter(self.max_concurrent)
+        self._waiting = 0
+
+    @property
+    def in_flight(self) -> int:
+        return self._limiter.borrowed_tokens
+
+    @property
+    def waiting(self) -> int:
+        return self._waiting
+
+    def _shed(self, reason: str, retry_after: float) -> BulkheadFullError:
+        SHED.inc(bulkhead=self.name, reason=reason)
+        return BulkheadFullError(f"Server busy ({self.name} capacity exhausted)", retry_after=retry_after)
+
+    async def acquire(self, token: object) -> None:
+        """
+        Wait for a slot on behalf of ``token``.
+
+        Raises:
+            BulkheadFullError: If the queue is full or the wait exceeds the deadline
+        """
+        try:
+            self._limiter.acquire_on_behalf_of_nowait(token)
+            QUEUE_WAIT.observe(0.0, bulkhead=self.name)
+            return
+        except anyio.WouldBlock:
+            pass
+        if self._waiting >= self.max_queue:
+            raise self._shed("queue_full", 1.0)
+        started = time.monotonic()
+        self._waiting += 1
+        try:
+            with anyio.fail_after(self.max_queue_wait):
+                await self._limiter.acquire_on_behalf_of(token)
+        except TimeoutError:
+            raise self._shed("queue_timeout", self.max_queue_wait)
+        finally:
+            self._waiting -= 1
+            QUEUE_WAIT.observe(time.monotonic() - started, bulkhead=self.name)
+
+    def release(self, token: object) -> None:
+        self._limiter.release_on_behalf_of(token)
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """Hold a slot for the duration of the block."""
+        token = object()
+        await self.acquire(token)
+        try:
+            yield
+        finally:
+            self.release(token)
+
+def _parse_bulkheads(spec: str) -> Dict[str, Tuple[int, int, float]]:
+    """Parse ``name:concurrency:queue:queue_timeout_ms`` entries."""
+    bulkheads = {}
+    for entry in filter(None, (part.strip() for part in spec.split(","))):
+        name, concurrency, queue, timeout_ms = entry.split(":")
+        bulkheads[name] = (int(concurrency), int(queue), float(timeout_ms) / 1000.0)
+    return bulkheads
+
+BULKHEADS: Dict[str, Bulkhead] = {
+    name: Bulkhead(name, concurrency, queue, timeout)
+    for name, (concurrency, queue, timeout) in _parse_bulkheads(config.BULKHEADS).items()
+}
+
+IN_FLIGHT.set_function(lambda: {(b.name,): b.in_flight for b in BULKHEADS.values()})
+QUEUED.set_function(lambda: {(b.name,): b.waiting for b in BULKHEADS.values()})
+
+def admitted(name: str):
+    """
+    Async context manager holding a slot in the named bulkhead, for routes
+    whose stages belong to different classes.
+
+    Usage:
+        async with admitted("llm"):
+            embedding = await run_in_threadpool(create_embedding, text)
+
+    Raises:
+        BulkheadFullError: If the request is shed
+    """
+    return BULKHEADS[name].slot()
+
+def admit(name: str):
+    """
+    FastAPI dependency that holds a slot in the named bulkhead for the request.
+
+    Usage:
+        @app.post("/gen-email", dependencies=[Depends(admit("llm"))])
+    """
+    bulkhead = BULKHEADS[name]
+
+    async def dependency():
+        async with bulkhead.slot():
+            yield
+
+    return dependency
+
+def configure_thread_pool() -> None:
+    """
+    Size the shared worker thread pool above the bulkhead limits.
+
+    Every bulkheaded class can run at full concurrency and
+    BULKHEAD_RESERVED_THREADS threads remain for unclassified routes.
+    """
+    limiter = anyio.to_thread.current_default_thread_limiter()
+    needed = sum(b.max_concurrent for b in BULKHEADS.values()) + config.BULKHEAD_RESERVED_THREADS
+    limiter.total_tokens = max(limiter.total_tokens, needed)
+
+def get_bulkhead_stats() -> Dict[str, Dict[str, Any]]:
+    """Current usage of each bulkhead, for /health."""
+    return {
+        b.name: {"in_flight": b.in_flight, "max_concurrent": b.max_concurrent, "queued": b.waiting, "max_queue": b.max_queue}
+        for b in BULKHEADS.values()
+    }
@@ -0,0 +1,231 @@
+"""Circuit breakers for downstream dependencies.
+
+A breaker records the outcome and latency of recent calls in a rolling time
+window. When enough calls have been seen and either the failure rate or the
+slow-call rate crosses its threshold, the breaker opens and calls fail fast
+with a 503 instead of waiting on a dependency that is down. After the open
+period a limited number of probe calls are let through (half-open); the
+breaker closes once enough of them succeed and reopens on the first failure.
+"""
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Tuple, Type, TypeVar
+
+from src.config import config
+from src.lib import metrics
+from src.lib.errors import ServiceUnavailableError
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+STATE = metrics.gauge(
+    "circuit_breaker_state",
+    "Circuit breaker state (0 closed, 1 half-open, 2 open)",
+    ("breaker",)
+)
+TRANSITIONS = metrics.counter("circuit_breaker_transitions", "Circuit breaker state changes", ("breaker", "state"))
+REJECTED = metrics.counter("circuit_breaker_rejected", "Calls rejected by an open circuit breaker", ("breaker",))
+
+class CircuitOpenError(ServiceUnavailableError):
+    """A dependency's circuit breaker is open and the call was not attempted."""
+
+class CircuitBreaker:
+    """
+    Rolling-window circuit breaker.
+
+    Args:
+        name: Dependency name used in errors, metrics and /health
+        failure_types: Exceptions that count as dependency failures; anything
+            else is treated as a success (e.g. validation errors)
+        slow_call_s: Calls slower than this count as slow
+        window_s: Length of the rolling window
+        min_calls: Calls needed in the window before the breaker may open
+        failure_rate: Failure fraction that opens the breaker
+        slow_call_rate: Slow-call fraction that opens the breaker
+        open_s: Time the breaker stays open before probing
+        half_open_calls: Successful probes needed to close again; also the
+            number of probes allowed in flight at once
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_types: Tuple[Type[BaseException], ...] = (Exception,),
+        slow_call_s: float = 30.0,
+        window_s: float = 30.0,
+        min_calls: int = 20,
+        failure_rate: float = 0.5,
+        slow_call_rate: float = 0.8,
+        open_s: float = 30.0,
+        half_open_calls: int = 5
+    ):
+        self.name = name
+        self.failure_types = failure_types
+        self.slow_call_s = slow_call_s
+        self.window_s = window_s
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.slow_call_rate = slow_call_rate
+        self.open_s = open_s
+        self.half_open_calls = max(half_open_calls, 1)
+        self.state = CLOSED
+        self._opened_at = 0.0
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+        # (finished_at, failed, slow)
+        self._calls: deque = deque()
+        self._lock = threading.Lock()
+
+    def _transition(self, state: str) -> None:
+        logger.warning(f"Circuit breaker '{self.name}' {self.state} -> {state}")
+        self.state = state
+        TRANSITIONS.inc(breaker=self.name, state=state)
+        if state == OPEN:
+            self._opened_at = time.monotonic()
+        if state != CLOSED:
+            self._probes_in_flight = 0
+            self._probe_successes = 0
+        self._calls.clear()
+
+    def _trim(self, now: float) -> None:
+        cutoff = now - self.window_s
+        while self._calls and self._calls[0][0] < cutoff:
+            self._calls.popleft()
+
+    def _rates(self) -> Tuple[int, float, float]:
+        total = len(self._calls)
+        if not total:
+            return 0, 0.0, 0.0
+        failed = sum(1 for _, f, _ in self._calls if f)
+        slow = sum(1 for _, _, s in self._calls if s)
+        return total, failed / total, slow / total
+
+    def retry_after(self) -> float:
+        """Seconds until an open breaker starts probing again."""
+        return max(self._opened_at + self.open_s - time.monotonic(), 0.0)
+
+    def _acquire(self) -> bool:
+        """Admit a call; returns True if it is a half-open probe."""
+        with self._lock:
+            if self.state == OPEN:
+                if self.retry_after() > 0:
+                    REJECTED.inc(breaker=self.name)
+                    raise CircuitOpenError(
+                        f"{self.name} is unavailable (circuit open)",
+                        retry_after=self.retry_after()
+                    )
+                self._transition(HALF_OPEN)
+            if self.state == HALF_OPEN:
+                if self._probes_in_flight >= self.half_open_calls:
+                    REJECTED.inc(breaker=self.name)
+                    raise CircuitOpenError(
+                        f"{self.name} is recovering (circuit half-open)",
+                        retry_after=1.0
+                    )
+                self._probes_in_flight += 1
+                return True
+            return False
+
+    def _record(self, probe: bool, failed: bool, elapsed: float) -> None:
+        slow = elapsed >= self.slow_call_s
+        with self._lock:
+            if probe:
+                if self.state != HALF_OPEN:
+                    return
+                self._probes_in_flight -= 1
+                if failed or slow:
+                    self._transition(OPEN)
+                    return
+                self._probe_successes += 1
+                if self._probe_successes >= self.half_open_calls:
+                    self._transition(CLOSED)
+                return
+            if self.state != CLOSED:
+                return
+            now = time.monotonic()
+            self._calls.append((now, failed, slow))
+            self._trim(now)
+            total, failure_rate, slow_rate = self._rates()
+            if total >= self.min_calls and (failure_rate >= self.failure_rate or slow_rate >= self.slow_call_rate):
+                self._transition(OPEN)
+
+    @contextmanager
+    def guard(self) -> Iterator[None]:
+        """
+        Run the enclosed block under the breaker.
+
+        Raises:
+            CircuitOpenError: If the breaker rejects the call
+        """
+        probe = self._acquire()
+        started = time.monotonic()
+        try:
+            yield
+        except self.failure_types:
+            self._record(probe, True, time.monotonic() - started)
+            raise
+        except BaseException:
+            self._record(probe, False, time.monotonic() - started)
+            raise
+        self._record(probe, False, time.monotonic() - started)
+
+    def call(self, fn: Callable[[], T]) -> T:
+        """Run ``fn`` under the breaker."""
+        with self.guard():
+            return fn()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """State summary for /health."""
+        with self._lock:
+            self._trim(time.monotonic())
+            total, failure_rate, slow_rate = self._rates()
+            return {
+                "state": self.state,
+                "calls": total,
+                "failure_rate": round(failure_rate, 3),
+                "slow_call_rate": round(slow_rate, 3),
+                "retry_after": round(self.retry_after(), 1) if self.state == OPEN else None,
+            }
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+def get_breaker(
+    name: str,
+    failure_types: Tuple[Type[BaseException], ...] = (Exception,),
+    slow_call_s: float = 30.0
+) -> CircuitBreaker:
+    """Get or create the process-wide breaker for a dependency, using config thresholds."""
+    with _breakers_lock:
+        breaker = _breakers.get(name)
+        if breaker is None:
+            breaker = _breakers[name] = CircuitBreaker(
+                name,
+                failure_types=failure_types,
+                slow_call_s=slow_call_s,
+                window_s=config.CIRCUIT_WINDOW_S,
+                min_calls=config.CIRCUIT_MIN_CALLS,
+                failure_rate=config.CIRCUIT_FAILURE_RATE,
+                slow_call_rate=config.CIRCUIT_SLOW_CALL_RATE,
+                open_s=config.CIRCUIT_OPEN_S,
+                half_open_calls=config.CIRCUIT_HALF_OPEN_CALLS,
+            )
+        return breaker
+
+def get_breaker_states() -> Dict[str, Dict[str, Any]]:
+    """Snapshot of every registered breaker, keyed by name."""
+    with _breakers_lock:
+        breakers = list(_breakers.values())
+    return {breaker.name: breaker.snapshot() for breaker in breakers}
+
+STATE.set_function(lambda: {(b.name,): _STATE_VALUES[b.state] for b in list(_breakers.values())})
@@ -0,0 +1,245 @@
+"""Per-request deadlines and cancellation.
+
+``DeadlineMiddleware`` gives every HTTP request a deadline (per-route
+config, overridable with the ``X-Request-Timeout-Ms`` header) and cancels it
+as soon as the client disconnects. The deadline lives in a context variable,
+so it follows the request into worker threads, and services call ``check()``
+between stages, size OpenAI timeouts with ``remaining()`` and cap database
+statement timeouts with it. Work already running in a blocking call (an
+HTTP request, a SQL statement) stops at its own timeout; everything after it
+is skipped.
+"""
+import contextvars
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional
+
+import anyio
+from starlette.routing import Match
+
+from src.config import config
+from src.lib import metrics
+from src.lib.errors import DeadlineExceededError, RequestCancelledError
+
+TIMEOUT_HEADER = "x-request-timeout-ms"
+
+EXPIRED = metrics.counter("request_deadline_exceeded", "Work abandoned because the request deadline passed", ("stage",))
+CANCELLED = metrics.counter("request_cancelled", "Work abandoned because the client disconnected", ("stage",))
+
+class Deadline:
+    """Absolute point in time by which a request's work must finish."""
+
+    def __init__(self, timeout: Optional[float], parent: Optional["Deadline"] = None):
+        self.expires_at = time.monotonic() + timeout if timeout is not None else None
+        # A child never outlives its parent
+        if parent is not None and parent.expires_at is not None:
+            self.expires_at = parent.expires_at if self.expires_at is None else min(self.expires_at, parent.expires_at)
+        self._parent = parent
+        self._cancelled = threading.Event()
+        self._callbacks: List[Callable[[], None]] = []
+        self._lock = threading.Lock()
+
+    @classmethod
+    def attempt(cls, parent: Optional["Deadline"]) -> "Deadline":
+        """
+        Deadline for one of several attempts racing on behalf of ``parent``:
+        it expires and is cancelled with the parent, and can also be
+        cancelled on its own once another attempt has won.
+        """
+        return cls(None, parent)
+
+    def cancel(self) -> None:
+        with self._lock:
+            self._cancelled.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            callback()
+
+    @contextmanager
+    def on_cancel(self, callback: Callable[[], None]) -> Iterator[None]:
+        """
+        Run ``callback`` if this deadline is cancelled while the block runs
+        (immediately if it already was); it runs at most once.
+        """
+        with self._lock:
+            registered = not self._cancelled.is_set()
+            if registered:
+                self._callbacks.append(callback)
+        if not registered:
+            callback()
+        try:
+            yield
+        finally:
+            with self._lock:
+                if callback in self._callbacks:
+                    self._callbacks.remove(callback)
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set() or (self._parent is not None and self._parent.cancelled)
+
+    def remaining(self) -> Optional[float]:
+        """Seconds left, or None when the request has no deadline."""
+        if self.expires_at is None:
+            return None
+        return max(self.expires_at - time.monotonic(), 0.0)
+
+    def check(self, stage: str = "unknown") -> None:
+        """
+        Raise if the request was cancelled or its deadline has passed.
+
+        Raises:
+            RequestCancelledError: If the client disconnected
+            DeadlineExceededError: If the deadline has passed
+        """
+        if self.cancelled:
+            CANCELLED.inc(stage=stage)
+            raise RequestCancelledError(f"Client disconnected; abandoned {stage}")
+        if self.expires_at is not None and time.monotonic() >= self.expires_at:
+            EXPIRED.inc(stage=stage)
+            raise DeadlineExceededError(f"Request deadline exceeded before {stage}")
+
+_current: contextvars.ContextVar[Optional[Deadline]] = contextvars.ContextVar("request_deadline", default=None)
+
+def current() -> Optional[Deadline]:
+    """Deadline of the current request, or None outside a request."""
+    return _current.get()
+
+def remaining() -> Optional[float]:
+    """Seconds left for the current request, or None when unbounded."""
+    deadline = _current.get()
+    return deadline.remaining() if deadline is not None else None
+
+def check(stage: str = "unknown") -> None:
+    """Raise if the current request was cancelled or ran out of time; no-op outside a request."""
+    deadline = _current.get()
+    if deadline is not None:
+        deadline.check(stage)
+
+def wait(event: threading.Event, stage: str = "unknown") -> None:
+    """
+    Block until ``event`` is set, giving up when the current request is
+    cancelled or its deadline passes.
+    """
+    deadline = _current.get()
+    if deadline is None:
+        event.wait()
+        return
+    while not event.is_set():
+        deadline.check(stage)
+        left = deadline.remaining()
+        # Wake periodically to notice a client disconnect
+        event.wait(0.25 if left is None else min(left, 0.25))
+
+def sleep(seconds: float, stage: str = "unknown") -> None:
+    """Sleep for ``seconds``, waking early to raise if the current request is cancelled."""
+    deadline = _current.get()
+    if deadline is None:
+        time.sleep(seconds)
+        return
+    until = time.monotonic() + seconds
+    while True:
+        deadline.check(stage)
+        left = until - time.monotonic()
+        if left <= 0:
+            return
+        # Wake periodically to notice a parent's cancellation as well
+        deadline._cancelled.wait(min(left, 0.25))
+
+@contextmanager
+def use(deadline: Optional[Deadline]) -> Iterator[None]:
+    """Run the enclosed block under ``deadline`` (None removes any deadline)."""
+    token = _current.set(deadline)
+    try:
+        yield
+    finally:
+        _current.reset(token)
+
+def _parse_route_timeouts(spec: str) -> Dict[str, float]:
+    """Parse ``/path:timeout_ms`` entries."""
+    timeouts = {}
+    for entry in filter(None, (part.strip() for part in spec.split(","))):
+        path, timeout_ms = entry.rsplit(":", 1)
+        timeouts[path] = float(timeout_ms) / 1000.0
+    return timeouts
+
+ROUTE_TIMEOUTS = _parse_route_timeouts(config.REQUEST_TIMEOUTS)
+
+def _route_path(scope) -> Optional[str]:
+    app = scope.get("app")
+    for route in getattr(getattr(app, "router", None), "routes", ()):
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return route.path
+    return None
+
+def request_timeout(scope, header_value: Optional[str]) -> Optional[float]:
+    """
+    Timeout for a request: the header override if valid, else the route's
+    configured timeout, else REQUEST_TIMEOUT_MS; capped at REQUEST_TIMEOUT_MAX_MS.
+    A configured value of 0 means no deadline; the header must be a positive
+    number of milliseconds (anything else, including nan, is ignored).
+    """
+    timeout = ROUTE_TIMEOUTS.get(_route_path(scope), config.REQUEST_TIMEOUT_MS / 1000.0)
+    if header_value:
+        try:
+            value = float(header_value)
+        except ValueError:
+            value = math.nan
+        if math.isfinite(value) and value > 0:
+            timeout = value / 1000.0
+    max_timeout = config.REQUEST_TIMEOUT_MAX_MS / 1000.0
+    if max_timeout > 0 and (timeout <= 0 or timeout > max_timeout):
+        timeout = max_timeout
+    return timeout if timeout > 0 else None
+
+class DeadlineMiddleware:
+    """
+    ASGI middleware that attaches a deadline to each HTTP request and cancels
+    it when the client disconnects.
+
+    Incoming messages are read by a watcher task and relayed to the app, so a
+    disconnect is seen even while the app is busy and never reads ``receive``.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or ())
+        header_value = headers.get(TIMEOUT_HEADER.encode("latin-1"))
+        deadline = Deadline(request_timeout(scope, header_value.decode("latin-1") if header_value else None))
+        send_stream, receive_stream = anyio.create_memory_object_stream(16)
+
+        async def watch():
+            async with send_stream:
+                while True:
+                    message = await receive()
+                    if message["type"] == "http.disconnect":
+                        deadline.cancel()
+                        await send_stream.send(message)
+                        return
+                    await send_stream.send(message)
+
+        async def relay_receive():
+            try:
+                return await receive_stream.receive()
+            except anyio.EndOfStream:
+                return {"type": "http.disconnect"}
+
+        token = _current.set(deadline)
+        try:
+            async with anyio.create_task_group() as task_group:
+                task_group.start_soon(watch)
+                try:
+                    await self.app(scope, relay_receive, send)
+                finally:
+                    task_group.cancel_scope.cancel()
+        finally:
+            _current.reset(token)
@@ -0,0 +1,23 @@
+"""Shared exception types for dependency failures and deadlines."""
+from typing import Optional
+
+class ServiceUnavailableError(Exception):
+    """
+    A dependency cannot serve the request right now.
+    
+    Surfaced to clients as HTTP 503 with a Retry-After header.
+    """
+    
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class DeadlineExceededError(ServiceUnavailableError):
+    """
+    The request ran out of time before its work finished.
+    
+    Surfaced to clients as HTTP 504.
+    """
+
+class RequestCancelledError(DeadlineExceededError):
+    """The client disconnected, so the remaining work was abandoned."""
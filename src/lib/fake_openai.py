@@ -0,0 +1,451 @@
+"""Deterministic offline stand-in for the OpenAI API.
+
+Used for load tests and benchmarks on isolated machines. Embeddings are
+unit vectors seeded from the input text, so identical inputs always map to
+identical vectors, and chat completions return well-formed subject/body
+JSON. Latency, jitter and error rate are configurable. The in-process
+client also implements the Files and Batches endpoints, processing a batch
+on a background thread, so the offline bulk-generation pipeline runs end to
+end without a network.
+
+The backend is available in-process (``OPENAI_PROVIDER=fake``) or as an
+HTTP server that speaks the OpenAI wire format:
+
+    python -m src.lib.fake_openai --port 8100
+    OPENAI_BASE_URL=http://127.0.0.1:8100/v1 uvicorn src.main:app
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Union
+
+import httpx
+import openai
+from openai._legacy_response import HttpxBinaryResponseContent
+from openai.types import Batch, CreateEmbeddingResponse, FileObject
+from openai.types.chat import ChatCompletion
+
+from src.config import config
+
+_ERROR_CLASSES = {
+    400: openai.BadRequestError,
+    404: openai.NotFoundError,
+    429: openai.RateLimitError,
+    500: openai.InternalServerError,
+    503: openai.InternalServerError,
+}
+
+_RECIPIENT_RE = re.compile(r"^(Name|Company):\s*(.+)$", re.MULTILINE)
+
+class FakeUpstreamError(Exception):
+    """Injected upstream failure, carrying the HTTP status to report."""
+
+    def __init__(self, status_code: int, retry_after: Optional[float] = None):
+        super().__init__(f"Injected fake OpenAI error (HTTP {status_code})")
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+def _estimate_tokens(text: str) -> int:
+    return max(len(text) // 4, 1)
+
+class FakeOpenAIBackend:
+    """Produces OpenAI-shaped response payloads with simulated latency and errors."""
+
+    def __init__(
+        self,
+        latency_ms: float = 0.0,
+        jitter_ms: float = 0.0,
+        error_rate: float = 0.0,
+        error_status: int = 500,
+        dimensions: Optional[int] = None,
+        seed: int = 0
+    ):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.dimensions = dimensions or config.EMBEDDING_DIMENSIONS
+        self.seed = seed
+        self._rng = random.Random(seed)
+        self._rng_lock = threading.Lock()
+        self._files: Dict[str, Dict[str, Any]] = {}
+        self._batches: Dict[str, Dict[str, Any]] = {}
+        self._store_lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls) -> "FakeOpenAIBackend":
+        return cls(
+            latency_ms=config.FAKE_OPENAI_LATENCY_MS,
+            jitter_ms=config.FAKE_OPENAI_JITTER_MS,
+            error_rate=config.FAKE_OPENAI_ERROR_RATE,
+            error_status=config.FAKE_OPENAI_ERROR_STATUS,
+            seed=config.FAKE_OPENAI_SEED,
+        )
+
+    def _simulate(self) -> None:
+        """Sleep for the configured latency and maybe raise an injected error."""
+        with self._rng_lock:
+            jitter = self._rng.uniform(-self.jitter_ms, self.jitter_ms) if self.jitter_ms else 0.0
+            fail = self.error_rate > 0 and self._rng.random() < self.error_rate
+        delay = max(self.latency_ms + jitter, 0.0) / 1000.0
+        if delay:
+            time.sleep(delay)
+        if fail:
+            raise FakeUpstreamError(self.error_status, retry_after=1.0 if self.error_status == 429 else None)
+
+    def embedding(self, text: str, dimensions: Optional[int] = None) -> List[float]:
+        """Unit-length vector derived only from the seed and ``text``."""
+        digest = hashlib.sha256(f"{self.seed}:{text}".encode("utf-8")).digest()
+        rng = random.Random(digest)
+        vector = [rng.gauss(0.0, 1.0) for _ in range(dimensions or self.dimensions)]
+        norm = sum(v * v for v in vector) ** 0.5 or 1.0
+        return [v / norm for v in vector]
+
+    def embeddings_payload(self, model: str, input: Union[str, List[str]], dimensions: Optional[int] = None) -> Dict[str, Any]:
+        self._simulate()
+        inputs = [input] if isinstance(input, str) else list(input)
+        tokens = sum(_estimate_tokens(text) for text in inputs)
+        return {
+            "object": "list",
+            "model": model,
+            "data": [
+                {"object": "embedding", "index": i, "embedding": self.embedding(text, dimensions)}
+                for i, text in enumerate(inputs)
+            ],
+            "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+        }
+
+    def _email_json(self, prompt: str, index: int) -> str:
+        recipient = dict(_RECIPIENT_RE.findall(prompt))
+        name = recipient.get("Name", "N/A").strip()
+        company = recipient.get("Company", "N/A").strip()
+        greeting = f"Dear {name}," if name != "N/A" else "Dear Hiring Manager,"
+        at_company = f" at {company}" if company != "N/A" else ""
+        reference = hashlib.sha1(f"{self.seed}:{index}:{prompt}".encode("utf-8")).hexdigest()[:8]
+        body = (
+            f"{greeting}\n\n"
+            f"I am excited to apply for the open position{at_company}. My background in building "
+            "reliable backend services with Python, SQL and cloud infrastructure matches the "
+            "requirements you described, and I have shipped similar systems end to end.\n\n"
+            "I would welcome the chance to discuss how I can contribute to your team.\n\n"
+            f"Best regards,\nCandidate (ref {reference})"
+        )
+        return json.dumps({"subject": f"Application for the role{at_company}"[:60], "body": body})
+
+    def chat_payload(self, model: str, messages: List[Dict[str, Any]], n: int = 1) -> Dict[str, Any]:
+        self._simulate()
+        prompt = "\n".join(str(m.get("content", "")) for m in messages)
+        choices = [
+            {
+                "index": i,
+                "message": {"role": "assistant", "content": self._email_json(prompt, i)},
+                "finish_reason": "stop",
+            }
+            for i in range(max(n or 1, 1))
+        ]
+        prompt_tokens = _estimate_tokens(prompt)
+        completion_tokens = sum(_estimate_tokens(c["message"]["content"]) for c in choices)
+        return {
+            "id": f"chatcmpl-fake-{uuid.uuid4().hex[:12]}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": choices,
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        }
+
+    def create_file(self, content: bytes, filename: str, purpose: str) -> Dict[str, Any]:
+        file_id = f"file-fake-{uuid.uuid4().hex[:12]}"
+        meta = {
+            "id": file_id,
+            "object": "file",
+            "bytes": len(content),
+            "created_at": int(time.time()),
+            "filename": filename,
+            "purpose": purpose,
+            "status": "processed",
+        }
+        with self._store_lock:
+            self._files[file_id] = {"meta": meta, "content": content}
+        return dict(meta)
+
+    def file_content(self, file_id: str) -> bytes:
+        with self._store_lock:
+            stored = self._files.get(file_id)
+        if stored is None:
+            raise FakeUpstreamError(404)
+        return stored["content"]
+
+    def create_batch(
+        self,
+        input_file_id: str,
+        endpoint: str,
+        completion_window: str,
+        metadata: Optional[Dict[str, str]] = None
+    ) -> Dict[str, Any]:
+        """Accept a batch and process it on a background thread."""
+        content = self.file_content(input_file_id)
+        batch_id = f"batch_fake_{uuid.uuid4().hex[:12]}"
+        batch = {
+            "id": batch_id,
+            "object": "batch",
+            "endpoint": endpoint,
+            "input_file_id": input_file_id,
+            "completion_window": completion_window,
+            "status": "validating",
+            "created_at": int(time.time()),
+            "metadata": metadata,
+            "request_counts": {"total": 0, "completed": 0, "failed": 0},
+        }
+        with self._store_lock:
+            self._batches[batch_id] = batch
+        threading.Thread(
+            target=self._process_batch, args=(batch_id, endpoint, content), name="fake-openai-batch", daemon=True
+        ).start()
+        return dict(batch)
+
+    def retrieve_batch(self, batch_id: str) -> Dict[str, Any]:
+        with self._store_lock:
+            batch = self._batches.get(batch_id)
+            if batch is None:
+                raise FakeUpstreamError(404)
+            return dict(batch, request_counts=dict(batch["request_counts"]))
+
+    def _update_batch(self, batch_id: str, **fields: Any) -> None:
+        with self._store_lock:
+            self._batches[batch_id].update(fields)
+
+    def _process_batch(self, batch_id: str, endpoint: str, content: bytes) -> None:
+        lines = [line for line in content.decode("utf-8").splitlines() if line.strip()]
+        counts = {"total": len(lines), "completed": 0, "failed": 0}
+        self._update_batch(batch_id, status="in_progress", in_progress_at=int(time.time()), request_counts=dict(counts))
+        output, errors = [], []
+        for line in lines:
+            request = json.loads(line)
+            body = request.get("body", {})
+            record = {"id": f"batch_req_{uuid.uuid4().hex[:12]}", "custom_id": request.get("custom_id"), "error": None}
+            try:
+                if request.get("url") != endpoint:
+                    raise FakeUpstreamError(400)
+                if endpoint.endswith("/embeddings"):
+                    payload = self.embeddings_payload(body.get("model"), body.get("input", ""), body.get("dimensions"))
+                else:
+                    payload = self.chat_payload(body.get("model"), body.get("messages", []), body.get("n") or 1)
+                record["response"] = {"status_code": 200, "request_id": uuid.uuid4().hex, "body": payload}
+                output.append(record)
+                counts["completed"] += 1
+            except FakeUpstreamError as e:
+                record["response"] = {
+                    "status_code": e.status_code,
+                    "request_id": uuid.uuid4().hex,
+                    "body": {"error": {"message": str(e), "type": "fake_error"}},
+                }
+                errors.append(record)
+                counts["failed"] += 1
+            self._update_batch(batch_id, request_counts=dict(counts))
+
+        def store(records: List[Dict[str, Any]], kind: str) -> Optional[str]:
+            if not records:
+                return None
+            data = "".join(json.dumps(r) + "\n" for r in records).encode("utf-8")
+            return self.create_file(data, f"{batch_id}_{kind}.jsonl", "batch_output")["id"]
+
+        now = int(time.time())
+        self._update_batch(
+            batch_id,
+            status="completed",
+            output_file_id=store(output, "output"),
+            error_file_id=store(errors, "error"),
+            finalizing_at=now,
+            completed_at=now,
+        )
+
+def _status_error(error: FakeUpstreamError, path: str) -> openai.APIStatusError:
+    """Convert an injected failure into the exception the OpenAI SDK would raise."""
+    headers = {"retry-after": str(error.retry_after)} if error.retry_after else {}
+    response = httpx.Response(
+        error.status_code,
+        headers=headers,
+        request=httpx.Request("POST", f"http://fake-openai/v1{path}")
+    )
+    error_class = _ERROR_CLASSES.get(error.status_code, openai.APIStatusError)
+    return error_class(str(error), response=response, body=None)
+
+class _Embeddings:
+    def __init__(self, backend: FakeOpenAIBackend):
+        self._backend = backend
+
+    def create(self, *, model: str, input, dimensions: Optional[int] = None, **kwargs) -> CreateEmbeddingResponse:
+        try:
+            payload = self._backend.embeddings_payload(model, input, dimensions)
+        except FakeUpstreamError as e:
+            raise _status_error(e, "/embeddings")
+        return CreateEmbeddingResponse.model_validate(payload)
+
+class _Completions:
+    def __init__(self, backend: FakeOpenAIBackend):
+        self._backend = backend
+
+    def create(self, *, model: str, messages: List[Dict[str, Any]], n: Optional[int] = None, **kwargs) -> ChatCompletion:
+        try:
+            payload = self._backend.chat_payload(model, messages, n or 1)
+        except FakeUpstreamError as e:
+            raise _status_error(e, "/chat/completions")
+        return ChatCompletion.model_validate(payload)
+
+class _Chat:
+    def __init__(self, backend: FakeOpenAIBackend):
+        self.completions = _Completions(backend)
+
+class _Files:
+    def __init__(self, backend: FakeOpenAIBackend):
+        self._backend = backend
+
+    def create(self, *, file, purpose: str, **kwargs) -> FileObject:
+        if isinstance(file, tuple):
+            filename, content = file[0], file[1]
+        elif hasattr(file, "read"):
+            filename, content = os.path.basename(getattr(file, "name", "upload.jsonl")), file.read()
+        else:
+            filename, content = os.path.basename(str(file)), open(file, "rb").read()
+        if isinstance(content, str):
+            content = content.encode("utf-8")
+        return FileObject.model_validate(self._backend.create_file(content, filename, purpose))
+
+    def content(self, file_id: str, **kwargs) -> HttpxBinaryResponseContent:
+        try:
+            content = self._backend.file_content(file_id)
+        except FakeUpstreamError as e:
+            raise _status_error(e, f"/files/{file_id}/content")
+        return HttpxBinaryResponseContent(httpx.Response(200, content=content))
+
+class _Batches:
+    def __init__(self, backend: FakeOpenAIBackend):
+        self._backend = backend
+
+    def create(
+        self,
+        *,
+        input_file_id: str,
+        endpoint: str,
+        completion_window: str,
+        metadata: Optional[Dict[str, str]] = None,
+        **kwargs
+    ) -> Batch:
+        try:
+            payload = self._backend.create_batch(input_file_id, endpoint, completion_window, metadata)
+        except FakeUpstreamError as e:
+            raise _status_error(e, "/batches")
+        return Batch.model_validate(payload)
+
+    def retrieve(self, batch_id: str, **kwargs) -> Batch:
+        try:
+            payload = self._backend.retrieve_batch(batch_id)
+        except FakeUpstreamError as e:
+            raise _status_error(e, f"/batches/{batch_id}")
+        return Batch.model_validate(payload)
+
+class FakeOpenAIClient:
+    """In-process client exposing the subset of the OpenAI SDK the services use."""
+
+    def __init__(self, backend: Optional[FakeOpenAIBackend] = None):
+        self.backend = backend or FakeOpenAIBackend.from_config()
+        self.embeddings = _Embeddings(self.backend)
+        self.chat = _Chat(self.backend)
+        self.files = _Files(self.backend)
+        self.batches = _Batches(self.backend)
+
+class _Handler(BaseHTTPRequestHandler):
+    server_version = "FakeOpenAI/1.0"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, payload: Dict[str, Any], headers: Optional[Dict[str, str]] = None) -> None:
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        backend: FakeOpenAIBackend = self.server.backend
+        length = int(self.headers.get("Content-Length") or 0)
+        request = json.loads(self.rfile.read(length) or b"{}")
+        try:
+            if self.path.endswith("/embeddings"):
+                payload = backend.embeddings_payload(
+                    request.get("model"), request.get("input", ""), request.get("dimensions")
+                )
+            elif self.path.endswith("/chat/completions"):
+                payload = backend.chat_payload(
+                    request.get("model"), request.get("messages", []), request.get("n") or 1
+                )
+            else:
+                self._send_json(404, {"error": {"message": f"Unknown path {self.path}", "type": "invalid_request_error"}})
+                return
+        except FakeUpstreamError as e:
+            headers = {"Retry-After": str(e.retry_after)} if e.retry_after else None
+            self._send_json(e.status_code, {"error": {"message": str(e), "type": "fake_error"}}, headers)
+            return
+        self._send_json(200, payload)
+
+def start_http_server(
+    backend: Optional[FakeOpenAIBackend] = None,
+    host: str = "127.0.0.1",
+    port: int = 0
+) -> ThreadingHTTPServer:
+    """
+    Serve the fake backend over HTTP on a background thread.
+
+    Returns:
+        The running server; its base URL is ``http://<host>:<server.server_port>/v1``
+    """
+    server = ThreadingHTTPServer((host, port), _Handler)
+    server.daemon_threads = True
+    server.backend = backend or FakeOpenAIBackend.from_config()
+    thread = threading.Thread(target=server.serve_forever, name="fake-openai", daemon=True)
+    thread.start()
+    return server
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run the fake OpenAI HTTP stand-in")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--latency-ms", type=float, default=config.FAKE_OPENAI_LATENCY_MS)
+    parser.add_argument("--jitter-ms", type=float, default=config.FAKE_OPENAI_JITTER_MS)
+    parser.add_argument("--error-rate", type=float, default=config.FAKE_OPENAI_ERROR_RATE)
+    parser.add_argument("--error-status", type=int, default=config.FAKE_OPENAI_ERROR_STATUS)
+    parser.add_argument("--seed", type=int, default=config.FAKE_OPENAI_SEED)
+    args = parser.parse_args()
+
+    backend = FakeOpenAIBackend(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        seed=args.seed,
+    )
+    server = start_http_server(backend, args.host, args.port)
+    print(f"Fake OpenAI API listening on http://{args.host}:{server.server_port}/v1")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
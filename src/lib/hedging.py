@@ -0,0 +1,215 @@
+"""Hedged requests across OpenAI-compatible endpoints.
+
+A call goes to the endpoint with the lowest recent median latency; endpoints
+without enough samples yet rank after measured ones and are tried first on a
+small share of calls, so they get measured too. If it has
+not returned once the hedge delay (that endpoint's rolling latency
+percentile) has passed, the same call is sent to the next-best endpoint, or
+again to the same one when only one is configured. The first successful
+response wins. Each attempt runs under its own cancellable deadline, which
+is cancelled once another attempt has won: a loser still queued for rate-limit
+capacity gives up and returns its reservation, and one already sent returns
+its reservation straight away and has its result discarded when it finishes.
+"""
+import logging
+import math
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, List, Optional, TypeVar
+
+from src.config import config
+from src.lib import deadline, metrics
+from src.lib.errors import RequestCancelledError
+from src.lib.tracing import get_current_span, propagate_context
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+ENDPOINT_LATENCY = metrics.histogram(
+    "openai_endpoint_latency_seconds",
+    "Latency of successful calls per OpenAI-compatible endpoint",
+    ("endpoint",)
+)
+ENDPOINT_ERRORS = metrics.counter("openai_endpoint_errors", "Failed calls per endpoint", ("endpoint",))
+HEDGES = metrics.counter("openai_hedges", "Hedge requests sent after the hedge delay", ("endpoint",))
+WINS = metrics.counter("openai_hedge_wins", "Hedged calls won, by endpoint and attempt", ("endpoint", "attempt"))
+HEDGE_DELAY = metrics.gauge("openai_hedge_delay_seconds", "Current hedge delay per endpoint", ("endpoint",))
+
+class LatencyWindow:
+    """Rolling window of recent latencies."""
+
+    def __init__(self, size: int = 200):
+        self._samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def add(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def percentile(self, q: float) -> Optional[float]:
+        """Nearest-rank percentile (0-100), or None without samples."""
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return None
+        rank = max(math.ceil(q / 100.0 * len(samples)), 1)
+        return samples[min(rank, len(samples)) - 1]
+
+class Endpoint:
+    """A named OpenAI-compatible client with its latency history."""
+
+    def __init__(self, name: str, client: Any):
+        self.name = name
+        self.client = client
+        self.latencies = LatencyWindow()
+
+class HedgedCaller:
+    """
+    Routes calls by observed latency and hedges slow ones.
+
+    Args:
+        endpoints: Candidate endpoints in preference order
+        enabled: When False calls go straight to the fastest endpoint
+        percentile: Latency percentile used as the hedge delay
+        initial_delay: Hedge delay until ``min_samples`` latencies are known
+        min_delay: Lower bound on the hedge delay
+        min_samples: Samples needed before the rolling percentile is trusted
+        explore_fraction: Share of calls sent first to an endpoint still short of ``min_samples``
+        max_workers: Threads available for in-flight attempts
+    """
+
+    def __init__(
+        self,
+        endpoints: List[Endpoint],
+        enabled: bool,
+        percentile: float,
+        initial_delay: float,
+        min_delay: float,
+        min_samples: int = 20,
+        explore_fraction: float = 0.05,
+        max_workers: int = 64
+    ):
+        if not endpoints:
+            raise ValueError("HedgedCaller needs at least one endpoint")
+        self.endpoints = endpoints
+        self.enabled = enabled
+        self.percentile = percentile
+        self.initial_delay = initial_delay
+        self.min_delay = min_delay
+        self.min_samples = min_samples
+        self.explore_fraction = explore_fraction
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="openai-hedge")
+        HEDGE_DELAY.set_function(lambda: {(e.name,): self.hedge_delay(e) for e in self.endpoints})
+
+    @classmethod
+    def from_config(cls) -> "HedgedCaller":
+        from src.lib.openai_client import get_openai_client, get_secondary_openai_client
+
+        endpoints = [Endpoint("primary", get_openai_client())]
+        secondary = get_secondary_openai_client()
+        if secondary is not None:
+            endpoints.append(Endpoint("secondary", secondary))
+        return cls(
+            endpoints,
+            enabled=config.OPENAI_HEDGE_ENABLED,
+            percentile=config.OPENAI_HEDGE_PERCENTILE,
+            initial_delay=config.OPENAI_HEDGE_INITIAL_DELAY_MS / 1000.0,
+            min_delay=config.OPENAI_HEDGE_MIN_DELAY_MS / 1000.0,
+        )
+
+    def hedge_delay(self, endpoint: Endpoint) -> float:
+        if len(endpoint.latencies) < self.min_samples:
+            return self.initial_delay
+        return max(self.min_delay, endpoint.latencies.percentile(self.percentile))
+
+    def _ranked(self) -> List[Endpoint]:
+        """
+        Measured endpoints by median latency, then unmeasured ones in configured order.
+
+        An explore_fraction of calls moves the first unmeasured endpoint to the
+        front, so a secondary that only ever served hedges still gets a median.
+        """
+        def key(endpoint: Endpoint):
+            if len(endpoint.latencies) < self.min_samples:
+                return (1, 0.0)
+            return (0, endpoint.latencies.percentile(50))
+        ranked = sorted(self.endpoints, key=key)
+        unmeasured = [e for e in ranked if len(e.latencies) < self.min_samples]
+        if unmeasured and len(unmeasured) < len(ranked) and random.random() < self.explore_fraction:
+            ranked.remove(unmeasured[0])
+            ranked.insert(0, unmeasured[0])
+        return ranked
+
+    def _attempt(self, endpoint: Endpoint, fn: Callable[[Any], T], attempt_deadline: Optional[deadline.Deadline]) -> T:
+        started = time.monotonic()
+        try:
+            with deadline.use(attempt_deadline):
+                result = fn(endpoint.client)
+        except RequestCancelledError:
+            raise
+        except Exception:
+            ENDPOINT_ERRORS.inc(endpoint=endpoint.name)
+            raise
+        elapsed = time.monotonic() - started
+        endpoint.latencies.add(elapsed)
+        ENDPOINT_LATENCY.observe(elapsed, endpoint=endpoint.name)
+        return result
+
+    def call(self, fn: Callable[[Any], T]) -> T:
+        """
+        Run ``fn(client)`` against the best endpoint, hedging if it is slow.
+
+        Args:
+            fn: Callable performing the request with the given client
+        """
+        ranked = self._ranked()
+        primary = ranked[0]
+        if not self.enabled:
+            return self._attempt(primary, fn, deadline.current())
+
+        hedge = ranked[1] if len(ranked) > 1 else primary
+        futures: Dict[Future, tuple] = {}
+        deadlines: Dict[Future, deadline.Deadline] = {}
+
+        def submit(endpoint: Endpoint, attempt: str) -> None:
+            attempt_deadline = deadline.Deadline.attempt(deadline.current())
+            future = self._executor.submit(propagate_context(self._attempt), endpoint, fn, attempt_deadline)
+            futures[future] = (endpoint, attempt)
+            deadlines[future] = attempt_deadline
+
+        submit(primary, "primary")
+
+        done, pending = wait(futures, timeout=self.hedge_delay(primary))
+        if not done:
+            HEDGES.inc(endpoint=hedge.name)
+            logger.info(f"Hedging slow OpenAI call on {primary.name} with {hedge.name}")
+            submit(hedge, "hedge")
+            pending = set(futures)
+
+        first_error: Optional[BaseException] = None
+        while True:
+            for future in done:
+                error = future.exception()
+                if error is None:
+                    endpoint, attempt = futures[future]
+                    for other in pending:
+                        other.cancel()
+                        deadlines[other].cancel()
+                    WINS.inc(endpoint=endpoint.name, attempt=attempt)
+                    span = get_current_span()
+                    if span is not None:
+                        span.set_attributes({"openai.endpoint": endpoint.name, "openai.hedged": len(futures) > 1})
+                    return future.result()
+                if first_error is None:
+                    first_error = error
+            pending = {f for f in pending if not f.done()}
+            if not pending:
+                raise first_error
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
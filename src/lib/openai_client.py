@@ -1,10 +1,57 @@
 """OpenAI client initialization."""
+from typing import Any, Callable, Dict
+
 from openai import OpenAI
 from src.config import config
 
+def _openai_provider() -> Any:
+    """Real OpenAI (or any OpenAI-compatible endpoint via OPENAI_BASE_URL)."""
+    # Retries are handled by the rate-limit scheduler (src.lib.rate_limiter),
+    # which honours Retry-After across all callers instead of per request.
+    return OpenAI(api_key=config.OPENAI_API_KEY, base_url=config.OPENAI_BASE_URL, max_retries=0)
+
+def _fake_provider() -> Any:
+    """Deterministic in-process backend for offline performance testing."""
+    from src.lib.fake_openai import FakeOpenAIClient
+    return FakeOpenAIClient()
+
+# Provider name -> factory returning an object with the OpenAI SDK surface
+# used by the services (embeddings.create, chat.completions.create).
+PROVIDERS: Dict[str, Callable[[], Any]] = {
+    "openai": _openai_provider,
+    "fake": _fake_provider,
+}
+
+def register_provider(name: str, factory: Callable[[], Any]) -> None:
+    """Register an additional client provider selectable via OPENAI_PROVIDER."""
+    PROVIDERS[name] = factory
+
+def create_client(provider: str) -> Any:
+    """Build a client for the named provider."""
+    factory = PROVIDERS.get(provider)
+    if factory is None:
+        raise ValueError(f"Unknown OPENAI_PROVIDER '{provider}'. Available: {', '.join(sorted(PROVIDERS))}")
+    return factory()
+
 # Initialize OpenAI client
-client = OpenAI(api_key=config.OPENAI_API_KEY)
+client = create_client(config.OPENAI_PROVIDER)
+
+def _secondary_client() -> Any:
+    """Client for the optional secondary endpoint used for hedged chat requests."""
+    if not config.OPENAI_SECONDARY_BASE_URL:
+        return None
+    return OpenAI(
+        api_key=config.OPENAI_SECONDARY_API_KEY or config.OPENAI_API_KEY or "unused",
+        base_url=config.OPENAI_SECONDARY_BASE_URL,
+        max_retries=0
+    )
+
+secondary_client = _secondary_client()
 
 def get_openai_client():
     """Get OpenAI client instance."""
     return client
+
+def get_secondary_openai_client():
+    """Get the secondary OpenAI-compatible client, or None if not configured."""
+    return secondary_client
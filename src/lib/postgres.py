@@ -1,26 +1,163 @@
 """PostgreSQL database connection management."""
 from contextlib import contextmanager
-from sqlalchemy import create_engine, text
+from typing import Dict, Any
+from sqlalchemy import create_engine, event, text
 from sqlalchemy.orm import sessionmaker, Session
-from sqlalchemy.exc import OperationalError
+from sqlalchemy.exc import OperationalError, TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import NullPool, QueuePool
 import logging
+import time
 
 from src.config import config
+from src.lib import deadline, metrics, tracing
+from src.lib.circuit_breaker import get_breaker
 from src.models.base import Base
 
 logger = logging.getLogger(__name__)
 
-# Create engine
-engine = create_engine(
-    config.DATABASE_URL,
-    pool_pre_ping=True,  # Verify connections before using
-    pool_size=5,
-    max_overflow=10
+# Connection pool metrics
+POOL_CHECKOUT_WAIT = metrics.histogram(
+    "db_pool_checkout_wait_seconds",
+    "Time spent waiting for a connection from the pool"
+)
+POOL_CHECKOUTS = metrics.counter("db_pool_checkouts", "Connections checked out of the pool")
+POOL_CHECKOUT_TIMEOUTS = metrics.counter(
+    "db_pool_checkout_timeouts",
+    "Checkouts that failed because the pool was exhausted"
 )
+POOL_CONNECTIONS_OPENED = metrics.counter("db_pool_connections_opened", "New DBAPI connections opened")
+POOL_INVALIDATIONS = metrics.counter("db_pool_invalidations", "Connections invalidated by the pool")
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that records how long callers wait for a connection."""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            POOL_CHECKOUT_TIMEOUTS.inc()
+            raise
+        finally:
+            POOL_CHECKOUT_WAIT.observe(time.perf_counter() - start)
+
+class InstrumentedNullPool(NullPool):
+    """NullPool that records connect time as checkout wait (PgBouncer mode)."""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            POOL_CHECKOUT_WAIT.observe(time.perf_counter() - start)
+
+def _build_engine():
+    """Create the SQLAlchemy engine from pool settings in Config."""
+    engine_kwargs: Dict[str, Any] = {
+        "pool_pre_ping": config.DB_POOL_PRE_PING,  # Verify connections before using
+    }
+    connect_args: Dict[str, Any] = {}
+    
+    if config.DB_PGBOUNCER_TRANSACTION_MODE:
+        # PgBouncer owns the pooling; a local pool would pin server connections.
+        # Startup "options" are rejected by PgBouncer, so statement_timeout is
+        # applied per transaction in _apply_statement_timeout instead.
+        engine_kwargs["poolclass"] = InstrumentedNullPool
+    else:
+        engine_kwargs.update(
+            poolclass=InstrumentedQueuePool,
+            pool_size=config.DB_POOL_SIZE,
+            max_overflow=config.DB_MAX_OVERFLOW,
+            pool_timeout=config.DB_POOL_TIMEOUT,
+            pool_recycle=config.DB_POOL_RECYCLE,
+        )
+        if config.DB_STATEMENT_TIMEOUT_MS > 0:
+            connect_args["options"] = f"-c statement_timeout={config.DB_STATEMENT_TIMEOUT_MS}"
+    
+    return create_engine(config.DATABASE_URL, connect_args=connect_args, **engine_kwargs)
+
+# Create engine
+engine = _build_engine()
+
+tracing.instrument_sqlalchemy(engine)
+
+@event.listens_for(engine, "connect")
+def _on_connect(dbapi_connection, connection_record):
+    POOL_CONNECTIONS_OPENED.inc()
+
+@event.listens_for(engine, "checkout")
+def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+    POOL_CHECKOUTS.inc()
+
+@event.listens_for(engine, "invalidate")
+def _on_invalidate(dbapi_connection, connection_record, exception):
+    POOL_INVALIDATIONS.inc()
+
+# A request deadline only replaces the session's statement_timeout once it is
+# below this share of it; closer to it, the extra SET LOCAL round trip on every
+# transaction costs more than the bounded overrun it would prevent
+_DEADLINE_TIMEOUT_RATIO = 0.5
+
+@event.listens_for(engine, "begin")
+def _apply_statement_timeout(conn):
+    """
+    Cap statement_timeout for the transaction at the request's remaining time.
+    
+    Under PgBouncer the configured timeout is also applied here, scoped to the
+    transaction so it never leaks across PgBouncer clients. Otherwise the
+    session already has DB_STATEMENT_TIMEOUT_MS, and it is only tightened
+    when the remaining time is well below it.
+    """
+    deadline.check("database transaction")
+    configured_ms = config.DB_STATEMENT_TIMEOUT_MS
+    timeout_ms = int(configured_ms) if config.DB_PGBOUNCER_TRANSACTION_MODE else 0
+    remaining = deadline.remaining()
+    if remaining is not None:
+        remaining_ms = max(int(remaining * 1000), 1)
+        if configured_ms <= 0 or remaining_ms < configured_ms * _DEADLINE_TIMEOUT_RATIO:
+            timeout_ms = remaining_ms
+        elif timeout_ms > 0:
+            timeout_ms = min(timeout_ms, remaining_ms)
+    if timeout_ms > 0:
+        conn.exec_driver_sql(f"SET LOCAL statement_timeout = {timeout_ms}")
+
+def get_pool_stats() -> Dict[str, Any]:
+    """
+    Get a snapshot of connection pool usage.
+    
+    Returns:
+        Dictionary with pool configuration and current utilisation
+    """
+    pool = engine.pool
+    if isinstance(pool, QueuePool):
+        return {
+            "mode": "queue",
+            "size": pool.size(),
+            "max_overflow": config.DB_MAX_OVERFLOW,
+            "checked_in": pool.checkedin(),
+            "in_use": pool.checkedout(),
+            "overflow": max(pool.overflow(), 0),
+        }
+    return {"mode": "pgbouncer", "size": 0, "max_overflow": 0, "checked_in": 0, "in_use": 0, "overflow": 0}
+
+def _pool_gauge(field: str):
+    return lambda: {(): float(get_pool_stats()[field])}
+
+metrics.gauge("db_pool_size", "Configured persistent pool size").set_function(_pool_gauge("size"))
+metrics.gauge("db_pool_in_use", "Connections currently checked out").set_function(_pool_gauge("in_use"))
+metrics.gauge("db_pool_idle", "Connections idle in the pool").set_function(_pool_gauge("checked_in"))
+metrics.gauge("db_pool_overflow", "Overflow connections currently open").set_function(_pool_gauge("overflow"))
 
 # Create session factory
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Fails fast while the database is unreachable or the pool is exhausted
+_db_breaker = get_breaker(
+    "postgres",
+    failure_types=(OperationalError, PoolTimeoutError),
+    slow_call_s=config.CIRCUIT_DB_SLOW_CALL_S
+)
+
 @contextmanager
 def get_db() -> Session:
     """
@@ -34,15 +171,22 @@ def get_db() -> Session:
     Yields:
         SQLAlchemy Session
     """
-    db = SessionLocal()
-    try:
-        yield db
-        db.commit()
-    except Exception:
-        db.rollback()
-        raise
-    finally:
-        db.close()
+    with metrics.track_stage("db_session"):
+        db = SessionLocal()
+        try:
+            # Check out the connection up front so a failing database trips
+            # the breaker here instead of on the first query
+            with _db_breaker.guard():
+                db.connection()
+            yield db
+            db.commit()
+        except Exception:
+            db.rollback()
+            # A statement cancelled by the deadline-derived timeout surfaces as a 504
+            deadline.check("database query")
+            raise
+        finally:
+            db.close()
 
 def check_database_connection() -> bool:
     """
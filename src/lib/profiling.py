@@ -0,0 +1,228 @@
+"""On-demand sampling profiler for individual requests."""
+import contextvars
+import json
+import logging
+import marshal
+import os
+import random
+import re
+import secrets
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from src.config import config
+
+logger = logging.getLogger(__name__)
+
+Frame = Tuple[str, int, str]  # (filename, first line, function name)
+
+_PROFILER_THREAD_PREFIX = "request-profiler"
+_SRC_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_SAFE_ID_RE = re.compile(r"[^A-Za-z0-9_.-]")
+
+class SamplingProfiler:
+    """
+    Periodically snapshot thread stacks while a request runs.
+
+    Request work runs on anyio worker threads (and executor threads that
+    inherit the request's context), which are shared with other requests. A
+    thread is only sampled while it runs a ``@traced`` function or a
+    ``track_stage`` block on behalf of the profiled request, so concurrent
+    requests stay out of the profile.
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.samples: List[Tuple[str, Tuple[Frame, ...]]] = []
+        self.started_at = 0.0
+        self.duration = 0.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._threads: Dict[int, int] = {}  # thread ident -> nesting depth
+        self._threads_lock = threading.Lock()
+
+    @contextmanager
+    def use(self) -> Iterator[None]:
+        """Make this the profiler of the current request (its context and the threads it spawns)."""
+        token = _current.set(self)
+        try:
+            yield
+        finally:
+            _current.reset(token)
+
+    def _enter_thread(self, ident: int) -> None:
+        with self._threads_lock:
+            self._threads[ident] = self._threads.get(ident, 0) + 1
+
+    def _exit_thread(self, ident: int) -> None:
+        with self._threads_lock:
+            depth = self._threads.pop(ident) - 1
+            if depth:
+                self._threads[ident] = depth
+
+    def start(self) -> None:
+        self.started_at = time.perf_counter()
+        self._thread = threading.Thread(
+            target=self._run,
+            name=f"{_PROFILER_THREAD_PREFIX}-{secrets.token_hex(3)}",
+            daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.duration = time.perf_counter() - self.started_at
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            with self._threads_lock:
+                working = set(self._threads)
+            if not working:
+                continue
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id not in working:
+                    continue
+                thread_name = names.get(thread_id, str(thread_id))
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append((code.co_filename, code.co_firstlineno, code.co_name))
+                    frame = frame.f_back
+                if not any(filename.startswith(_SRC_ROOT) for filename, _, _ in stack):
+                    continue
+                stack.reverse()  # root first
+                self.samples.append((thread_name, tuple(stack)))
+
+    def to_speedscope(self, name: str) -> Dict:
+        """Render samples in speedscope's sampled-profile format."""
+        frame_index: Dict[Frame, int] = {}
+        frames = []
+        per_thread: Dict[str, List[List[int]]] = {}
+        for thread_name, stack in self.samples:
+            indices = []
+            for frame in stack:
+                if frame not in frame_index:
+                    frame_index[frame] = len(frames)
+                    frames.append({"name": frame[2], "file": frame[0], "line": frame[1]})
+                indices.append(frame_index[frame])
+            per_thread.setdefault(thread_name, []).append(indices)
+
+        profiles = []
+        for thread_name, stacks in per_thread.items():
+            profiles.append({
+                "type": "sampled",
+                "name": thread_name,
+                "unit": "seconds",
+                "startValue": 0,
+                "endValue": len(stacks) * self.interval,
+                "samples": stacks,
+                "weights": [self.interval] * len(stacks),
+            })
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": name,
+            "exporter": "job-email-generator",
+            "activeProfileIndex": 0,
+            "shared": {"frames": frames},
+            "profiles": profiles,
+        }
+
+    def to_pstats(self) -> Dict:
+        """
+        Convert samples to the dict that ``pstats.Stats`` loads via marshal.
+
+        Call counts are sample counts, and times are estimated as samples
+        multiplied by the sampling interval.
+        """
+        stats: Dict = {}
+
+        def entry(frame: Frame):
+            if frame not in stats:
+                stats[frame] = [0, 0, 0.0, 0.0, {}]
+            return stats[frame]
+
+        for _, stack in self.samples:
+            seen = set()
+            for depth, frame in enumerate(stack):
+                record = entry(frame)
+                if frame not in seen:
+                    seen.add(frame)
+                    record[0] += 1
+                    record[1] += 1
+                    record[3] += self.interval
+                if depth > 0:
+                    caller = stack[depth - 1]
+                    cc, nc, tt, ct = record[4].get(caller, (0, 0, 0.0, 0.0))
+                    leaf = self.interval if depth == len(stack) - 1 else 0.0
+                    record[4][caller] = (cc + 1, nc + 1, tt + leaf, ct + self.interval)
+            entry(stack[-1])[2] += self.interval
+
+        return {frame: (cc, nc, tt, ct, callers) for frame, (cc, nc, tt, ct, callers) in stats.items()}
+
+    def write(self, request_id: str) -> str:
+        """
+        Write the profile to PROFILE_DIR keyed by request id.
+
+        Returns:
+            Path of the written profile
+        """
+        os.makedirs(config.PROFILE_DIR, exist_ok=True)
+        safe_id = _SAFE_ID_RE.sub("_", request_id)[:128]
+        if config.PROFILE_FORMAT == "pstats":
+            path = os.path.join(config.PROFILE_DIR, f"{safe_id}.pstats")
+            with open(path, "wb") as handle:
+                marshal.dump(self.to_pstats(), handle)
+        else:
+            path = os.path.join(config.PROFILE_DIR, f"{safe_id}.speedscope.json")
+            with open(path, "w", encoding="utf-8") as handle:
+                json.dump(self.to_speedscope(safe_id), handle)
+        logger.info(
+            f"Request profile written: {path} "
+            f"({len(self.samples)} samples over {self.duration * 1000:.0f} ms)"
+        )
+        return path
+
+_current: contextvars.ContextVar[Optional[SamplingProfiler]] = contextvars.ContextVar("request_profiler", default=None)
+
+@contextmanager
+def profiled_thread() -> Iterator[None]:
+    """
+    Mark the current thread as working for the profiled request, if any,
+    while the block runs. Used by ``@traced`` and ``track_stage``.
+    """
+    profiler = _current.get()
+    if profiler is None:
+        yield
+        return
+    ident = threading.get_ident()
+    profiler._enter_thread(ident)
+    try:
+        yield
+    finally:
+        profiler._exit_thread(ident)
+
+def should_profile(header_token: Optional[str], query_token: Optional[str]) -> bool:
+    """
+    Decide whether a request should be profiled.
+
+    A request is profiled when it carries the admin token in the
+    X-Profile header or ``profile`` query parameter, or when it is picked
+    by the PROFILE_SAMPLE_RATE random sample.
+    """
+    admin_token = config.PROFILE_ADMIN_TOKEN
+    if admin_token:
+        for token in (header_token, query_token):
+            # Compared as bytes: compare_digest rejects non-ASCII str
+            if token and secrets.compare_digest(token.encode(), admin_token.encode()):
+                return True
+    return config.PROFILE_SAMPLE_RATE > 0 and random.random() < config.PROFILE_SAMPLE_RATE
+
+def new_profiler() -> SamplingProfiler:
+    """Create a profiler using the configured sampling interval."""
+    return SamplingProfiler(interval=config.PROFILE_INTERVAL_MS / 1000.0)
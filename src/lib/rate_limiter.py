@@ -0,0 +1,290 @@
+"""Client-side OpenAI rate-limit scheduler.
+
+Each model gets a requests-per-minute and a tokens-per-minute token bucket.
+Callers reserve capacity before calling the API and sleep until their
+reservation is due, so bursts are queued under the limits instead of being
+sent to OpenAI and rejected. When a 429 still comes back, the scheduler
+honours Retry-After, retries with jittered exponential backoff, and lowers
+the model's effective rate (recovering gradually on success).
+"""
+import contextlib
+import logging
+import random
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple, TypeVar
+
+import openai
+
+from src.config import config
+from src.lib import deadline, metrics
+from src.lib.errors import ServiceUnavailableError
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+QUEUE_WAIT = metrics.histogram(
+    "openai_scheduler_queue_wait_seconds",
+    "Time calls spent queued for rate-limit capacity",
+    ("model",)
+)
+RATE_LIMITED = metrics.counter("openai_rate_limited", "429 responses received from OpenAI", ("model",))
+RETRIES = metrics.counter("openai_retries", "OpenAI calls retried after a transient error", ("model", "reason"))
+SHED = metrics.counter("openai_scheduler_rejected", "Calls rejected because the queue wait was too long", ("model",))
+RATE_FACTOR = metrics.gauge(
+    "openai_scheduler_rate_factor",
+    "Adaptive fraction of the configured rate currently in use",
+    ("model",)
+)
+
+_RETRYABLE = (
+    openai.RateLimitError,
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    openai.InternalServerError,
+)
+
+class RateLimitExceededError(ServiceUnavailableError):
+    """OpenAI capacity for a model is exhausted for longer than callers may wait."""
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token for English text)."""
+    return max(len(text) // 4, 1)
+
+class TokenBucket:
+    """
+    Token bucket that hands out future reservations.
+
+    ``reserve`` always succeeds by letting the balance go negative and
+    returns how long the caller must wait for its tokens, which serves
+    concurrent callers in arrival order.
+    """
+
+    def __init__(self, capacity: float, refill_per_second: float):
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+        self._tokens = capacity
+        self._updated = time.monotonic()
+
+    def _refill(self, now: float, rate_factor: float) -> None:
+        elapsed = now - self._updated
+        self._updated = now
+        self._tokens = min(self.capacity, self._tokens + elapsed * self.refill_per_second * rate_factor)
+
+    def reserve(self, amount: float, now: float, rate_factor: float) -> float:
+        """Take ``amount`` tokens and return the seconds until they are available."""
+        self._refill(now, rate_factor)
+        # A single request larger than the bucket would otherwise never fit
+        amount = min(amount, self.capacity)
+        self._tokens -= amount
+        if self._tokens >= 0:
+            return 0.0
+        return -self._tokens / (self.refill_per_second * rate_factor)
+
+    def refund(self, amount: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + min(amount, self.capacity))
+
+class ModelBudget:
+    """RPM/TPM budget for one model with AIMD rate adaptation."""
+
+    MIN_RATE_FACTOR = 0.1
+    DECREASE = 0.7   # multiplicative decrease on 429
+    INCREASE = 0.02  # additive increase per success
+
+    def __init__(self, model: str, rpm: int, tpm: int):
+        self.model = model
+        self.requests = TokenBucket(rpm, rpm / 60.0)
+        self.tokens = TokenBucket(tpm, tpm / 60.0)
+        self.rate_factor = 1.0
+        self.blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def reserve(self, tokens: int, max_wait: float) -> float:
+        """
+        Reserve one request and ``tokens`` tokens.
+
+        Returns:
+            Seconds to wait before sending
+
+        Raises:
+            RateLimitExceededError: If the wait would exceed ``max_wait``
+        """
+        with self._lock:
+            now = time.monotonic()
+            wait = max(
+                self.requests.reserve(1, now, self.rate_factor),
+                self.tokens.reserve(tokens, now, self.rate_factor),
+                self.blocked_until - now,
+            )
+            if wait > max_wait:
+                self._refund(tokens)
+                raise RateLimitExceededError(
+                    f"OpenAI rate limit for {self.model} exhausted; retry in {wait:.1f}s",
+                    retry_after=wait
+                )
+            return wait
+
+    def _refund(self, tokens: int) -> None:
+        self.requests.refund(1)
+        self.tokens.refund(tokens)
+
+    def release(self, tokens: int) -> None:
+        """Give back a reservation whose request will not be sent, or whose result is no longer wanted."""
+        with self._lock:
+            self._refund(tokens)
+
+    def on_success(self) -> None:
+        with self._lock:
+            self.rate_factor = min(1.0, self.rate_factor + self.INCREASE)
+
+    def on_rate_limited(self, retry_after: float) -> None:
+        """Pause the model for ``retry_after`` and slow down subsequent traffic."""
+        with self._lock:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + retry_after)
+            self.rate_factor = max(self.MIN_RATE_FACTOR, self.rate_factor * self.DECREASE)
+
+def _parse_limits(spec: str) -> Dict[str, Tuple[int, int]]:
+    """Parse ``model:rpm:tpm,model:rpm:tpm`` into a mapping."""
+    limits = {}
+    for entry in filter(None, (part.strip() for part in spec.split(","))):
+        model, rpm, tpm = entry.rsplit(":", 2)
+        limits[model] = (int(rpm), int(tpm))
+    return limits
+
+def _retry_after_from(error: Exception) -> Optional[float]:
+    """Read Retry-After (or retry-after-ms) from an OpenAI error response."""
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    headers = response.headers
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000.0
+        if headers.get("retry-after"):
+            return float(headers["retry-after"])
+    except ValueError:
+        return None
+    return None
+
+class OpenAIScheduler:
+    """Queues OpenAI calls under per-model budgets and retries transient failures."""
+
+    def __init__(
+        self,
+        limits: Dict[str, Tuple[int, int]],
+        default_limits: Tuple[int, int],
+        max_queue_wait: float,
+        max_retries: int,
+        backoff_base: float,
+        backoff_max: float
+    ):
+        self._limits = limits
+        self._default_limits = default_limits
+        self._budgets: Dict[str, ModelBudget] = {}
+        self._lock = threading.Lock()
+        self.max_queue_wait = max_queue_wait
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        RATE_FACTOR.set_function(self._rate_factors)
+
+    @classmethod
+    def from_config(cls) -> "OpenAIScheduler":
+        return cls(
+            limits=_parse_limits(config.OPENAI_RATE_LIMITS),
+            default_limits=(config.OPENAI_DEFAULT_RPM, config.OPENAI_DEFAULT_TPM),
+            max_queue_wait=config.OPENAI_MAX_QUEUE_WAIT_S,
+            max_retries=config.OPENAI_MAX_RETRIES,
+            backoff_base=config.OPENAI_BACKOFF_BASE_S,
+            backoff_max=config.OPENAI_BACKOFF_MAX_S,
+        )
+
+    def _rate_factors(self) -> Dict[Tuple[str], float]:
+        # Snapshot under the lock: scrapes run alongside budget() inserting new models
+        with self._lock:
+            budgets = list(self._budgets.items())
+        return {(m,): b.rate_factor for m, b in budgets}
+
+    def budget(self, model: str) -> ModelBudget:
+        with self._lock:
+            budget = self._budgets.get(model)
+            if budget is None:
+                rpm, tpm = self._limits.get(model, self._default_limits)
+                budget = self._budgets[model] = ModelBudget(model, rpm, tpm)
+            return budget
+
+    def _backoff(self, attempt: int) -> float:
+        """Full-jitter exponential backoff."""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    @staticmethod
+    def _released_on_cancel(budget: ModelBudget, tokens: int):
+        current = deadline.current()
+        if current is None:
+            return contextlib.nullcontext()
+        return current.on_cancel(lambda: budget.release(tokens))
+
+    def call(self, model: str, estimated_tokens: int, fn: Callable[[], T]) -> T:
+        """
+        Run ``fn`` once the model's budget allows, retrying transient failures.
+
+        Args:
+            model: Model the call is billed against
+            estimated_tokens: Prompt plus maximum completion tokens
+            fn: Zero-argument callable performing the API request
+
+        Raises:
+            RateLimitExceededError: If capacity stays exhausted past the queue
+                deadline or retries run out on 429s
+        """
+        budget = self.budget(model)
+        attempt = 0
+        while True:
+            deadline.check("openai queue")
+            # Never queue longer than the request has left
+            remaining = deadline.remaining()
+            max_wait = self.max_queue_wait if remaining is None else min(self.max_queue_wait, remaining)
+            try:
+                wait = budget.reserve(estimated_tokens, max_wait)
+            except RateLimitExceededError:
+                SHED.inc(model=model)
+                raise
+            QUEUE_WAIT.observe(wait, model=model)
+            try:
+                # A cancelled attempt (e.g. the loser of a hedged call) hands
+                # its reservation back at once instead of holding it until
+                # its queue wait or in-flight request ends
+                with self._released_on_cancel(budget, estimated_tokens):
+                    if wait > 0:
+                        deadline.sleep(wait, "openai queue")
+                    result = fn()
+            except _RETRYABLE as e:
+                rate_limited = isinstance(e, openai.RateLimitError)
+                delay = max(_retry_after_from(e) or 0.0, self._backoff(attempt))
+                remaining = deadline.remaining()
+                if attempt >= self.max_retries or (remaining is not None and delay >= remaining):
+                    if rate_limited:
+                        RATE_LIMITED.inc(model=model)
+                        budget.on_rate_limited(delay)
+                        raise RateLimitExceededError(
+                            f"OpenAI rate limit for {model} persisted after {attempt + 1} attempts",
+                            retry_after=delay
+                        ) from e
+                    raise
+                reason = "rate_limited" if rate_limited else type(e).__name__
+                RETRIES.inc(model=model, reason=reason)
+                logger.warning(f"OpenAI {model} call failed ({reason}); retry {attempt + 1} in {delay:.2f}s")
+                if rate_limited:
+                    # Pausing the budget delays this retry and every queued call alike
+                    RATE_LIMITED.inc(model=model)
+                    budget.on_rate_limited(delay)
+                else:
+                    time.sleep(delay)
+                attempt += 1
+                continue
+            budget.on_success()
+            return result
+
+# Process-wide scheduler shared by all OpenAI calls
+scheduler = OpenAIScheduler.from_config()
@@ -0,0 +1,90 @@
+"""Single-flight request coalescing.
+
+Concurrent callers that ask for the same key share one execution of the
+underlying function: the first caller runs it, later callers block until it
+finishes and receive the same result (or exception).
+"""
+import threading
+from typing import Any, Callable, Dict, Tuple, TypeVar
+
+from src.lib import deadline, metrics
+from src.lib.errors import DeadlineExceededError
+
+T = TypeVar("T")
+
+COALESCED = metrics.counter(
+    "singleflight_coalesced",
+    "Calls served by an identical call that was already in flight",
+    ("group",)
+)
+EXECUTED = metrics.counter("singleflight_executed", "Calls that executed the underlying function", ("group",))
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: BaseException = None
+
+class SingleFlight:
+    """Deduplicates concurrent calls by key."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: Dict[str, _Call] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: str, fn: Callable[[], T]) -> T:
+        """
+        Run ``fn`` unless an identical call is in flight, then share its outcome.
+
+        Results are not cached: once the in-flight call completes, the next
+        call with the same key executes again.
+        """
+        result, _ = self.do_with_status(key, fn)
+        return result
+
+    def do_with_status(self, key: str, fn: Callable[[], T]) -> Tuple[T, bool]:
+        """
+        Like ``do`` but also report whether the result was shared.
+
+        Followers wait only as long as their own request deadline allows. If
+        the leader gave up because of *its* deadline or disconnect, followers
+        retry instead of inheriting that failure.
+        """
+        while True:
+            with self._lock:
+                call = self._calls.get(key)
+                if call is not None:
+                    leader = False
+                else:
+                    call = self._calls[key] = _Call()
+                    leader = True
+
+            if leader:
+                break
+            COALESCED.inc(group=self.name)
+            deadline.wait(call.done, "shared call")
+            if isinstance(call.error, DeadlineExceededError):
+                continue
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        EXECUTED.inc(group=self.name)
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+    def in_flight(self) -> int:
+        """Number of distinct keys currently executing."""
+        with self._lock:
+            return len(self._calls)
@@ -0,0 +1,327 @@
+"""Lightweight OpenTelemetry-compatible tracing.
+
+Spans follow the OpenTelemetry data model (trace/span ids, parent links,
+attributes, status) and are exported as OTLP/JSON so a collector's file
+receiver or any OTLP tooling can read them. Trace context is carried in a
+contextvar and propagated over HTTP with the W3C ``traceparent`` header.
+"""
+import contextvars
+import functools
+import json
+import logging
+import os
+import re
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional
+
+from src.config import config
+from src.lib.profiling import profiled_thread
+
+logger = logging.getLogger(__name__)
+
+# OTLP span kinds
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_SERVER = 2
+SPAN_KIND_CLIENT = 3
+
+# OTLP status codes
+STATUS_UNSET = 0
+STATUS_OK = 1
+STATUS_ERROR = 2
+
+_TRACEPARENT_RE = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+class Span:
+    """A single timed operation within a trace."""
+
+    def __init__(
+        self,
+        name: str,
+        trace_id: str,
+        parent_span_id: Optional[str] = None,
+        kind: int = SPAN_KIND_INTERNAL,
+        attributes: Optional[Dict[str, Any]] = None
+    ):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_span_id = parent_span_id
+        self.kind = kind
+        self.attributes: Dict[str, Any] = dict(attributes or {})
+        self.status_code = STATUS_UNSET
+        self.status_message = ""
+        self.start_time_ns = time.time_ns()
+        self.end_time_ns: Optional[int] = None
+
+    def update_name(self, name: str) -> None:
+        self.name = name
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        if value is not None:
+            self.attributes[key] = value
+
+    def set_attributes(self, attributes: Dict[str, Any]) -> None:
+        for key, value in attributes.items():
+            self.set_attribute(key, value)
+
+    def record_exception(self, exc: BaseException) -> None:
+        self.status_code = STATUS_ERROR
+        self.status_message = f"{type(exc).__name__}: {exc}"
+        self.attributes["exception.type"] = type(exc).__name__
+
+    def end(self) -> None:
+        if self.end_time_ns is not None:
+            return
+        self.end_time_ns = time.time_ns()
+        _exporter.export(self)
+
+    @property
+    def traceparent(self) -> str:
+        """W3C traceparent header value for this span."""
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    def to_otlp(self) -> Dict[str, Any]:
+        """Convert to an OTLP/JSON span object."""
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": str(self.start_time_ns),
+            "endTimeUnixNano": str(self.end_time_ns or time.time_ns()),
+            "attributes": [_otlp_attribute(k, v) for k, v in self.attributes.items()],
+            "status": {"code": self.status_code},
+        }
+        if self.parent_span_id:
+            span["parentSpanId"] = self.parent_span_id
+        if self.status_message:
+            span["status"]["message"] = self.status_message
+        return span
+
+class _NoopSpan:
+    """Span stand-in used when tracing is disabled."""
+    trace_id = None
+    span_id = None
+    traceparent = None
+
+    def update_name(self, name: str) -> None:
+        pass
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+    def set_attributes(self, attributes: Dict[str, Any]) -> None:
+        pass
+
+    def record_exception(self, exc: BaseException) -> None:
+        pass
+
+    def end(self) -> None:
+        pass
+
+NOOP_SPAN = _NoopSpan()
+
+def _otlp_attribute(key: str, value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        typed = {"boolValue": value}
+    elif isinstance(value, int):
+        typed = {"intValue": str(value)}
+    elif isinstance(value, float):
+        typed = {"doubleValue": value}
+    else:
+        typed = {"stringValue": str(value)}
+    return {"key": key, "value": typed}
+
+def _resource_spans(spans: List[Span]) -> Dict[str, Any]:
+    return {
+        "resourceSpans": [{
+            "resource": {
+                "attributes": [_otlp_attribute("service.name", config.TRACING_SERVICE_NAME)]
+            },
+            "scopeSpans": [{
+                "scope": {"name": "src.lib.tracing"},
+                "spans": [span.to_otlp() for span in spans]
+            }]
+        }]
+    }
+
+class NoopExporter:
+    """Discards finished spans."""
+
+    def export(self, span: Span) -> None:
+        pass
+
+class ConsoleExporter:
+    """Logs each finished span as a compact one-line summary."""
+
+    def export(self, span: Span) -> None:
+        duration_ms = ((span.end_time_ns or 0) - span.start_time_ns) / 1e6
+        logger.info(
+            f"span name={span.name} trace_id={span.trace_id} span_id={span.span_id} "
+            f"parent={span.parent_span_id or '-'} duration_ms={duration_ms:.2f} "
+            f"attributes={json.dumps(span.attributes, default=str)}"
+        )
+
+class FileExporter:
+    """Appends finished spans to a file as OTLP/JSON lines."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def export(self, span: Span) -> None:
+        line = json.dumps(_resource_spans([span]), default=str)
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as handle:
+                handle.write(line + "\n")
+
+def _build_exporter():
+    exporter = (config.TRACING_EXPORTER or "none").lower()
+    if exporter == "console":
+        return ConsoleExporter()
+    if exporter == "file":
+        return FileExporter(config.TRACING_FILE_PATH)
+    if exporter != "none":
+        logger.warning(f"Unknown TRACING_EXPORTER '{exporter}', tracing disabled")
+    return NoopExporter()
+
+_exporter = _build_exporter()
+_current_span: contextvars.ContextVar = contextvars.ContextVar("current_span", default=None)
+
+def is_enabled() -> bool:
+    """Whether spans are being exported."""
+    return not isinstance(_exporter, NoopExporter)
+
+def get_current_span():
+    """Get the active span, or None outside any trace."""
+    return _current_span.get()
+
+def parse_traceparent(header: Optional[str]) -> Optional[Dict[str, str]]:
+    """
+    Parse a W3C traceparent header.
+
+    Returns:
+        Dictionary with trace_id and span_id, or None if missing/invalid
+    """
+    if not header:
+        return None
+    match = _TRACEPARENT_RE.match(header.strip().lower())
+    if not match or match.group(1) == "0" * 32:
+        return None
+    return {"trace_id": match.group(1), "span_id": match.group(2)}
+
+def start_span(
+    name: str,
+    attributes: Optional[Dict[str, Any]] = None,
+    kind: int = SPAN_KIND_INTERNAL,
+    traceparent: Optional[str] = None
+):
+    """
+    Start a span without making it current; the caller must call ``end()``.
+
+    The parent is taken from ``traceparent`` when given, otherwise from the
+    active span in this context.
+    """
+    if not is_enabled():
+        return NOOP_SPAN
+    remote = parse_traceparent(traceparent)
+    if remote:
+        return Span(name, remote["trace_id"], remote["span_id"], kind, attributes)
+    parent = _current_span.get()
+    if parent is not None:
+        return Span(name, parent.trace_id, parent.span_id, kind, attributes)
+    return Span(name, secrets.token_hex(16), None, kind, attributes)
+
+@contextmanager
+def start_as_current_span(
+    name: str,
+    attributes: Optional[Dict[str, Any]] = None,
+    kind: int = SPAN_KIND_INTERNAL,
+    traceparent: Optional[str] = None
+):
+    """
+    Start a span, make it current for the enclosed block and end it on exit.
+
+    Usage:
+        with start_as_current_span("openai.chat", {"gen_ai.request.model": model}) as span:
+            ...
+    """
+    span = start_span(name, attributes, kind, traceparent)
+    if span is NOOP_SPAN:
+        yield span
+        return
+    token = _current_span.set(span)
+    try:
+        yield span
+    except BaseException as e:
+        span.record_exception(e)
+        raise
+    finally:
+        _current_span.reset(token)
+        span.end()
+
+def traced(name: Optional[str] = None):
+    """Decorator that runs the function inside its own span."""
+    def decorator(func):
+        span_name = name or f"{func.__module__.rsplit('.', 1)[-1]}.{func.__name__}"
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with start_as_current_span(span_name), profiled_thread():
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def propagate_context(func: Callable) -> Callable:
+    """
+    Bind ``func`` to the current context (active span included).
+
+    Use when handing work to a background thread or executor so spans it
+    creates stay in the submitting request's trace.
+    """
+    ctx = contextvars.copy_context()
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        return ctx.run(func, *args, **kwargs)
+    return wrapper
+
+def instrument_sqlalchemy(engine) -> None:
+    """Emit a client span for every SQL statement executed on ``engine``."""
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if not is_enabled():
+            return
+        operation = statement.lstrip().split(" ", 1)[0].upper() if statement else "SQL"
+        conn.info.setdefault("_trace_spans", []).append(start_span(
+            f"db.{operation.lower()}",
+            {
+                "db.system": "postgresql",
+                "db.operation": operation,
+                "db.statement": statement[:2000],
+            },
+            kind=SPAN_KIND_CLIENT
+        ))
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        spans = conn.info.get("_trace_spans")
+        if spans:
+            span = spans.pop()
+            span.set_attribute("db.rows_affected", cursor.rowcount if cursor.rowcount >= 0 else None)
+            span.end()
+
+    @event.listens_for(engine, "handle_error")
+    def _handle_error(exception_context):
+        conn = exception_context.connection
+        spans = conn.info.get("_trace_spans") if conn is not None else None
+        if spans:
+            span = spans.pop()
+            span.record_exception(exception_context.original_exception)
+            span.end()
@@ -1,19 +1,37 @@
 """FastAPI application entry point."""
-from fastapi import FastAPI, HTTPException, UploadFile, File, Form
+from fastapi import FastAPI, HTTPException, UploadFile, File, Form, Request, Depends, Query
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import ClientDisconnect
 from pydantic import BaseModel
-from typing import Optional
+from contextlib import AsyncExitStack
+from typing import Iterator, List, Optional
+import csv
+import hashlib
+import io
+import json
 import uuid
+import time
 import logging
 import traceback
+import zlib
+
+import anyio
 
 from src.config import config
+from src.lib import metrics, profiling, tracing
+from src.lib.bulkhead import BulkheadFullError, admit, admitted, configure_thread_pool
+from src.lib import deadline
+from src.lib.deadline import DeadlineMiddleware
+from src.lib.errors import DeadlineExceededError, RequestCancelledError, ServiceUnavailableError
 from src.services import (
     register_user as register_user_service, 
     get_user_by_id, 
     create_embedding, 
     generate_email as generate_email_service, 
     store_resume_embedding, 
-    create_hr_contacts as create_hr_contacts_service
+    create_hr_contacts as create_hr_contacts_service,
+    idempotency_service
 )
 from src.models.schemas import (
     RegisterRequest, 
@@ -22,9 +40,13 @@ from src.models.schemas import (
     GenerateEmailRequest, 
     GenerateEmailResponse,
     BulkCreateHRContactsRequest,
-    BulkCreateHRContactsResponse
+    BulkCreateHRContactsResponse,
+    StreamHRContactsResponse,
+    MatchCandidatesRequest,
+    MatchCandidatesResponse
 )
 from src.utils.file_parser import parse_resume_file, validate_file_size, get_supported_extensions
+from src.utils.ndjson import NDJSONLineReader
 
 # Configure logging
 logging.basicConfig(
@@ -42,6 +64,198 @@ app = FastAPI(
     version="1.0.0"
 )
 
+@app.exception_handler(ServiceUnavailableError)
+async def service_unavailable_handler(request: Request, exc: ServiceUnavailableError):
+    """Return 503 with Retry-After when a dependency is saturated or unavailable."""
+    headers = {}
+    if exc.retry_after is not None:
+        headers["Retry-After"] = str(max(int(exc.retry_after + 0.999), 1))
+    logger.warning(f"Service unavailable on {request.url.path}: {exc}")
+    return JSONResponse(status_code=503, content={"detail": str(exc)}, headers=headers)
+
+@app.exception_handler(DeadlineExceededError)
+async def deadline_exceeded_handler(request: Request, exc: DeadlineExceededError):
+    """Return 504 when the request deadline passed (499 if the client already left)."""
+    status_code = 499 if isinstance(exc, RequestCancelledError) else 504
+    logger.warning(f"Abandoned {request.url.path}: {exc}")
+    return JSONResponse(status_code=status_code, content={"detail": str(exc)})
+
+HTTP_REQUESTS = metrics.counter(
+    "http_requests",
+    "HTTP requests handled, by route template and status code",
+    ("method", "route", "status")
+)
+HTTP_REQUEST_DURATION = metrics.histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route template",
+    ("method", "route")
+)
+
+IDEMPOTENT_ROUTES = {path.strip() for path in config.IDEMPOTENT_ROUTES.split(",") if path.strip()}
+IDEMPOTENCY_OUTCOMES = metrics.counter(
+    "idempotency_requests",
+    "Requests carrying an Idempotency-Key, by outcome",
+    ("route", "outcome")
+)
+
+def _idempotency_hash(request: Request, body: bytes) -> str:
+    """Hash the request body, ignoring the random multipart boundary a retry may change."""
+    content_type = request.headers.get("content-type", "")
+    if "boundary=" in content_type:
+        boundary = content_type.split("boundary=", 1)[1].split(";", 1)[0].strip('"')
+        body = body.replace(boundary.encode("latin-1"), b"")
+    return hashlib.sha256(body).hexdigest()
+
+def _replayable(status_code: int) -> bool:
+    """Responses a retry should get back verbatim; transient failures are retried instead."""
+    return status_code < 500 and status_code not in (408, 409, 429, 499)
+
+@app.middleware("http")
+async def enforce_idempotency(request: Request, call_next):
+    """Replay the stored response for a repeated Idempotency-Key instead of redoing the work."""
+    key = request.headers.get("Idempotency-Key")
+    path = request.url.path
+    if not key or request.method != "POST" or path not in IDEMPOTENT_ROUTES:
+        return await call_next(request)
+    if len(key) > 255:
+        return JSONResponse(status_code=400, content={"detail": "Idempotency-Key must be at most 255 characters"})
+    
+    scope = f"{request.method} {path}"
+    request_hash = _idempotency_hash(request, await request.body())
+    
+    # Wait for an in-flight original, bounded by the request deadline
+    remaining = deadline.remaining()
+    wait_until = time.monotonic() + min(config.IDEMPOTENCY_WAIT_S, remaining if remaining is not None else float("inf"))
+    delay = 0.05
+    waited = False
+    try:
+        while True:
+            record = await run_in_threadpool(idempotency_service.claim_idempotency_key, scope, key, request_hash)
+            if record is None:
+                break
+            if record["request_hash"] != request_hash:
+                IDEMPOTENCY_OUTCOMES.inc(route=path, outcome="mismatch")
+                return JSONResponse(
+                    status_code=422,
+                    content={"detail": "Idempotency-Key was already used with a different request"}
+                )
+            if record["status"] == idempotency_service.COMPLETED:
+                IDEMPOTENCY_OUTCOMES.inc(route=path, outcome="waited" if waited else "replayed")
+                response = Response(
+                    content=record["response_body"],
+                    status_code=record["response_status"],
+                    media_type=record["content_type"]
+                )
+                response.headers["Idempotent-Replayed"] = "true"
+                return response
+            if time.monotonic() + delay > wait_until:
+                IDEMPOTENCY_OUTCOMES.inc(route=path, outcome="in_progress")
+                return JSONResponse(
+                    status_code=409,
+                    content={"detail": "A request with this Idempotency-Key is still in progress"},
+                    headers={"Retry-After": "1"}
+                )
+            waited = True
+            await anyio.sleep(delay)
+            delay = min(delay * 2, 1.0)
+    # Exception handlers do not cover middleware, so answer 504/499 or 503 here
+    except DeadlineExceededError as exc:
+        return await deadline_exceeded_handler(request, exc)
+    except ServiceUnavailableError as exc:
+        return await service_unavailable_handler(request, exc)
+    
+    IDEMPOTENCY_OUTCOMES.inc(route=path, outcome="executed")
+    try:
+        response = await call_next(request)
+        body = b"".join([chunk async for chunk in response.body_iterator])
+    except BaseException:
+        await run_in_threadpool(idempotency_service.release_idempotency_key, scope, key)
+        raise
+    
+    if _replayable(response.status_code):
+        await run_in_threadpool(
+            idempotency_service.complete_idempotency_key,
+            scope, key, response.status_code, body, response.headers.get("content-type")
+        )
+    else:
+        await run_in_threadpool(idempotency_service.release_idempotency_key, scope, key)
+    
+    replay = Response(content=body, status_code=response.status_code)
+    # Raw pairs keep repeated headers such as Set-Cookie
+    replay.raw_headers = list(response.headers.raw)
+    return replay
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    """Record request count and latency per route template."""
+    start = time.perf_counter()
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+        return response
+    finally:
+        # Use the route template (/hr-contacts/{hr_id}) to keep label cardinality bounded
+        route = request.scope.get("route")
+        route_path = getattr(route, "path", "unmatched")
+        HTTP_REQUESTS.inc(method=request.method, route=route_path, status=str(status_code))
+        HTTP_REQUEST_DURATION.observe(
+            time.perf_counter() - start,
+            method=request.method,
+            route=route_path
+        )
+
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    """Wrap each request in a server span, continuing any incoming W3C trace."""
+    with tracing.start_as_current_span(
+        f"HTTP {request.method}",
+        {"http.method": request.method, "http.target": request.url.path},
+        kind=tracing.SPAN_KIND_SERVER,
+        traceparent=request.headers.get("traceparent")
+    ) as span:
+        response = await call_next(request)
+        route = request.scope.get("route")
+        if route is not None:
+            span.update_name(f"HTTP {request.method} {route.path}")
+            span.set_attribute("http.route", route.path)
+        span.set_attribute("http.status_code", response.status_code)
+        if span.trace_id:
+            response.headers["X-Trace-Id"] = span.trace_id
+        return response
+
+@app.middleware("http")
+async def profile_requests(request: Request, call_next):
+    """Run admin-flagged or sampled requests under the sampling profiler."""
+    if not profiling.should_profile(
+        request.headers.get("X-Profile"),
+        request.query_params.get("profile")
+    ):
+        return await call_next(request)
+    
+    profiler = profiling.new_profiler()
+    profiler.start()
+    try:
+        with profiler.use():
+            response = await call_next(request)
+    finally:
+        profiler.stop()
+        await run_in_threadpool(profiler.write, request.state.request_id)
+    response.headers["X-Profile-Id"] = request.state.request_id
+    return response
+
+@app.middleware("http")
+async def assign_request_id(request: Request, call_next):
+    """Attach a request id (client-supplied X-Request-ID or generated) to the request and response."""
+    request_id = request.headers.get("X-Request-ID") or uuid.uuid4().hex
+    request.state.request_id = request_id
+    response = await call_next(request)
+    response.headers["X-Request-ID"] = request_id
+    return response
+
+# Outermost: every request runs under a deadline cancelled on client disconnect
+app.add_middleware(DeadlineMiddleware)
+
 @app.on_event("startup")
 async def startup_event():
     """Run startup checks."""
@@ -49,6 +263,8 @@ async def startup_event():
     logger.info("Starting Job Email Generator API...")
     logger.info("=" * 60)
     
+    configure_thread_pool()
+    
     # Check database connection
     from .lib.postgres import check_database_connection, check_pgvector_extension
     
@@ -71,22 +287,39 @@ def read_root():
 @app.get("/health")
 def health_check():
     """Detailed health check including database status."""
-    from .lib.postgres import check_database_connection, check_pgvector_extension
+    from .lib.bulkhead import get_bulkhead_stats
+    from .lib.circuit_breaker import get_breaker_states
+    from .lib.postgres import check_database_connection, check_pgvector_extension, get_pool_stats
     
     db_connected = check_database_connection()
     pgvector_enabled = check_pgvector_extension() if db_connected else False
     
+    breakers = get_breaker_states()
+    
     status = "healthy" if db_connected and pgvector_enabled else "degraded"
+    if any(breaker["state"] != "closed" for breaker in breakers.values()):
+        status = "degraded"
     
     return {
         "status": status,
         "database": {
             "connected": db_connected,
-            "pgvector_enabled": pgvector_enabled
+            "pgvector_enabled": pgvector_enabled,
+            "pool": get_pool_stats()
         },
+        "circuit_breakers": breakers,
+        "bulkheads": get_bulkhead_stats(),
         "api_version": "1.0.0"
     }
 
+@app.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics():
+    """Expose application metrics in Prometheus text format."""
+    return PlainTextResponse(
+        metrics.render_metrics(),
+        media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
 @app.post("/register", response_model=RegisterResponse)
 def register(request: RegisterRequest):
     """Register a new user with username."""
@@ -98,11 +331,13 @@ def register(request: RegisterRequest):
     except ValueError as e:
         logger.warning(f"Registration validation error: {str(e)}")
         raise HTTPException(status_code=400, detail=str(e))
+    except ServiceUnavailableError:
+        raise
     except Exception as e:
         logger.error(f"Registration failed: {str(e)}\n{traceback.format_exc()}")
         raise HTTPException(status_code=500, detail=f"Registration failed: {str(e)}")
 
-@app.get("/users/id/{username}", response_model=RegisterResponse)
+@app.get("/users/id/{username}", response_model=RegisterResponse, dependencies=[Depends(admit("db_read"))])
 def get_user_id(username: str):
     """Resolve a username to its user UUID."""
     try:
@@ -111,13 +346,13 @@ def get_user_id(username: str):
         if not user:
             raise HTTPException(status_code=404, detail=f"User '{username}' not found")
         return RegisterResponse(user_id=str(user.id))
-    except HTTPException:
+    except (HTTPException, ServiceUnavailableError):
         raise
     except Exception as e:
         logger.error(f"Failed to resolve username '{username}': {str(e)}\n{traceback.format_exc()}")
         raise HTTPException(status_code=500, detail=f"Failed to resolve username: {str(e)}")
 
-@app.post("/upload-resume", response_model=UploadResumeResponse)
+@app.post("/upload-resume", response_model=UploadResumeResponse, dependencies=[Depends(admit("parse"))])
 async def upload_resume(
     user_id: str = Form(..., description="User ID from registration"),
     file: UploadFile = File(..., description="Resume file (PDF, DOCX, or TXT)")
@@ -134,7 +369,8 @@ async def upload_resume(
         except ValueError:
             raise HTTPException(status_code=400, detail="Invalid user_id format")
         
-        user = get_user_by_id(user_id)
+        # Blocking work runs on worker threads so parsing never stalls the event loop
+        user = await run_in_threadpool(get_user_by_id, user_id)
         if not user:
             raise HTTPException(status_code=404, detail="User not found")
         
@@ -158,15 +394,16 @@ async def upload_resume(
         
         # Parse resume file
         try:
-            resume_text = parse_resume_file(file_content, file.filename)
+            resume_text = await run_in_threadpool(parse_resume_file, file_content, file.filename)
         except ValueError as e:
             raise HTTPException(status_code=400, detail=str(e))
         
         # Generate embedding for resume
-        embedding = create_embedding(resume_text)
+        embedding = await run_in_threadpool(create_embedding, resume_text)
         
         # Store in PostgreSQL with pgvector
-        store_resume_embedding(
+        await run_in_threadpool(
+            store_resume_embedding,
             user_id=user_id,
             resume_text=resume_text,
             embedding=embedding
@@ -178,47 +415,198 @@ async def upload_resume(
             filename=file.filename,
             extracted_length=len(resume_text)
         )
-    except HTTPException:
+    except (HTTPException, ServiceUnavailableError):
         raise
     except Exception as e:
         logger.error(f"Resume upload failed: {str(e)}\n{traceback.format_exc()}")
         raise HTTPException(status_code=500, detail=f"Resume upload failed: {str(e)}")
 
-@app.post("/gen-email", response_model=GenerateEmailResponse)
+@app.post("/gen-email", response_model=GenerateEmailResponse, dependencies=[Depends(admit("llm"))])
 def generate_email(request: GenerateEmailRequest):
     """Generate personalized job application email using HR contact job description."""
     try:
         result = generate_email_service(
             user_id=request.user_id,
-            hr_id=request.hr_id
+            hr_id=request.hr_id,
+            variants=request.variants,
+            fresh=request.fresh
+        )
+        return GenerateEmailResponse(
+            subject=result["subject"],
+            body=result["body"],
+            variants=result["variants"],
+            cached=result["cached"]
         )
-        return GenerateEmailResponse(subject=result["subject"], body=result["body"])
     except ValueError as e:
         logger.warning(f"Email generation validation error: {str(e)}")
         raise HTTPException(status_code=404, detail=str(e))
+    except ServiceUnavailableError:
+        raise
     except Exception as e:
         logger.error(f"Email generation failed: {str(e)}\n{traceback.format_exc()}")
         raise HTTPException(status_code=500, detail=f"Email generation failed: {str(e)}")
 
+@app.post("/match/candidates", response_model=MatchCandidatesResponse)
+async def match_candidates(request: MatchCandidatesRequest):
+    """Find the users whose resumes best match a job description."""
+    try:
+        from src.services import embed_query, match_resumes
+        # Embedding waits on OpenAI and the search on Postgres, so each holds only its own bulkhead
+        async with admitted("llm"):
+            embeddings = await run_in_threadpool(embed_query, request.job_description)
+        deadline.check("candidate search")
+        async with admitted("db_read"):
+            matches = await run_in_threadpool(
+                match_resumes,
+                embeddings=embeddings,
+                limit=request.top_k,
+                offset=request.offset,
+                max_distance=request.max_distance,
+                exclude_user_ids=[str(u) for u in request.exclude_user_ids]
+            )
+        return MatchCandidatesResponse(
+            candidates=[{**match, "similarity": 1.0 - match["distance"]} for match in matches],
+            offset=request.offset,
+            count=len(matches)
+        )
+    except ServiceUnavailableError:
+        raise
+    except Exception as e:
+        logger.error(f"Candidate matching failed: {str(e)}\n{traceback.format_exc()}")
+        raise HTTPException(status_code=500, detail=f"Candidate matching failed: {str(e)}")
+
 @app.post("/hr-contacts", response_model=BulkCreateHRContactsResponse)
-def create_hr_contacts(request: BulkCreateHRContactsRequest):
+async def create_hr_contacts(request: BulkCreateHRContactsRequest):
     """Create one or more HR contact entries for a specific user."""
     try:
+        from src.services import embed_post_previews
         # Convert Pydantic models to dictionaries
         hr_contacts_data = [contact.dict() for contact in request.hr_contacts]
         
-        result = create_hr_contacts_service(user_id=request.user_id, hr_contacts=hr_contacts_data)
+        # Embedding waits on OpenAI, so it holds the llm bulkhead; when that
+        # is full the contacts are stored unembedded for the re-embedding worker
+        try:
+            async with admitted("llm"):
+                post_embeddings = await run_in_threadpool(embed_post_previews, hr_contacts_data)
+        except BulkheadFullError as e:
+            logger.warning(f"Storing {len(hr_contacts_data)} HR contacts without post embeddings: {e}")
+            post_embeddings = None
+        deadline.check("hr contact write")
+        
+        result = await run_in_threadpool(
+            create_hr_contacts_service,
+            user_id=str(request.user_id),
+            hr_contacts=hr_contacts_data,
+            post_embeddings=post_embeddings
+        )
         return BulkCreateHRContactsResponse(**result)
     except ValueError as e:
         logger.warning(f"HR contact creation validation error: {str(e)}")
         raise HTTPException(status_code=400, detail=str(e))
+    except ServiceUnavailableError:
+        raise
     except Exception as e:
         logger.error(f"HR contact creation failed: {str(e)}\n{traceback.format_exc()}")
         raise HTTPException(status_code=500, detail=f"HR contact creation failed: {str(e)}")
 
-@app.get("/hr-contacts")
-def get_all_hr_contacts(user_id: str, limit: int = 100):
-    """Get all HR contacts for a specific user with optional limit."""
+@app.post("/hr-contacts/stream", response_model=StreamHRContactsResponse)
+async def stream_hr_contacts_ingest(request: Request, user_id: str, embed: bool = False):
+    """
+    Create HR contacts from an NDJSON body (one HRContactData object per line, optionally gzip).
+    
+    Lines are validated as they arrive and written in COPY batches of
+    STREAM_INGEST_BATCH_SIZE, each committed on its own; failed lines are
+    reported at the end. Post embeddings are left to the re-embedding
+    worker unless ``embed`` is set.
+    """
+    try:
+        try:
+            user_uuid = uuid.UUID(user_id)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid user_id format. Must be a valid UUID.")
+        encoding = request.headers.get("content-encoding", "").strip().lower()
+        if encoding not in ("", "identity", "gzip"):
+            raise HTTPException(status_code=415, detail="Content-Encoding must be gzip or identity")
+        
+        user = await run_in_threadpool(get_user_by_id, str(user_uuid))
+        if not user:
+            raise HTTPException(status_code=404, detail="User not found")
+        
+        from src.services import copy_hr_contact_lines
+        reader = NDJSONLineReader(gzip=encoding == "gzip", max_line_bytes=config.STREAM_INGEST_MAX_LINE_BYTES)
+        result = {"created_count": 0, "failed_count": 0, "failed_lines": [], "errors_truncated": False}
+        batch = []
+        
+        async def flush():
+            deadline.check("hr_contact_ingest")
+            written = await run_in_threadpool(copy_hr_contact_lines, str(user_uuid), batch, embed)
+            batch.clear()
+            result["created_count"] += written["created_count"]
+            result["failed_count"] += len(written["failed"])
+            room = config.STREAM_INGEST_MAX_ERRORS - len(result["failed_lines"])
+            result["failed_lines"].extend(written["failed"][:room])
+            result["errors_truncated"] = result["failed_count"] > len(result["failed_lines"])
+        
+        try:
+            async for data in request.stream():
+                for line in reader.feed(data):
+                    batch.append(line)
+                    if len(batch) >= config.STREAM_INGEST_BATCH_SIZE:
+                        await flush()
+            for line in reader.close():
+                batch.append(line)
+                if len(batch) >= config.STREAM_INGEST_BATCH_SIZE:
+                    await flush()
+            if batch:
+                await flush()
+        except (ValueError, zlib.error) as e:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Malformed body after {result['created_count']} contacts were stored: {str(e)}"
+            )
+        except DeadlineExceededError as e:
+            # Batches already committed stay; tell the client how far it got
+            raise type(e)(f"{e} after {result['created_count']} contacts were stored") from e
+        except ClientDisconnect:
+            raise RequestCancelledError(f"Client disconnected after {result['created_count']} contacts were stored")
+        
+        return StreamHRContactsResponse(**result)
+    except (HTTPException, ServiceUnavailableError):
+        raise
+    except Exception as e:
+        logger.error(f"HR contact stream ingest failed: {str(e)}\n{traceback.format_exc()}")
+        raise HTTPException(status_code=500, detail=f"HR contact stream ingest failed: {str(e)}")
+
+def _contact_to_dict(contact) -> dict:
+    """Serialize an HRContact in the scraper's camelCase shape."""
+    return {
+        "id": str(contact.id),
+        "user_id": str(contact.user_id),
+        "name": contact.name,
+        "title": contact.title,
+        "company": contact.company,
+        "profileUrl": contact.profile_url,
+        "postUrl": contact.post_url,
+        "email": contact.email,
+        "jobLink": contact.job_link,
+        "postPreview": contact.post_preview,
+        "matchedKeywords": contact.matched_keywords,
+        "extractedAt": contact.extracted_at.isoformat() if contact.extracted_at else None,
+        "created_at": contact.created_at.isoformat()
+    }
+
+def _keyword_params(values: Optional[List[str]]) -> List[str]:
+    """Keywords from repeated and/or comma-separated query parameters."""
+    return [k.strip() for value in values or [] for k in value.split(",") if k.strip()]
+
+@app.get("/hr-contacts", dependencies=[Depends(admit("db_read"))])
+def get_all_hr_contacts(
+    user_id: str,
+    limit: int = 100,
+    any_keyword: Optional[List[str]] = Query(None),
+    all_keywords: Optional[List[str]] = Query(None)
+):
+    """Get all HR contacts for a specific user with optional limit and keyword filters."""
     try:
         # Validate user_id format
         try:
@@ -227,35 +615,233 @@ def get_all_hr_contacts(user_id: str, limit: int = 100):
             raise HTTPException(status_code=400, detail="Invalid user_id format. Must be a valid UUID.")
             
         from src.services import get_all_hr_contacts as get_all_hr_contacts_service
-        contacts = get_all_hr_contacts_service(user_id=str(user_uuid), limit=limit)
+        contacts = get_all_hr_contacts_service(
+            user_id=str(user_uuid),
+            limit=limit,
+            any_keywords=_keyword_params(any_keyword),
+            all_keywords=_keyword_params(all_keywords)
+        )
         
         # Convert to dict format
         return {
             "count": len(contacts),
             "contacts": [
-                {
-                    "id": str(contact.id),
-                    "user_id": str(contact.user_id),
-                    "name": contact.name,
-                    "title": contact.title,
-                    "company": contact.company,
-                    "profileUrl": contact.profile_url,
-                    "postUrl": contact.post_url,
-                    "email": contact.email,
-                    "jobLink": contact.job_link,
-                    "postPreview": contact.post_preview,
-                    "matchedKeywords": contact.matched_keywords,
-                    "extractedAt": contact.extracted_at.isoformat() if contact.extracted_at else None,
-                    "created_at": contact.created_at.isoformat()
-                }
+                _contact_to_dict(contact)
                 for contact in contacts
             ]
         }
+    except (HTTPException, ServiceUnavailableError):
+        raise
     except Exception as e:
         logger.error(f"Failed to retrieve HR contacts: {str(e)}\n{traceback.format_exc()}")
         raise HTTPException(status_code=500, detail=f"Failed to retrieve HR contacts: {str(e)}")
 
-@app.get("/hr-contacts/{hr_id}")
+# Declared before /hr-contacts/{hr_id} so "ranked", "keywords", "search" and "export" are not taken for an ID
+@app.get("/hr-contacts/ranked", dependencies=[Depends(admit("db_read"))])
+def get_ranked_hr_contacts(
+    user_id: str,
+    limit: int = 20,
+    lexical_weight: Optional[float] = None,
+    vector_weight: Optional[float] = None
+):
+    """Rank a user's HR contacts against their resume (BM25 fused with embedding similarity)."""
+    try:
+        try:
+            user_uuid = uuid.UUID(user_id)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid user_id format. Must be a valid UUID.")
+        if not 1 <= limit <= 100:
+            raise HTTPException(status_code=400, detail="limit must be between 1 and 100")
+        
+        from src.services import rank_contacts
+        results = rank_contacts(
+            user_id=str(user_uuid),
+            limit=limit,
+            lexical_weight=lexical_weight,
+            vector_weight=vector_weight
+        )
+        
+        return {
+            "count": len(results),
+            "contacts": [
+                {
+                    **_contact_to_dict(result["contact"]),
+                    "score": result["score"],
+                    "bm25": result["bm25"],
+                    "similarity": result["similarity"]
+                }
+                for result in results
+            ]
+        }
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except (HTTPException, ServiceUnavailableError):
+        raise
+    except Exception as e:
+        logger.error(f"HR contact ranking failed: {str(e)}\n{traceback.format_exc()}")
+        raise HTTPException(status_code=500, detail=f"HR contact ranking failed: {str(e)}")
+
+@app.get("/hr-contacts/keywords", dependencies=[Depends(admit("db_read"))])
+def get_hr_contact_keywords(
+    user_id: str,
+    limit: int = 50,
+    any_keyword: Optional[List[str]] = Query(None),
+    all_keywords: Optional[List[str]] = Query(None)
+):
+    """Count a user's HR contacts per matched keyword (facets), under the same filters as the list."""
+    try:
+        try:
+            user_uuid = uuid.UUID(user_id)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid user_id format. Must be a valid UUID.")
+        
+        from src.services import get_keyword_facets
+        facets = get_keyword_facets(
+            user_id=str(user_uuid),
+            any_keywords=_keyword_params(any_keyword),
+            all_keywords=_keyword_params(all_keywords),
+            limit=limit
+        )
+        return {"count": len(facets), "keywords": facets}
+    except (HTTPException, ServiceUnavailableError):
+        raise
+    except Exception as e:
+        logger.error(f"Failed to count HR contact keywords: {str(e)}\n{traceback.format_exc()}")
+        raise HTTPException(status_code=500, detail=f"Failed to count HR contact keywords: {str(e)}")
+
+@app.get("/hr-contacts/search", dependencies=[Depends(admit("db_read"))])
+def search_hr_contacts(user_id: str, q: str, limit: int = 20):
+    """Full-text search over a user's HR contacts, ranked, with highlighted matches."""
+    try:
+        try:
+            user_uuid = uuid.UUID(user_id)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid user_id format. Must be a valid UUID.")
+        if not q.strip():
+            raise HTTPException(status_code=400, detail="Query parameter q must not be empty")
+        if not 1 <= limit <= 100:
+            raise HTTPException(status_code=400, detail="limit must be between 1 and 100")
+        
+        from src.services import search_hr_contacts as search_hr_contacts_service
+        results = search_hr_contacts_service(user_id=str(user_uuid), query=q, limit=limit)
+        
+        return {
+            "query": q,
+            "count": len(results),
+            "results": [
+                {
+                    **_contact_to_dict(result["contact"]),
+                    "rank": result["rank"],
+                    "highlights": result["highlights"]
+                }
+                for result in results
+            ]
+        }
+    except (HTTPException, ServiceUnavailableError):
+        raise
+    except Exception as e:
+        logger.error(f"HR contact search failed: {str(e)}\n{traceback.format_exc()}")
+        raise HTTPException(status_code=500, detail=f"HR contact search failed: {str(e)}")
+
+_EXPORT_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+_EXPORT_FIELDS = [
+    "id", "user_id", "name", "title", "company", "profileUrl", "postUrl", "email",
+    "jobLink", "postPreview", "matchedKeywords", "extractedAt", "created_at"
+]
+
+def _export_body(chunks: Iterator[list], first: list, export_format: str, request_deadline) -> Iterator[bytes]:
+    """Serialize batches of contact rows as NDJSON or CSV, one write per batch."""
+    try:
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=_EXPORT_FIELDS)
+        if export_format == "csv":
+            writer.writeheader()
+        rows = first
+        while rows:
+            for row in rows:
+                contact = _contact_to_dict(row)
+                if export_format == "csv":
+                    writer.writerow({**contact, "matchedKeywords": "; ".join(contact["matchedKeywords"] or [])})
+                else:
+                    buffer.write(json.dumps(contact))
+                    buffer.write("\n")
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+            # Keep streaming past the request deadline, but stop once the client is gone
+            if request_deadline is not None and request_deadline.cancelled:
+                return
+            rows = next(chunks, None)
+        if buffer.tell():
+            yield buffer.getvalue().encode("utf-8")
+    except Exception as e:
+        # Re-raised so the server aborts the chunked transfer: a cleanly ended
+        # body would pass for a complete export
+        logger.error(f"HR contact export failed mid-stream: {str(e)}\n{traceback.format_exc()}")
+        raise
+    finally:
+        chunks.close()
+
+class _HeldStreamingResponse(StreamingResponse):
+    """A streaming response that releases ``held`` (e.g. a bulkhead slot) only once it has been sent or aborted."""
+
+    def __init__(self, content, held: AsyncExitStack, **kwargs):
+        super().__init__(content, **kwargs)
+        self._held = held
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            await self._held.aclose()
+
+# Admitted inside the handler rather than with Depends: dependency teardown
+# runs before a streamed body is sent, while the export holds a pooled
+# connection for the whole download
+@app.get("/hr-contacts/export")
+async def export_hr_contacts(
+    user_id: str,
+    export_format: str = Query("ndjson", alias="format"),
+    any_keyword: Optional[List[str]] = Query(None),
+    all_keywords: Optional[List[str]] = Query(None)
+):
+    """Stream all of a user's HR contacts as NDJSON or CSV (for CRM import)."""
+    try:
+        try:
+            user_uuid = uuid.UUID(user_id)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid user_id format. Must be a valid UUID.")
+        if export_format not in _EXPORT_MEDIA_TYPES:
+            raise HTTPException(status_code=400, detail="format must be 'ndjson' or 'csv'")
+        
+        from src.services import stream_hr_contacts
+        held = AsyncExitStack()
+        await held.enter_async_context(admitted("db_read"))
+        try:
+            chunks = stream_hr_contacts(
+                user_id=str(user_uuid),
+                any_keywords=_keyword_params(any_keyword),
+                all_keywords=_keyword_params(all_keywords)
+            )
+            # Run the query before answering, so database errors still get a proper status
+            first = await run_in_threadpool(next, chunks, [])
+        except BaseException:
+            await held.aclose()
+            raise
+        
+        return _HeldStreamingResponse(
+            _export_body(chunks, first, export_format, deadline.current()),
+            held,
+            media_type=_EXPORT_MEDIA_TYPES[export_format],
+            headers={"Content-Disposition": f'attachment; filename="hr-contacts.{export_format}"'}
+        )
+    except (HTTPException, ServiceUnavailableError):
+        raise
+    except Exception as e:
+        logger.error(f"HR contact export failed: {str(e)}\n{traceback.format_exc()}")
+        raise HTTPException(status_code=500, detail=f"HR contact export failed: {str(e)}")
+
+@app.get("/hr-contacts/{hr_id}", dependencies=[Depends(admit("db_read"))])
 def get_hr_contact(hr_id: str, user_id: str):
     """Get a specific HR contact by ID for a specific user."""
     try:
@@ -272,22 +858,8 @@ def get_hr_contact(hr_id: str, user_id: str):
         if not contact:
             raise HTTPException(status_code=404, detail=f"HR contact with ID {hr_id} not found or doesn't belong to user")
         
-        return {
-            "id": str(contact.id),
-            "user_id": str(contact.user_id),
-            "name": contact.name,
-            "title": contact.title,
-            "company": contact.company,
-            "profileUrl": contact.profile_url,
-            "postUrl": contact.post_url,
-            "email": contact.email,
-            "jobLink": contact.job_link,
-            "postPreview": contact.post_preview,
-            "matchedKeywords": contact.matched_keywords,
-            "extractedAt": contact.extracted_at.isoformat() if contact.extracted_at else None,
-            "created_at": contact.created_at.isoformat()
-        }
-    except HTTPException:
+        return _contact_to_dict(contact)
+    except (HTTPException, ServiceUnavailableError):
         raise
     except Exception as e:
         logger.error(f"Failed to retrieve HR contact: {str(e)}\n{traceback.format_exc()}")
@@ -3,5 +3,8 @@ from .base import Base
 from .user import User
 from .hr import HRContact
 from .resume import Resume
+from .idempotency import IdempotencyKey
+from .generated_email import GeneratedEmail
+from .contact_term import ContactTerm
 
-__all__ = ["Base", "User", "HRContact", "Resume"]
+__all__ = ["Base", "User", "HRContact", "Resume", "IdempotencyKey", "GeneratedEmail", "ContactTerm"]
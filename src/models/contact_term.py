@@ -0,0 +1,22 @@
+"""Per-user term postings for lexical (BM25) ranking of HR contacts."""
+from sqlalchemy import Column, String, Integer, ForeignKey
+from sqlalchemy.dialects.postgresql import UUID
+
+from src.models.base import Base
+
+class ContactTerm(Base):
+    """
+    Frequency of one stemmed term in one HR contact's post preview and keywords.
+
+    Rows are written when contacts are ingested, so a user's document
+    frequencies are a count over (user_id, term) without rescanning posts.
+    """
+    __tablename__ = "contact_terms"
+    
+    user_id = Column(UUID(as_uuid=True), ForeignKey('users.id'), primary_key=True)
+    term = Column(String, primary_key=True)
+    hr_id = Column(UUID(as_uuid=True), ForeignKey('hr_contacts.id', ondelete='CASCADE'), primary_key=True)
+    tf = Column(Integer, nullable=False)
+    
+    def __repr__(self):
+        return f"<ContactTerm(user_id={self.user_id}, term={self.term}, hr_id={self.hr_id}, tf={self.tf})>"
@@ -0,0 +1,31 @@
+"""Generated email database model."""
+import uuid
+from datetime import datetime
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey
+from sqlalchemy.dialects.postgresql import UUID
+from pgvector.sqlalchemy import Vector
+
+from src.config import config
+from src.models.base import Base
+
+class GeneratedEmail(Base):
+    """Email generated for a user and HR contact, with its job-post embedding."""
+    __tablename__ = "generated_emails"
+    
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    user_id = Column(UUID(as_uuid=True), ForeignKey('users.id'), nullable=False, index=True)
+    hr_id = Column(UUID(as_uuid=True), ForeignKey('hr_contacts.id', ondelete='SET NULL'), nullable=True)
+    subject = Column(Text, nullable=False)
+    body = Column(Text, nullable=False)
+    # Recipient details the email was written for, used to re-personalize cache hits
+    hr_name = Column(String, nullable=True)
+    company = Column(String, nullable=True)
+    job_embedding = Column(Vector(config.EMBEDDING_DIMENSIONS), nullable=True)  # type: List[float]
+    # Model and version that produced job_embedding (see EMBEDDING_VERSION)
+    embedding_model = Column(String(64), nullable=True)
+    embedding_version = Column(Integer, nullable=True)
+    source = Column(String(16), nullable=False, default="live")  # live | cache | batch
+    created_at = Column(DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f"<GeneratedEmail(id={self.id}, user_id={self.user_id}, hr_id={self.hr_id})>"
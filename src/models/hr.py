@@ -1,12 +1,30 @@
 """HR contact database model."""
 import uuid
 from datetime import datetime
-from sqlalchemy import Column, String, Text, DateTime, ForeignKey, JSON
-from sqlalchemy.dialects.postgresql import UUID
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Computed, Integer, String, Text, DateTime, ForeignKey
+from sqlalchemy.dialects.postgresql import JSONB, TSVECTOR, UUID
+from sqlalchemy.orm import deferred, relationship
+from pgvector.sqlalchemy import Vector
 
+from src.config import config
 from src.models.base import Base
 
+# Full-text search document: name and company rank highest, then title, then the post text
+SEARCH_VECTOR_SQL = (
+    "setweight(to_tsvector('english', coalesce(name, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(company, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(title, '')), 'B') || "
+    "setweight(to_tsvector('english', coalesce(post_preview, '')), 'C')"
+)
+
+# Text indexed for BM25 ranking (see ContactTerm): the post preview plus matched keywords
+RANKING_TEXT_SQL = (
+    "coalesce(post_preview, '') || ' ' || "
+    "CASE WHEN jsonb_typeof(matched_keywords) = 'array' "
+    "THEN array_to_string(ARRAY(SELECT jsonb_array_elements_text(matched_keywords)), ' ') "
+    "ELSE '' END"
+)
+
 class HRContact(Base):
     """HR contact model for PostgreSQL."""
     __tablename__ = "hr_contacts"
@@ -21,7 +39,7 @@ class HRContact(Base):
     email = Column(String, nullable=True)  # Changed to nullable=True
     job_link = Column(String, nullable=True)
     post_preview = Column(Text, nullable=True)
-    matched_keywords = Column(JSON, nullable=True)
+    matched_keywords = Column(JSONB, nullable=True)  # GIN (jsonb_path_ops) indexed for @> filters
     extracted_at = Column(DateTime, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     
@@ -31,6 +49,16 @@ class HRContact(Base):
     # But for the database, let's just add the new fields.
     job_description = Column(Text, nullable=True) 
     
+    # Generated by Postgres and GIN-indexed; deferred so regular loads skip it
+    search_vector = deferred(Column(TSVECTOR, Computed(SEARCH_VECTOR_SQL, persisted=True)))
+    
+    # Hybrid ranking: term count of the ranking text and embedding of the post preview
+    doc_length = Column(Integer, nullable=True)
+    post_embedding = deferred(Column(Vector(config.EMBEDDING_DIMENSIONS), nullable=True))  # type: List[float]
+    # Model and version that produced post_embedding (see EMBEDDING_VERSION)
+    embedding_model = Column(String(64), nullable=True)
+    embedding_version = Column(Integer, nullable=True)
+    
     # Relationship to User
     user = relationship("User", back_populates="hr_contacts")
     
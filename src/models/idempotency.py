@@ -0,0 +1,25 @@
+"""Idempotency key database model."""
+from datetime import datetime
+from sqlalchemy import Column, String, Integer, LargeBinary, DateTime
+
+from src.models.base import Base
+
+class IdempotencyKey(Base):
+    """Stored outcome of a request sent with an Idempotency-Key header."""
+    __tablename__ = "idempotency_keys"
+    
+    # "POST /gen-email" etc.; the same key may be reused on different routes
+    scope = Column(String, primary_key=True)
+    key = Column(String, primary_key=True)
+    request_hash = Column(String(64), nullable=False)
+    status = Column(String(16), nullable=False, default="in_progress")  # in_progress | completed
+    response_status = Column(Integer, nullable=True)
+    response_body = Column(LargeBinary, nullable=True)
+    content_type = Column(String, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    # In-progress rows expire after the lock timeout (so a crashed worker's
+    # key can be retried); completed rows after the replay TTL
+    expires_at = Column(DateTime, nullable=False, index=True)
+    
+    def __repr__(self):
+        return f"<IdempotencyKey(scope={self.scope}, key={self.key}, status={self.status})>"
@@ -2,7 +2,7 @@
 import uuid
 from datetime import datetime
 from typing import List
-from sqlalchemy import Column, String, Text, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey
 from sqlalchemy.dialects.postgresql import UUID
 from pgvector.sqlalchemy import Vector
 
@@ -17,6 +17,9 @@ class Resume(Base):
     user_id = Column(UUID(as_uuid=True), ForeignKey('users.id'), nullable=False, unique=True)
     resume_text = Column(Text, nullable=False)
     resume_embedding = Column(Vector(config.EMBEDDING_DIMENSIONS), nullable=False)  # type: List[float]
+    # Model and version that produced the embedding (see EMBEDDING_VERSION)
+    embedding_model = Column(String(64), nullable=True)
+    embedding_version = Column(Integer, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
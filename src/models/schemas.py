@@ -22,11 +22,41 @@ class GenerateEmailRequest(BaseModel):
     """Request schema for email generation."""
     user_id: UUID = Field(..., description="User's UUID")
     hr_id: UUID = Field(..., description="HR contact UUID containing job description")
+    variants: int = Field(1, ge=1, le=5, description="Number of alternative emails to generate")
+    fresh: bool = Field(False, description="Always generate new text instead of reusing a cached email")
+
+class EmailVariant(BaseModel):
+    """One generated email alternative."""
+    subject: str = Field(..., description="Email subject line")
+    body: str = Field(..., description="Email body content")
 
 class GenerateEmailResponse(BaseModel):
     """Response schema for email generation."""
     subject: str = Field(..., description="Email subject line")
     body: str = Field(..., description="Email body content")
+    variants: List[EmailVariant] = Field(default_factory=list, description="All generated alternatives, first one included")
+    cached: bool = Field(False, description="Reused from an email for a near-identical job post")
+
+class MatchCandidatesRequest(BaseModel):
+    """Request schema for matching candidates to a job description."""
+    job_description: str = Field(..., min_length=1, description="Job description text")
+    top_k: int = Field(10, ge=1, le=100, description="Number of candidates per page")
+    offset: int = Field(0, ge=0, le=900, description="Number of candidates to skip")
+    max_distance: Optional[float] = Field(None, ge=0, le=2, description="Drop candidates farther than this cosine distance")
+    exclude_user_ids: List[UUID] = Field(default_factory=list, description="Users to leave out")
+
+class CandidateMatch(BaseModel):
+    """One candidate matched to a job description."""
+    user_id: UUID = Field(..., description="Candidate's user ID")
+    username: str = Field(..., description="Candidate's username")
+    distance: float = Field(..., description="Cosine distance between resume and job description")
+    similarity: float = Field(..., description="Cosine similarity (1 - distance)")
+
+class MatchCandidatesResponse(BaseModel):
+    """Response schema for candidate matching."""
+    candidates: List[CandidateMatch] = Field(..., description="Candidates, nearest first")
+    offset: int = Field(..., description="Offset of this page")
+    count: int = Field(..., description="Number of candidates in this page")
 
 class CreateHRContactRequest(BaseModel):
     """Request schema for creating HR contact."""
@@ -65,3 +95,10 @@ class BulkCreateHRContactsResponse(BaseModel):
     hr_ids: List[UUID] = Field(..., description="List of created HR contact IDs")
     failed_count: int = Field(..., description="Number of failed contacts")
     failed_contacts: List[dict] = Field(..., description="List of failed contacts with error details")
+
+class StreamHRContactsResponse(BaseModel):
+    """Response schema for streaming NDJSON HR contact ingest."""
+    created_count: int = Field(..., description="Number of successfully created contacts")
+    failed_count: int = Field(..., description="Number of lines that failed validation")
+    failed_lines: List[dict] = Field(..., description="Failed lines (1-based line number and error)")
+    errors_truncated: bool = Field(False, description="Whether failed_lines was cut short")
@@ -14,10 +14,10 @@ GUIDELINES:
 7. If RECIPIENT DETAILS are provided, address them appropriately and mention the company name.
 
 OUTPUT FORMAT - Return valid JSON:
-{
+{{
   "subject": "Engaging subject line with role name (max 60 chars)",
   "body": "Email body with proper paragraph formatting"
-}
+}}
 
 RECIPIENT DETAILS:
 Name: {hr_name}
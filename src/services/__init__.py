@@ -1,7 +1,8 @@
 from src.services.user_service import register_user, get_user_by_username, get_user_by_id
 from src.services.openai_service import create_embedding
-from src.services.vector_service import store_resume_embedding, get_resume_by_user_id, search_similar_resume
+from src.services.vector_service import store_resume_embedding, get_resume_by_user_id, search_similar_resume, match_resumes, embed_query
 from src.services.email_service import generate_email
-from src.services.hr_service import create_hr_contacts, get_hr_contact_by_id, get_all_hr_contacts
+from src.services.hr_service import create_hr_contacts, get_hr_contact_by_id, get_all_hr_contacts, search_hr_contacts, get_keyword_facets, stream_hr_contacts, copy_hr_contact_lines, embed_post_previews
+from src.services.ranking_service import rank_contacts
 
-__all__ = ["register_user", "get_user_by_username", "get_user_by_id", "create_embedding", "generate_email", "store_resume_embedding", "get_resume_by_user_id", "search_similar_resume", "create_hr_contacts", "get_hr_contact_by_id", "get_all_hr_contacts"]
+__all__ = ["register_user", "get_user_by_username", "get_user_by_id", "create_embedding", "generate_email", "store_resume_embedding", "get_resume_by_user_id", "search_similar_resume", "match_resumes", "embed_query", "create_hr_contacts", "get_hr_contact_by_id", "get_all_hr_contacts", "search_hr_contacts", "get_keyword_facets", "stream_hr_contacts", "copy_hr_contact_lines", "embed_post_previews", "rank_contacts"]
@@ -0,0 +1,318 @@
+"""Offline bulk email generation through the OpenAI Batch API.
+
+For overnight campaigns over many (user, HR contact) pairs. Prompts are
+built with ``create_email_prompt`` and written as a Batch API JSONL file
+(one ``/v1/chat/completions`` request per pair), the file is uploaded and
+the batch submitted, and once it completes the results are stored in
+``generated_emails`` with the job-post embedding, so a later ``/gen-email``
+for the same contact is served by the semantic cache.
+
+    python -m src.services.batch_email_service build --out batch.jsonl [--user-id ID ...]
+    python -m src.services.batch_email_service submit batch.jsonl
+    python -m src.services.batch_email_service ingest BATCH_ID
+    python -m src.services.batch_email_service run [--user-id ID ...]
+
+With ``OPENAI_PROVIDER=fake`` the whole pipeline runs locally.
+"""
+import argparse
+import json
+import logging
+import time
+import uuid
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import exists
+
+from src.config import config
+from src.lib.openai_client import get_openai_client
+from src.lib.postgres import get_db
+from src.lib.tracing import traced
+from src.models.generated_email import GeneratedEmail
+from src.models.hr import HRContact
+from src.models.resume import Resume
+from src.prompts.email_prompt import create_email_prompt
+from src.services import email_cache_service, openai_service
+
+logger = logging.getLogger(__name__)
+
+BATCH_ENDPOINT = "/v1/chat/completions"
+TERMINAL_STATUSES = ("completed", "failed", "expired", "cancelled")
+# The Batch API accepts at most this many requests per input file
+MAX_REQUESTS_PER_BATCH = 50000
+# Results are embedded and stored this many at a time
+INGEST_CHUNK_SIZE = 500
+
+def _custom_id(user_id: Any, hr_id: Any) -> str:
+    return f"{user_id}:{hr_id}"
+
+def _parse_custom_id(custom_id: str) -> Tuple[str, str]:
+    user_id, hr_id = custom_id.split(":", 1)
+    return str(uuid.UUID(user_id)), str(uuid.UUID(hr_id))
+
+@traced()
+def write_batch_file(path: str, user_ids: Optional[List[str]] = None, skip_existing: bool = True) -> int:
+    """
+    Write one Batch API request per (user, HR contact) pair.
+
+    Pairs are every HR contact with a job description whose user has a
+    resume, optionally limited to ``user_ids``.
+
+    Args:
+        path: Output JSONL file
+        user_ids: Only include these users (default: all)
+        skip_existing: Leave out contacts that already have a stored email
+
+    Returns:
+        Number of requests written
+
+    Raises:
+        ValueError: If the pairs exceed MAX_REQUESTS_PER_BATCH
+    """
+    count = 0
+    with get_db() as db, open(path, "w", encoding="utf-8") as batch_file:
+        query = (
+            db.query(
+                HRContact.id,
+                HRContact.user_id,
+                HRContact.name,
+                HRContact.title,
+                HRContact.company,
+                HRContact.job_description,
+                Resume.resume_text
+            )
+            .join(Resume, Resume.user_id == HRContact.user_id)
+            .filter(HRContact.job_description.isnot(None))
+            .order_by(HRContact.user_id, HRContact.id)
+        )
+        if user_ids:
+            query = query.filter(HRContact.user_id.in_([uuid.UUID(u) for u in user_ids]))
+        if skip_existing:
+            query = query.filter(~exists().where(GeneratedEmail.hr_id == HRContact.id))
+
+        for hr_id, user_id, name, title, company, job_description, resume_text in query.yield_per(INGEST_CHUNK_SIZE):
+            if count >= MAX_REQUESTS_PER_BATCH:
+                raise ValueError(
+                    f"More than {MAX_REQUESTS_PER_BATCH} pairs; split the run with --user-id"
+                )
+            prompt = create_email_prompt(
+                resume_text=resume_text,
+                job_description=job_description,
+                hr_name=name,
+                hr_title=title,
+                company=company
+            )
+            batch_file.write(json.dumps({
+                "custom_id": _custom_id(user_id, hr_id),
+                "method": "POST",
+                "url": BATCH_ENDPOINT,
+                "body": openai_service.chat_request_body(prompt),
+            }) + "\n")
+            count += 1
+
+    logger.info(f"Wrote {count} batch requests to {path}")
+    return count
+
+@traced()
+def submit_batch(path: str) -> str:
+    """
+    Upload a batch file and start the batch.
+
+    Args:
+        path: JSONL file written by write_batch_file
+
+    Returns:
+        Batch ID
+    """
+    client = get_openai_client()
+    with open(path, "rb") as batch_file:
+        input_file = client.files.create(file=batch_file, purpose="batch")
+    batch = client.batches.create(
+        input_file_id=input_file.id,
+        endpoint=BATCH_ENDPOINT,
+        completion_window="24h",
+        metadata={"job": "bulk_email_generation"}
+    )
+    logger.info(f"Submitted batch {batch.id} (input file {input_file.id})")
+    return batch.id
+
+def wait_for_batch(batch_id: str, poll_interval: float = config.OPENAI_BATCH_POLL_S, timeout: Optional[float] = None):
+    """
+    Poll a batch until it reaches a terminal status.
+
+    Args:
+        batch_id: Batch ID
+        poll_interval: Seconds between status checks
+        timeout: Give up after this many seconds (default: wait indefinitely)
+
+    Returns:
+        The final batch object
+
+    Raises:
+        TimeoutError: If the batch is still running after ``timeout``
+    """
+    client = get_openai_client()
+    started = time.monotonic()
+    while True:
+        batch = client.batches.retrieve(batch_id)
+        if batch.status in TERMINAL_STATUSES:
+            return batch
+        counts = batch.request_counts
+        if counts is not None:
+            logger.info(f"Batch {batch_id} {batch.status}: {counts.completed + counts.failed}/{counts.total} done")
+        if timeout is not None and time.monotonic() - started >= timeout:
+            raise TimeoutError(f"Batch {batch_id} still {batch.status} after {timeout}s")
+        time.sleep(poll_interval)
+
+def _read_lines(file_id: Optional[str]) -> Iterator[Dict[str, Any]]:
+    if not file_id:
+        return
+    content = get_openai_client().files.content(file_id)
+    for line in content.text.splitlines():
+        if line.strip():
+            yield json.loads(line)
+
+def _result_email(result: Dict[str, Any]) -> Optional[Dict[str, str]]:
+    """Email from one output line, or None if the request failed or the reply is malformed."""
+    response = result.get("response") or {}
+    if result.get("error") or response.get("status_code") != 200:
+        return None
+    choices = (response.get("body") or {}).get("choices") or []
+    if not choices:
+        return None
+    return openai_service.parse_email(choices[0].get("message", {}).get("content"))
+
+def _store_chunk(chunk: List[Tuple[str, str, Dict[str, str]]], stats: Dict[str, int]) -> None:
+    """Embed the job posts of a chunk of results and store the emails."""
+    hr_ids = [uuid.UUID(hr_id) for _, hr_id, _ in chunk]
+    with get_db() as db:
+        contacts = {
+            str(row.id): row
+            for row in db.query(HRContact.id, HRContact.name, HRContact.company, HRContact.job_description)
+            .filter(HRContact.id.in_(hr_ids))
+        }
+        stored = {
+            str(hr_id)
+            for (hr_id,) in db.query(GeneratedEmail.hr_id)
+            .filter(GeneratedEmail.hr_id.in_(hr_ids), GeneratedEmail.source == "batch")
+        }
+
+    # Contacts deleted since the batch was built, or already ingested (a re-run), are skipped
+    pending = [(user_id, hr_id, email) for user_id, hr_id, email in chunk if hr_id in contacts and hr_id not in stored]
+    stats["skipped"] += len(chunk) - len(pending)
+    if not pending:
+        return
+
+    embeddings = openai_service.create_embeddings([contacts[hr_id].job_description for _, hr_id, _ in pending])
+    email_cache_service.store_generated_emails([
+        {
+            "user_id": user_id,
+            "hr_id": hr_id,
+            "email": email,
+            "job_embedding": embedding,
+            "hr_name": contacts[hr_id].name,
+            "company": contacts[hr_id].company,
+            "source": "batch",
+        }
+        for (user_id, hr_id, email), embedding in zip(pending, embeddings)
+    ])
+    stats["stored"] += len(pending)
+
+@traced()
+def ingest_batch_results(batch_id: str) -> Dict[str, int]:
+    """
+    Store the emails of a completed batch.
+
+    Safe to re-run: contacts that already have a batch email are skipped.
+
+    Args:
+        batch_id: Batch ID
+
+    Returns:
+        Counts of stored, failed (request error or malformed reply) and
+        skipped results
+
+    Raises:
+        ValueError: If the batch did not complete
+    """
+    batch = get_openai_client().batches.retrieve(batch_id)
+    if batch.status != "completed":
+        raise ValueError(f"Batch {batch_id} is {batch.status}, not completed")
+
+    stats = {"stored": 0, "failed": 0, "skipped": 0}
+    chunk: List[Tuple[str, str, Dict[str, str]]] = []
+    for result in _read_lines(batch.output_file_id):
+        email = _result_email(result)
+        if email is None:
+            stats["failed"] += 1
+            continue
+        user_id, hr_id = _parse_custom_id(result["custom_id"])
+        chunk.append((user_id, hr_id, email))
+        if len(chunk) >= INGEST_CHUNK_SIZE:
+            _store_chunk(chunk, stats)
+            chunk = []
+    if chunk:
+        _store_chunk(chunk, stats)
+
+    for result in _read_lines(batch.error_file_id):
+        stats["failed"] += 1
+        logger.warning(f"Batch request {result.get('custom_id')} failed: {result.get('error') or result.get('response')}")
+
+    logger.info(f"Ingested batch {batch_id}: {stats}")
+    return stats
+
+def run_bulk_generation(
+    path: str,
+    user_ids: Optional[List[str]] = None,
+    poll_interval: float = config.OPENAI_BATCH_POLL_S
+) -> Dict[str, int]:
+    """
+    Build, submit, wait for and ingest a batch in one call.
+
+    Returns:
+        Ingest counts (all zero if there was nothing to generate)
+    """
+    if not write_batch_file(path, user_ids):
+        return {"stored": 0, "failed": 0, "skipped": 0}
+    batch = wait_for_batch(submit_batch(path), poll_interval)
+    if batch.status != "completed":
+        raise RuntimeError(f"Batch {batch.id} ended {batch.status}")
+    return ingest_batch_results(batch.id)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Generate emails in bulk through the OpenAI Batch API")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    build = commands.add_parser("build", help="Write the batch JSONL file")
+    build.add_argument("--out", default="batch_emails.jsonl")
+    build.add_argument("--user-id", action="append", dest="user_ids")
+    build.add_argument("--include-existing", action="store_true", help="Also regenerate contacts that already have an email")
+
+    submit = commands.add_parser("submit", help="Upload a batch file and start the batch")
+    submit.add_argument("path")
+
+    ingest = commands.add_parser("ingest", help="Wait for a batch and store its emails")
+    ingest.add_argument("batch_id")
+    ingest.add_argument("--poll-interval", type=float, default=config.OPENAI_BATCH_POLL_S)
+
+    run = commands.add_parser("run", help="Build, submit, wait and ingest")
+    run.add_argument("--out", default="batch_emails.jsonl")
+    run.add_argument("--user-id", action="append", dest="user_ids")
+    run.add_argument("--poll-interval", type=float, default=config.OPENAI_BATCH_POLL_S)
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    if args.command == "build":
+        write_batch_file(args.out, args.user_ids, skip_existing=not args.include_existing)
+    elif args.command == "submit":
+        print(submit_batch(args.path))
+    elif args.command == "ingest":
+        batch = wait_for_batch(args.batch_id, args.poll_interval)
+        if batch.status != "completed":
+            raise SystemExit(f"Batch {batch.id} ended {batch.status}")
+        print(json.dumps(ingest_batch_results(batch.id)))
+    else:
+        print(json.dumps(run_bulk_generation(args.out, args.user_ids, args.poll_interval)))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+"""Semantic cache of generated emails keyed by job-post embedding.
+
+Recruiters often repost nearly the same job text. Every generated email is
+stored with the embedding of the job description it was written for; a new
+request whose job description is within SEMANTIC_CACHE_MIN_SIMILARITY
+(cosine) of an earlier one for the same user reuses that email, with the
+greeting, recipient name and company swapped for the new contact's, instead
+of running a chat completion. Emails written before the user's resume was
+last updated, or for the same HR contact, are never reused, and job posts are
+only compared with ones embedded by the same embedding version.
+"""
+import re
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.config import config
+from src.lib import metrics
+from src.lib.postgres import get_db
+from src.lib.tracing import traced
+from src.models.generated_email import GeneratedEmail
+from src.models.resume import Resume
+from src.services import vector_service
+from src.services.vector_service import EmbeddingVersion
+
+LOOKUPS = metrics.counter(
+    "semantic_cache_lookups",
+    "Semantic email cache lookups by outcome (hit, miss, empty, unpersonalizable)",
+    ("outcome",)
+)
+SIMILARITY = metrics.histogram(
+    "semantic_cache_similarity",
+    "Cosine similarity of the nearest cached job post per lookup, hit or not",
+    buckets=(0.5, 0.6, 0.7, 0.8, 0.85, 0.9, 0.92, 0.94, 0.95, 0.96, 0.97, 0.98, 0.99, 1.0)
+)
+
+_GREETING = re.compile(r"^(\s*(?:Dear|Hi|Hello|Hey)\s+)([^,\n]+)(,)", re.IGNORECASE)
+
+def _replace_word(text: str, old: str, new: str) -> str:
+    return re.sub(rf"(?<!\w){re.escape(old)}(?!\w)", lambda _: new, text)
+
+def _mentions(text: str, value: Optional[str]) -> bool:
+    return bool(value) and re.search(rf"(?<!\w){re.escape(value)}(?!\w)", text) is not None
+
+def personalize_email(
+    email: Dict[str, str],
+    from_name: Optional[str],
+    from_company: Optional[str],
+    to_name: Optional[str],
+    to_company: Optional[str]
+) -> Optional[Dict[str, str]]:
+    """
+    Re-address an email written for one HR contact to another.
+
+    Swaps the greeting, the recipient's full and first name and the company
+    name in the subject and body.
+
+    Args:
+        email: Dictionary with 'subject' and 'body'
+        from_name: Name the email was written for
+        from_company: Company the email was written for
+        to_name: Name of the new recipient
+        to_company: Company of the new recipient
+
+    Returns:
+        Re-addressed email, or None if it names the original recipient or
+        company and the new contact has nothing to replace them with
+    """
+    subject, body = email["subject"], email["body"]
+    for old, new in ((from_name, to_name), (from_company, to_company)):
+        if not old or old == new:
+            continue
+        if not new:
+            if _mentions(subject, old) or _mentions(body, old):
+                return None
+            continue
+        subject = _replace_word(subject, old, new)
+        body = _replace_word(body, old, new)
+
+    if from_name and to_name and from_name != to_name:
+        old_first, new_first = from_name.split()[0], to_name.split()[0]
+        if old_first != new_first:
+            body = _replace_word(body, old_first, new_first)
+
+    body = _GREETING.sub(lambda m: f"{m.group(1)}{to_name or 'Hiring Manager'}{m.group(3)}", body, count=1)
+    return {"subject": subject, "body": body}
+
+def _nearest_email(
+    db,
+    user_id: str,
+    version: EmbeddingVersion,
+    job_embedding: List[float],
+    exclude_hr_id: Optional[str]
+) -> Optional[Tuple[GeneratedEmail, float]]:
+    """
+    The user's stored email whose job post (of ``version``) is nearest, with its distance.
+
+    Exact: the user's emails are read through the user_id index and sorted by
+    distance, so no match is lost to an approximate index scan.
+    """
+    distance = GeneratedEmail.job_embedding.cosine_distance(job_embedding)
+    return (
+        db.query(GeneratedEmail, distance.label("distance"))
+        .join(Resume, Resume.user_id == GeneratedEmail.user_id)
+        .filter(
+            GeneratedEmail.user_id == user_id,
+            GeneratedEmail.job_embedding.isnot(None),
+            vector_service.has_embedding_version(GeneratedEmail, version),
+            GeneratedEmail.created_at >= Resume.updated_at,
+            GeneratedEmail.hr_id.is_distinct_from(exclude_hr_id)
+        )
+        .order_by(distance)
+        .limit(1)
+        .first()
+    )
+
+@traced()
+def find_similar_email(
+    user_id: str,
+    job_embeddings: Dict[EmbeddingVersion, List[float]],
+    hr_name: Optional[str],
+    company: Optional[str],
+    hr_id: Optional[str] = None
+) -> Optional[Dict[str, str]]:
+    """
+    Look up an email generated for a near-identical job post and re-address it.
+
+    Args:
+        user_id: User's UUID
+        job_embeddings: Embedding of the new job description per embedding
+            version (see vector_service.embed_query)
+        hr_name: Name of the new recipient
+        company: Company of the new recipient
+        hr_id: HR contact UUID being written to; emails already generated
+            for it are skipped, so asking again yields a new email
+
+    Returns:
+        Dictionary with subject, body and similarity, or None on a miss
+    """
+    with get_db() as db:
+        rows = [
+            row for row in (
+                _nearest_email(db, user_id, version, embedding, hr_id)
+                for version, embedding in job_embeddings.items()
+            )
+            if row is not None
+        ]
+        if not rows:
+            LOOKUPS.inc(outcome="empty")
+            return None
+        cached, distance = min(rows, key=lambda row: row[1])
+        cached_email = {"subject": cached.subject, "body": cached.body}
+        from_name, from_company = cached.hr_name, cached.company
+
+    similarity = 1.0 - float(distance)
+    SIMILARITY.observe(similarity)
+    if similarity < config.SEMANTIC_CACHE_MIN_SIMILARITY:
+        LOOKUPS.inc(outcome="miss")
+        return None
+
+    email = personalize_email(cached_email, from_name, from_company, hr_name, company)
+    if email is None:
+        LOOKUPS.inc(outcome="unpersonalizable")
+        return None
+    LOOKUPS.inc(outcome="hit")
+    email["similarity"] = round(similarity, 4)
+    return email
+
+@traced()
+def store_generated_email(
+    user_id: str,
+    hr_id: Optional[str],
+    email: Dict[str, str],
+    job_embedding: Optional[List[float]],
+    hr_name: Optional[str],
+    company: Optional[str],
+    source: str = "live"
+) -> None:
+    """
+    Record a generated email so later near-duplicate job posts can reuse it.
+
+    Args:
+        user_id: User's UUID
+        hr_id: HR contact UUID the email was written for
+        email: Dictionary with 'subject' and 'body'
+        job_embedding: Embedding of the job description from the current model
+        hr_name: Recipient name the email addresses
+        company: Company the email addresses
+        source: How the email was produced ('live' or 'batch')
+    """
+    store_generated_emails([{
+        "user_id": user_id,
+        "hr_id": hr_id,
+        "email": email,
+        "job_embedding": job_embedding,
+        "hr_name": hr_name,
+        "company": company,
+        "source": source,
+    }])
+
+@traced()
+def store_generated_emails(records: List[Dict[str, Any]]) -> None:
+    """
+    Record several generated emails in one transaction.
+
+    Args:
+        records: Dictionaries with the arguments of store_generated_email
+    """
+    model, version = vector_service.current_embedding_version()
+    with get_db() as db:
+        db.add_all([
+            GeneratedEmail(
+                user_id=uuid.UUID(record["user_id"]),
+                hr_id=uuid.UUID(record["hr_id"]) if record.get("hr_id") else None,
+                subject=record["email"]["subject"],
+                body=record["email"]["body"],
+                hr_name=record.get("hr_name"),
+                company=record.get("company"),
+                job_embedding=record.get("job_embedding"),
+                embedding_model=model if record.get("job_embedding") is not None else None,
+                embedding_version=version if record.get("job_embedding") is not None else None,
+                source=record.get("source", "live")
+            )
+            for record in records
+        ])
@@ -1,19 +1,30 @@
 """Email generation orchestration service."""
+import logging
 from typing import Dict, Any
 
-from src.services import openai_service, vector_service
+from src.config import config
+from src.lib import deadline
+from src.lib.tracing import traced
+from src.services import email_cache_service, openai_service, vector_service
 from src.services.hr_service import get_hr_contact_by_id
 
-def generate_email(user_id: str, hr_id: str) -> Dict[str, Any]:
+logger = logging.getLogger(__name__)
+
+@traced()
+def generate_email(user_id: str, hr_id: str, variants: int = 1, fresh: bool = False) -> Dict[str, Any]:
     """
     Generate email for a user based on HR contact job description.
     
     Args:
         user_id: User's UUID
         hr_id: HR contact UUID
+        variants: Number of alternative emails to generate in one completion
+        fresh: Skip the semantic cache and always run a chat completion
         
     Returns:
-        Dictionary with subject and body
+        Dictionary with subject and body of the first email, all
+        alternatives under 'variants', and 'cached' (True when a stored email
+        for a near-identical job post was re-addressed instead)
         
     Raises:
         ValueError: If HR contact or resume not found
@@ -25,6 +36,8 @@ def generate_email(user_id: str, hr_id: str) -> Dict[str, Any]:
     
     job_description = hr_contact.job_description
     
+    deadline.check("resume lookup")
+    
     # Step 2: Get user's resume from PostgreSQL
     resume_data = vector_service.get_resume_by_user_id(user_id)
     if not resume_data or not resume_data.get("resume_text"):
@@ -32,13 +45,52 @@ def generate_email(user_id: str, hr_id: str) -> Dict[str, Any]:
     
     resume_text = resume_data["resume_text"]
     
-    # Step 3: Generate email using OpenAI
-    email_result = openai_service.generate_email(
+    # Step 3: Reuse an email written for a near-identical job post
+    job_embeddings = None
+    if config.SEMANTIC_CACHE_ENABLED and job_description:
+        deadline.check("semantic cache lookup")
+        job_embeddings = vector_service.embed_query(job_description)
+        if variants == 1 and not fresh:
+            cached = email_cache_service.find_similar_email(
+                user_id=user_id,
+                job_embeddings=job_embeddings,
+                hr_name=hr_contact.name,
+                company=hr_contact.company,
+                hr_id=hr_id
+            )
+            if cached:
+                email = {"subject": cached["subject"], "body": cached["body"]}
+                return {**email, "variants": [email], "cached": True}
+    
+    deadline.check("email generation")
+    
+    # Step 4: Generate email using OpenAI
+    emails = openai_service.generate_email_variants(
         resume_text=resume_text,
         job_description=job_description,
         hr_name=hr_contact.name,
         hr_title=hr_contact.title,
-        company=hr_contact.company
+        company=hr_contact.company,
+        variants=variants
     )
     
-    return email_result
+    if job_embeddings is not None:
+        try:
+            email_cache_service.store_generated_email(
+                user_id=user_id,
+                hr_id=hr_id,
+                email=emails[0],
+                job_embedding=job_embeddings[vector_service.current_embedding_version()],
+                hr_name=hr_contact.name,
+                company=hr_contact.company
+            )
+        except Exception as e:
+            # The email is still good; only future cache hits are lost
+            logger.warning(f"Failed to store generated email for cache: {e}")
+    
+    return {
+        "subject": emails[0]["subject"],
+        "body": emails[0]["body"],
+        "variants": emails,
+        "cached": False
+    }
@@ -1,12 +1,77 @@
 """HR contact service for storing HR information."""
-from typing import Optional
+import io
+import json
+import logging
+from datetime import datetime
+from typing import Iterable, Iterator, List, Optional, Tuple
+import psycopg2
+from pydantic import ValidationError
+from sqlalchemy import func, or_, text, true
 from sqlalchemy.exc import IntegrityError
 import uuid
 
+from src.config import config
+from src.lib import deadline
+from src.lib.errors import DeadlineExceededError
 from src.lib.postgres import get_db
-from src.models.hr import HRContact
+from src.lib.tracing import traced
+from src.models.hr import HRContact, RANKING_TEXT_SQL
+from src.models.schemas import HRContactData
+from src.services import openai_service, scoring_service, vector_service
 
-def create_hr_contacts(user_id: str, hr_contacts: list) -> dict:
+logger = logging.getLogger(__name__)
+
+# Postings for BM25 use Postgres' english parser and stemmer, the same one
+# the ranking service applies to the resume
+_INDEX_TERMS_SQL = text(f"""
+    INSERT INTO contact_terms (user_id, term, hr_id, tf)
+    SELECT c.user_id, t.lexeme, c.id, array_length(t.positions, 1)
+    FROM hr_contacts c, unnest(to_tsvector('english', {RANKING_TEXT_SQL})) AS t
+    WHERE c.id = ANY(CAST(:ids AS uuid[]))
+""")
+_UPDATE_DOC_LENGTH_SQL = text("""
+    UPDATE hr_contacts
+    SET doc_length = coalesce((SELECT sum(tf) FROM contact_terms WHERE hr_id = hr_contacts.id), 0)
+    WHERE id = ANY(CAST(:ids AS uuid[]))
+""")
+
+def embed_post_previews(hr_contacts: list) -> list:
+    """
+    Embed each contact's post preview for vector ranking.
+    
+    Returns one embedding (or None) per contact. If the embedding call
+    fails or takes longer than HR_CONTACT_EMBED_TIMEOUT_MS, every entry is
+    None: the contacts are still stored, rank on keywords alone, and are
+    embedded later by the re-embedding worker.
+    """
+    previews = [(i, c.get("post_preview")) for i, c in enumerate(hr_contacts) if isinstance(c, dict) and c.get("post_preview")]
+    embeddings = [None] * len(hr_contacts)
+    if not previews:
+        return embeddings
+    stage = deadline.Deadline(config.HR_CONTACT_EMBED_TIMEOUT_MS / 1000.0, parent=deadline.current())
+    try:
+        with deadline.use(stage):
+            vectors = openai_service.create_embeddings([preview for _, preview in previews])
+    except DeadlineExceededError as e:
+        # Only the request's own deadline or disconnect aborts the write
+        deadline.check("post embedding")
+        logger.warning(f"Storing {len(previews)} HR contacts without post embeddings: {e}")
+        return embeddings
+    except Exception as e:
+        logger.warning(f"Storing {len(previews)} HR contacts without post embeddings: {e}")
+        return embeddings
+    for (i, _), vector in zip(previews, vectors):
+        embeddings[i] = vector
+    return embeddings
+
+def index_contact_terms(db, hr_ids: List[str]) -> None:
+    """Write BM25 postings and document lengths for newly stored contacts."""
+    if hr_ids:
+        db.execute(_INDEX_TERMS_SQL, {"ids": hr_ids})
+        db.execute(_UPDATE_DOC_LENGTH_SQL, {"ids": hr_ids})
+
+@traced()
+def create_hr_contacts(user_id: str, hr_contacts: list, post_embeddings: Optional[list] = None) -> dict:
     """
     Create one or more HR contact entries for a specific user.
     
@@ -14,6 +79,9 @@ def create_hr_contacts(user_id: str, hr_contacts: list) -> dict:
         user_id: User's UUID
         hr_contacts: List of dictionaries with expanded HR contact data.
                      Keys match HRContactData schema (snake_case).
+        post_embeddings: One post embedding (or None) per contact, from
+                     embed_post_previews; when omitted the contacts are
+                     stored unembedded for the re-embedding worker.
         
     Returns:
         Dictionary with created_count, list of hr_ids, failed_count, and failed_contacts
@@ -32,6 +100,9 @@ def create_hr_contacts(user_id: str, hr_contacts: list) -> dict:
     
     created_ids = []
     failed_contacts = []
+    if post_embeddings is None:
+        post_embeddings = [None] * len(hr_contacts)
+    embedding_model, embedding_version = vector_service.current_embedding_version()
     
     with get_db() as db:
         for idx, contact_data in enumerate(hr_contacts):
@@ -67,7 +138,10 @@ def create_hr_contacts(user_id: str, hr_contacts: list) -> dict:
                     post_preview=post_preview,
                     job_description=post_preview, # Sync for compatibility
                     matched_keywords=matched_keywords,
-                    extracted_at=extracted_at
+                    extracted_at=extracted_at,
+                    post_embedding=post_embeddings[idx],
+                    embedding_model=embedding_model if post_embeddings[idx] is not None else None,
+                    embedding_version=embedding_version if post_embeddings[idx] is not None else None
                 )
                 
                 db.add(hr_contact)
@@ -79,11 +153,15 @@ def create_hr_contacts(user_id: str, hr_contacts: list) -> dict:
         
         # Commit all at once
         try:
+            index_contact_terms(db, created_ids)
             db.commit()
         except IntegrityError as e:
             db.rollback()
             raise ValueError(f"Failed to create HR contacts: {str(e)}")
     
+    if created_ids:
+        scoring_service.invalidate(user_id)
+    
     return {
         "created_count": len(created_ids),
         "hr_ids": created_ids,
@@ -91,6 +169,142 @@ def create_hr_contacts(user_id: str, hr_contacts: list) -> dict:
         "failed_contacts": failed_contacts
     }
 
+# Columns written by COPY, in payload order
+_COPY_COLUMNS = (
+    "id", "user_id", "name", "title", "company", "profile_url", "post_url", "email",
+    "job_link", "post_preview", "job_description", "matched_keywords", "extracted_at",
+    "created_at", "post_embedding", "embedding_model", "embedding_version"
+)
+_COPY_SQL = f"COPY hr_contacts ({', '.join(_COPY_COLUMNS)}) FROM STDIN"
+_COPY_ESCAPES = str.maketrans({"\\": "\\\\", "\t": "\\t", "\n": "\\n", "\r": "\\r"})
+
+def _copy_field(value) -> str:
+    """Render one value in COPY text format."""
+    if value is None:
+        return "\\N"
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, list):
+        # JSONB keywords and pgvector embeddings share the same text form
+        return json.dumps(value).translate(_COPY_ESCAPES)
+    return str(value).translate(_COPY_ESCAPES)
+
+def _validation_error(e: ValidationError) -> str:
+    """One-line summary of a Pydantic validation error."""
+    return "; ".join(
+        f"{'.'.join(str(part) for part in error['loc']) or 'line'}: {error['msg']}"
+        for error in e.errors()
+    )
+
+def _nul_field(contact: HRContactData) -> Optional[str]:
+    """Name of the first field containing NUL, which valid JSON allows but Postgres text cannot store."""
+    for name, value in contact:
+        for item in value if isinstance(value, list) else [value]:
+            if isinstance(item, str) and "\x00" in item:
+                return HRContactData.model_fields[name].alias or name
+    return None
+
+# Failures of the connection or the statement as a whole (lost connection,
+# statement timeout, cancel) are not caused by any row, so they abort the batch
+_BATCH_ERRORS = (psycopg2.OperationalError, psycopg2.InterfaceError)
+
+def _copy_rows(db, rows: List[str]) -> None:
+    # COPY goes through the session's own DBAPI connection, inside its transaction
+    with db.connection().connection.cursor() as cursor:
+        cursor.copy_expert(_COPY_SQL, io.StringIO("".join(rows)))
+
+@traced()
+def copy_hr_contact_lines(user_id: str, lines: Iterable[Tuple[int, bytes]], embed: bool = True) -> dict:
+    """
+    Validate a batch of NDJSON contact lines and write the valid ones with COPY.
+    
+    Each line is one HRContactData object. Valid contacts are written in a
+    single COPY and indexed for BM25 in the same transaction, so a batch is
+    stored completely or not at all; invalid lines are reported and skipped.
+    If Postgres still rejects the COPY (bad data, a constraint violation),
+    the batch is retried row by row (one savepoint each) and the rejected
+    lines are reported too.
+    With ``embed`` off, post embeddings are left for the re-embedding worker.
+    
+    Args:
+        user_id: User's UUID (the user must exist)
+        lines: (line number, raw JSON) pairs
+        embed: Whether to embed post previews before writing
+        
+    Returns:
+        Dictionary with created_count and failed (list of line and error)
+    """
+    user_uuid = uuid.UUID(user_id)
+    contacts = []
+    failed = []
+    for line_number, raw in lines:
+        try:
+            contact = HRContactData.model_validate_json(raw)
+        except ValidationError as e:
+            failed.append({"line": line_number, "error": _validation_error(e)})
+            continue
+        if not any([contact.name, contact.email, contact.post_preview]):
+            failed.append({"line": line_number, "error": "Contact must have at least a name, email, or post preview"})
+            continue
+        field = _nul_field(contact)
+        if field is not None:
+            failed.append({"line": line_number, "error": f"{field}: Text must not contain NUL characters"})
+            continue
+        contacts.append((line_number, contact))
+    
+    if not contacts:
+        return {"created_count": 0, "failed": failed}
+    
+    if embed:
+        post_embeddings = embed_post_previews([{"post_preview": c.post_preview} for _, c in contacts])
+    else:
+        post_embeddings = [None] * len(contacts)
+    embedding_model, embedding_version = vector_service.current_embedding_version()
+    created_at = datetime.utcnow()
+    
+    rows = []  # (line number, hr_id, COPY row)
+    for (line_number, contact), embedding in zip(contacts, post_embeddings):
+        hr_id = str(uuid.uuid4())
+        values = (
+            hr_id, user_uuid, contact.name, contact.title, contact.company,
+            contact.profile_url, contact.post_url, contact.email, contact.job_link,
+            contact.post_preview, contact.post_preview, contact.matched_keywords,
+            contact.extracted_at, created_at, embedding,
+            embedding_model if embedding is not None else None,
+            embedding_version if embedding is not None else None
+        )
+        rows.append((line_number, hr_id, "\t".join(_copy_field(value) for value in values) + "\n"))
+    
+    with get_db() as db:
+        try:
+            _copy_rows(db, [row for _, _, row in rows])
+            hr_ids = [hr_id for _, hr_id, _ in rows]
+        except _BATCH_ERRORS:
+            raise
+        except psycopg2.Error:
+            db.rollback()
+            hr_ids = []
+            for line_number, hr_id, row in rows:
+                savepoint = db.begin_nested()
+                try:
+                    _copy_rows(db, [row])
+                except _BATCH_ERRORS:
+                    raise
+                except psycopg2.Error as e:
+                    savepoint.rollback()
+                    failed.append({"line": line_number, "error": e.diag.message_primary or str(e)})
+                    continue
+                savepoint.commit()
+                hr_ids.append(hr_id)
+        index_contact_terms(db, hr_ids)
+        db.commit()
+    
+    failed.sort(key=lambda failure: failure["line"])
+    if hr_ids:
+        scoring_service.invalidate(user_id)
+    return {"created_count": len(hr_ids), "failed": failed}
+
+@traced()
 def get_hr_contact_by_id(user_id: str, hr_id: str) -> Optional[HRContact]:
     """
     Get HR contact by ID for a specific user.
@@ -111,21 +325,204 @@ def get_hr_contact_by_id(user_id: str, hr_id: str) -> Optional[HRContact]:
             db.expunge(contact)
         return contact
 
-def get_all_hr_contacts(user_id: str, limit: int = 100) -> list:
+def _filter_keywords(query, any_keywords: Optional[List[str]], all_keywords: Optional[List[str]]):
+    """
+    Restrict a query to contacts matching keyword filters.
+    
+    Both filters are expressed as JSONB containment (@>), the only operator
+    the jsonb_path_ops GIN index supports; "any" becomes an OR of
+    single-keyword containments.
+    """
+    if any_keywords:
+        query = query.filter(or_(*(HRContact.matched_keywords.contains([k]) for k in any_keywords)))
+    if all_keywords:
+        query = query.filter(HRContact.matched_keywords.contains(list(all_keywords)))
+    return query
+
+@traced()
+def get_all_hr_contacts(
+    user_id: str,
+    limit: int = 100,
+    any_keywords: Optional[List[str]] = None,
+    all_keywords: Optional[List[str]] = None
+) -> list:
     """
     Get all HR contacts for a specific user.
     
     Args:
         user_id: User's UUID
         limit: Maximum number of contacts to return
+        any_keywords: Only contacts matching at least one of these keywords
+        all_keywords: Only contacts matching every one of these keywords
         
     Returns:
         List of HRContact objects belonging to the user
     """
     with get_db() as db:
-        contacts = db.query(HRContact).filter(
-            HRContact.user_id == user_id
-        ).limit(limit).all()
+        query = db.query(HRContact).filter(HRContact.user_id == user_id)
+        contacts = _filter_keywords(query, any_keywords, all_keywords).limit(limit).all()
         for contact in contacts:
             db.expunge(contact)
         return contacts
+
+# Columns an export row carries (everything the API shows for a contact)
+_EXPORT_COLUMNS = (
+    HRContact.id,
+    HRContact.user_id,
+    HRContact.name,
+    HRContact.title,
+    HRContact.company,
+    HRContact.profile_url,
+    HRContact.post_url,
+    HRContact.email,
+    HRContact.job_link,
+    HRContact.post_preview,
+    HRContact.matched_keywords,
+    HRContact.extracted_at,
+    HRContact.created_at,
+)
+
+def stream_hr_contacts(
+    user_id: str,
+    any_keywords: Optional[List[str]] = None,
+    all_keywords: Optional[List[str]] = None,
+    batch_size: int = config.EXPORT_BATCH_SIZE
+) -> Iterator[list]:
+    """
+    Stream all of a user's HR contacts, oldest first, from a server-side cursor.
+    
+    Rows are plain column tuples (no ORM identity map), fetched ``batch_size``
+    at a time, so memory stays constant however many contacts the user has.
+    The session stays open until the generator is exhausted or closed.
+    
+    Args:
+        user_id: User's UUID
+        any_keywords: Only contacts matching at least one of these keywords
+        all_keywords: Only contacts matching every one of these keywords
+        batch_size: Rows per fetch
+        
+    Yields:
+        Lists of up to ``batch_size`` rows with HRContact attribute names
+    """
+    with get_db() as db:
+        query = _filter_keywords(
+            db.query(*_EXPORT_COLUMNS).filter(HRContact.user_id == user_id),
+            any_keywords,
+            all_keywords
+        ).order_by(HRContact.created_at, HRContact.id)
+        result = db.execute(query.statement, execution_options={"yield_per": batch_size})
+        for rows in result.partitions():
+            yield rows
+
+# Characters escaped before highlighting, '&' first so entities are not escaped twice
+_HTML_ESCAPES = (("&", "&amp;"), ("<", "&lt;"), (">", "&gt;"), ('"', "&quot;"), ("'", "&#39;"))
+
+def _html_escaped(column):
+    """SQL expression for ``column`` HTML-escaped (NULL as empty), so headlines carry no scraped markup."""
+    expression = func.coalesce(column, "")
+    for char, entity in _HTML_ESCAPES:
+        expression = func.replace(expression, char, entity)
+    return expression
+
+# Marks matched terms; post previews are cut to their best-matching fragments
+_HEADLINE_OPTIONS = "StartSel=<mark>, StopSel=</mark>, MaxFragments=2, MaxWords=30, MinWords=10"
+_FULL_HEADLINE_OPTIONS = "StartSel=<mark>, StopSel=</mark>, HighlightAll=true"
+
+@traced()
+def search_hr_contacts(user_id: str, query: str, limit: int = 20) -> list:
+    """
+    Full-text search over a user's HR contacts (name, company, title, post preview).
+    
+    Uses the GIN-indexed search_vector column; ``query`` follows web search
+    syntax ("quoted phrases", OR, -excluded).
+    
+    Args:
+        user_id: User's UUID
+        query: Search text
+        limit: Maximum number of results
+        
+    Returns:
+        List of dictionaries with the HRContact, its rank (0-1) and
+        highlighted title and post preview (HTML: escaped text with <mark>
+        around matches), best match first
+    """
+    tsquery = func.websearch_to_tsquery("english", query)
+    with get_db() as db:
+        # Rank and cut to the top results first, so headlines are only built for those
+        ranked = (
+            db.query(
+                HRContact.id.label("id"),
+                func.ts_rank_cd(HRContact.search_vector, tsquery, 32).label("rank")
+            )
+            .filter(
+                HRContact.user_id == user_id,
+                HRContact.search_vector.op("@@")(tsquery)
+            )
+            .order_by(func.ts_rank_cd(HRContact.search_vector, tsquery, 32).desc(), HRContact.id)
+            .limit(limit)
+            .subquery()
+        )
+        rows = (
+            db.query(
+                HRContact,
+                ranked.c.rank,
+                func.ts_headline("english", _html_escaped(HRContact.title), tsquery, _FULL_HEADLINE_OPTIONS),
+                func.ts_headline("english", _html_escaped(HRContact.post_preview), tsquery, _HEADLINE_OPTIONS)
+            )
+            .join(ranked, ranked.c.id == HRContact.id)
+            .order_by(ranked.c.rank.desc(), HRContact.id)
+            .all()
+        )
+        results = []
+        for contact, rank, title_headline, preview_headline in rows:
+            db.expunge(contact)
+            results.append({
+                "contact": contact,
+                "rank": float(rank),
+                "highlights": {
+                    "title": title_headline if contact.title else None,
+                    "postPreview": preview_headline if contact.post_preview else None
+                }
+            })
+        return results
+
+@traced()
+def get_keyword_facets(
+    user_id: str,
+    any_keywords: Optional[List[str]] = None,
+    all_keywords: Optional[List[str]] = None,
+    limit: int = 50
+) -> list:
+    """
+    Count a user's HR contacts per matched keyword.
+    
+    Args:
+        user_id: User's UUID
+        any_keywords: Count only contacts matching at least one of these keywords
+        all_keywords: Count only contacts matching every one of these keywords
+        limit: Maximum number of keywords to return
+        
+    Returns:
+        List of dictionaries with keyword and count, most frequent first
+    """
+    with get_db() as db:
+        contacts = _filter_keywords(
+            db.query(HRContact.matched_keywords).filter(
+                HRContact.user_id == user_id,
+                func.jsonb_typeof(HRContact.matched_keywords) == "array"
+            ),
+            any_keywords,
+            all_keywords
+        ).subquery()
+        keyword = func.jsonb_array_elements_text(contacts.c.matched_keywords).table_valued("value").render_derived()
+        count = func.count().label("count")
+        rows = (
+            db.query(keyword.c.value, count)
+            .select_from(contacts)
+            .join(keyword, true())
+            .group_by(keyword.c.value)
+            .order_by(count.desc(), keyword.c.value)
+            .limit(limit)
+            .all()
+        )
+        return [{"keyword": value, "count": n} for value, n in rows]
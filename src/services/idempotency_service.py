@@ -0,0 +1,121 @@
+"""Idempotency key service for safely retried POST requests."""
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+
+from sqlalchemy import delete
+from sqlalchemy.dialects.postgresql import insert
+
+from src.config import config
+from src.lib.postgres import get_db
+from src.lib.tracing import traced
+from src.models.idempotency import IdempotencyKey
+
+IN_PROGRESS = "in_progress"
+COMPLETED = "completed"
+
+_last_sweep = 0.0
+_sweep_lock = threading.Lock()
+
+def _sweep_due() -> bool:
+    """Rate-limit the global expiry sweep to once per IDEMPOTENCY_SWEEP_INTERVAL_S per process."""
+    global _last_sweep
+    with _sweep_lock:
+        now = time.monotonic()
+        if now - _last_sweep < config.IDEMPOTENCY_SWEEP_INTERVAL_S:
+            return False
+        _last_sweep = now
+        return True
+
+@traced()
+def claim_idempotency_key(scope: str, key: str, request_hash: str) -> Optional[Dict[str, Any]]:
+    """
+    Try to take ownership of an idempotency key.
+
+    Args:
+        scope: Method and route the key applies to (e.g. "POST /gen-email")
+        key: Client-supplied Idempotency-Key
+        request_hash: Hash of the request body
+
+    Returns:
+        None if the caller now owns the key and must process the request,
+        otherwise the existing record as a dictionary
+    """
+    now = datetime.utcnow()
+    with get_db() as db:
+        if _sweep_due():
+            db.execute(delete(IdempotencyKey).where(IdempotencyKey.expires_at <= now))
+        else:
+            # Finished rows past their TTL and abandoned in-progress rows free the key
+            db.execute(delete(IdempotencyKey).where(
+                IdempotencyKey.scope == scope,
+                IdempotencyKey.key == key,
+                IdempotencyKey.expires_at <= now
+            ))
+
+        claimed = db.execute(
+            insert(IdempotencyKey)
+            .values(
+                scope=scope,
+                key=key,
+                request_hash=request_hash,
+                status=IN_PROGRESS,
+                created_at=now,
+                expires_at=now + timedelta(seconds=config.IDEMPOTENCY_LOCK_TIMEOUT_S)
+            )
+            .on_conflict_do_nothing(index_elements=["scope", "key"])
+            .returning(IdempotencyKey.key)
+        ).first()
+        if claimed:
+            return None
+
+        record = db.get(IdempotencyKey, (scope, key))
+        if record is None:
+            # Deleted between the insert and the read; report it as still in flight
+            return {"status": IN_PROGRESS, "request_hash": request_hash}
+        return {
+            "status": record.status,
+            "request_hash": record.request_hash,
+            "response_status": record.response_status,
+            "response_body": record.response_body,
+            "content_type": record.content_type,
+        }
+
+@traced()
+def complete_idempotency_key(scope: str, key: str, status_code: int, body: bytes, content_type: Optional[str]) -> None:
+    """
+    Store the response for a claimed key so retries replay it.
+
+    Args:
+        scope: Method and route the key applies to
+        key: Client-supplied Idempotency-Key
+        status_code: HTTP status of the original response
+        body: Response body
+        content_type: Response Content-Type
+    """
+    with get_db() as db:
+        record = db.get(IdempotencyKey, (scope, key))
+        if record is None:
+            return
+        record.status = COMPLETED
+        record.response_status = status_code
+        record.response_body = body
+        record.content_type = content_type
+        record.expires_at = datetime.utcnow() + timedelta(seconds=config.IDEMPOTENCY_TTL_S)
+
+@traced()
+def release_idempotency_key(scope: str, key: str) -> None:
+    """
+    Drop an in-progress claim whose request failed, so a retry runs again.
+
+    Args:
+        scope: Method and route the key applies to
+        key: Client-supplied Idempotency-Key
+    """
+    with get_db() as db:
+        db.execute(delete(IdempotencyKey).where(
+            IdempotencyKey.scope == scope,
+            IdempotencyKey.key == key,
+            IdempotencyKey.status == IN_PROGRESS
+        ))
@@ -1,30 +1,242 @@
 """OpenAI service for embeddings and chat completion."""
+import hashlib
 import json
-from typing import List, Dict, Optional
+import logging
+from typing import Any, List, Dict, Optional
 
+import openai
+
+from src.lib import deadline
+from src.lib.batcher import MicroBatcher
+from src.lib.circuit_breaker import get_breaker
+from src.lib.hedging import HedgedCaller
 from src.lib.openai_client import get_openai_client
+from src.lib.metrics import track_stage
+from src.lib.rate_limiter import scheduler, estimate_tokens
+from src.lib.singleflight import SingleFlight
+from src.lib.tracing import start_as_current_span, traced, SPAN_KIND_CLIENT
 from src.config import config
 from src.prompts.email_prompt import create_email_prompt
 
-def create_embedding(text: str) -> List[float]:
+logger = logging.getLogger(__name__)
+
+# Coalesce identical in-flight requests so duplicates share one upstream call
+_embedding_flight = SingleFlight("embedding")
+_email_flight = SingleFlight("email")
+
+# Breakers open on upstream outages (connection errors, timeouts, 5xx);
+# 4xx and client-side rate limiting do not count against OpenAI's health
+_UPSTREAM_FAILURES = (openai.APIConnectionError, openai.InternalServerError)
+# Rejections of the input itself (e.g. a text over the model's token limit)
+INPUT_ERRORS = (openai.BadRequestError, openai.UnprocessableEntityError)
+_embedding_breaker = get_breaker(
+    "openai_embeddings",
+    failure_types=_UPSTREAM_FAILURES,
+    slow_call_s=config.CIRCUIT_OPENAI_SLOW_CALL_S
+)
+_chat_breaker = get_breaker(
+    "openai_chat",
+    failure_types=_UPSTREAM_FAILURES,
+    slow_call_s=config.CIRCUIT_OPENAI_SLOW_CALL_S
+)
+
+# Chat completions are routed by endpoint latency and hedged when slow
+_chat_hedger = HedgedCaller.from_config()
+
+def _record_usage(span, response) -> None:
+    """Attach token usage from an OpenAI response to a span."""
+    usage = getattr(response, "usage", None)
+    if usage is None:
+        return
+    span.set_attributes({
+        "gen_ai.response.model": getattr(response, "model", None),
+        "gen_ai.usage.input_tokens": getattr(usage, "prompt_tokens", None),
+        "gen_ai.usage.output_tokens": getattr(usage, "completion_tokens", None),
+        "gen_ai.usage.total_tokens": getattr(usage, "total_tokens", None),
+    })
+
+def _call_with_deadline(create, **kwargs):
+    """Call an SDK method with the request's remaining time as its timeout."""
+    deadline.check("openai request")
+    remaining = deadline.remaining()
+    if remaining is None:
+        return create(**kwargs)
+    try:
+        return create(timeout=remaining, **kwargs)
+    except openai.APITimeoutError:
+        # Report our own deadline rather than an upstream timeout, so it is
+        # neither retried nor counted against the circuit breaker
+        deadline.check("openai response")
+        raise
+
+def _content_key(*parts: str) -> str:
+    """Stable key identifying a request by its content."""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\x00")
+    return digest.hexdigest()
+
+def _embedding_params(model: str) -> Dict[str, Any]:
+    """Extra request parameters so every model fits the EMBEDDING_DIMENSIONS columns."""
+    # text-embedding-3 models can be shortened to any width, so switching
+    # between them needs no schema change
+    if model.startswith("text-embedding-3"):
+        return {"dimensions": config.EMBEDDING_DIMENSIONS}
+    return {}
+
+def _request_embeddings(texts: List[str], model: Optional[str] = None) -> List[List[float]]:
+    """Embed several texts in one multi-input API call."""
+    client = get_openai_client()
+    model = model or config.EMBEDDING_MODEL
+    
+    with track_stage("embedding"), start_as_current_span(
+        "openai.embeddings",
+        {
+            "gen_ai.system": "openai",
+            "gen_ai.request.model": model,
+            "gen_ai.request.batch_size": len(texts),
+        },
+        kind=SPAN_KIND_CLIENT
+    ) as span:
+        response = scheduler.call(
+            model,
+            sum(estimate_tokens(text) for text in texts),
+            lambda: _embedding_breaker.call(lambda: _call_with_deadline(
+                client.embeddings.create,
+                model=model,
+                input=texts,
+                **_embedding_params(model)
+            ))
+        )
+        _record_usage(span, response)
+    
+    return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+
+# Concurrent single-text embeddings are merged into multi-input calls
+_embedding_batcher = MicroBatcher(
+    "embedding",
+    _request_embeddings,
+    max_batch_size=config.EMBEDDING_BATCH_MAX_SIZE,
+    max_batch_weight=config.EMBEDDING_BATCH_MAX_TOKENS,
+    max_wait=config.EMBEDDING_BATCH_WAIT_MS / 1000.0,
+    weigh=estimate_tokens,
+    split_on=INPUT_ERRORS
+)
+
+def chat_request_body(prompt: str, n: int = 1) -> Dict[str, Any]:
+    """Chat completion parameters for an email prompt (shared by live and batch requests)."""
+    return {
+        "model": config.CHAT_MODEL,
+        "messages": [
+            {"role": "user", "content": prompt}
+        ],
+        "response_format": {"type": "json_object"},
+        "temperature": 0.7,
+        "max_tokens": 1000,
+        "n": n,
+    }
+
+def parse_email(content: Optional[str]) -> Optional[Dict[str, str]]:
+    """Parse one completion choice into subject/body, or None if it is malformed."""
+    try:
+        result = json.loads(content or "")
+    except json.JSONDecodeError:
+        return None
+    if not isinstance(result, dict) or not result.get("subject") or not result.get("body"):
+        return None
+    return {
+        "subject": result["subject"],
+        "body": result["body"]
+    }
+
+def _request_emails(prompt: str, n: int) -> List[Dict[str, str]]:
+    """Request ``n`` alternative emails as choices of one completion."""
+    with track_stage("chat_completion"), start_as_current_span(
+        "openai.chat.completions",
+        {
+            "gen_ai.system": "openai",
+            "gen_ai.request.model": config.CHAT_MODEL,
+            "gen_ai.request.max_tokens": 1000,
+            "gen_ai.request.choice.count": n,
+        },
+        kind=SPAN_KIND_CLIENT
+    ) as span:
+        # TPM is charged for the prompt plus max_tokens per choice, so budget for both
+        response = _chat_hedger.call(lambda client: scheduler.call(
+            config.CHAT_MODEL,
+            estimate_tokens(prompt) + 1000 * n,
+            lambda: _chat_breaker.call(lambda: _call_with_deadline(
+                client.chat.completions.create,
+                **chat_request_body(prompt, n)
+            ))
+        ))
+        _record_usage(span, response)
+    
+    # Parse and validate every choice; a truncated or malformed one is dropped
+    choices = sorted(response.choices, key=lambda choice: choice.index)
+    emails = [email for email in (parse_email(c.message.content) for c in choices) if email]
+    if not emails:
+        raise ValueError("Invalid response format from OpenAI")
+    if len(emails) < len(choices):
+        logger.warning(f"Dropped {len(choices) - len(emails)} malformed email variant(s) of {len(choices)}")
+    
+    return emails
+
+@traced()
+def create_embedding(text: str, model: Optional[str] = None) -> List[float]:
     """
     Create embedding for text using OpenAI.
     
+    Concurrent calls for the same text share a single API request, and
+    concurrent calls for different texts are batched into one request.
+    
     Args:
         text: Text to embed
+        model: Embedding model (default EMBEDDING_MODEL; others, such as the
+            previous model during a re-embedding, are not batched)
         
     Returns:
         List of floats representing the embedding vector
     """
-    client = get_openai_client()
+    model = model or config.EMBEDDING_MODEL
+    key = _content_key(model, text)
+    if model != config.EMBEDDING_MODEL:
+        return list(_embedding_flight.do(key, lambda: _request_embeddings([text], model)[0]))
+    return list(_embedding_flight.do(key, lambda: _embedding_batcher.submit(text)))
+
+@traced()
+def create_embeddings(texts: List[str], model: Optional[str] = None) -> List[List[float]]:
+    """
+    Embed many texts in API calls of at most EMBEDDING_BATCH_MAX_SIZE texts
+    and EMBEDDING_BATCH_MAX_TOKENS estimated tokens.
     
-    response = client.embeddings.create(
-        model=config.EMBEDDING_MODEL,
-        input=text
-    )
+    For offline jobs that already hold a list of texts; request handlers
+    should use create_embedding, which batches across concurrent callers.
     
-    return response.data[0].embedding
+    Args:
+        texts: Texts to embed
+        model: Embedding model (default EMBEDDING_MODEL)
+        
+    Returns:
+        One embedding per text, in order
+    """
+    embeddings: List[List[float]] = []
+    chunk: List[str] = []
+    chunk_tokens = 0
+    for text in texts:
+        tokens = estimate_tokens(text)
+        # A text over the token limit on its own still goes out, alone
+        if chunk and (len(chunk) >= config.EMBEDDING_BATCH_MAX_SIZE or chunk_tokens + tokens > config.EMBEDDING_BATCH_MAX_TOKENS):
+            embeddings.extend(_request_embeddings(chunk, model))
+            chunk, chunk_tokens = [], 0
+        chunk.append(text)
+        chunk_tokens += tokens
+    if chunk:
+        embeddings.extend(_request_embeddings(chunk, model))
+    return embeddings
 
+@traced()
 def generate_email(
     resume_text: str, 
     job_description: str,
@@ -45,8 +257,44 @@ def generate_email(
     Returns:
         Dictionary with 'subject' and 'body' keys
     """
-    client = get_openai_client()
+    return generate_email_variants(
+        resume_text=resume_text,
+        job_description=job_description,
+        hr_name=hr_name,
+        hr_title=hr_title,
+        company=company
+    )[0]
+
+@traced()
+def generate_email_variants(
+    resume_text: str, 
+    job_description: str,
+    hr_name: Optional[str] = None,
+    hr_title: Optional[str] = None,
+    company: Optional[str] = None,
+    variants: int = 1
+) -> List[Dict[str, str]]:
+    """
+    Generate alternative emails in a single chat completion (using ``n``).
+    
+    Concurrent calls that build the same prompt (e.g. a double-clicked
+    /gen-email for one user and HR contact) share a single completion.
     
+    Args:
+        resume_text: Candidate's resume text
+        job_description: Job description text
+        hr_name: HR contact name (optional)
+        hr_title: HR contact title (optional)
+        company: Company name (optional)
+        variants: Number of alternatives to request
+        
+    Returns:
+        List of dictionaries with 'subject' and 'body' keys; malformed
+        choices are dropped, so it may be shorter than ``variants``
+        
+    Raises:
+        ValueError: If no choice is a valid email
+    """
     # Create prompt
     prompt = create_email_prompt(
         resume_text=resume_text, 
@@ -56,25 +304,5 @@ def generate_email(
         company=company
     )
     
-    # Call OpenAI
-    response = client.chat.completions.create(
-        model=config.CHAT_MODEL,
-        messages=[
-            {"role": "user", "content": prompt}
-        ],
-        response_format={"type": "json_object"},
-        temperature=0.7,
-        max_tokens=1000
-    )
-    
-    # Parse response
-    result = json.loads(response.choices[0].message.content)
-    
-    # Validate response structure
-    if "subject" not in result or "body" not in result:
-        raise ValueError("Invalid response format from OpenAI")
-    
-    return {
-        "subject": result["subject"],
-        "body": result["body"]
-    }
+    key = _content_key(config.CHAT_MODEL, str(variants), prompt)
+    return [dict(email) for email in _email_flight.do(key, lambda: _request_emails(prompt, variants))]
@@ -0,0 +1,185 @@
+"""Hybrid lexical + vector ranking of a user's HR contacts against their resume.
+
+Lexical relevance is BM25 over each contact's post preview and matched
+keywords, using the per-user postings in ``contact_terms`` (written on
+ingest, so document frequencies are never recomputed from the posts).
+Vector relevance is the cosine similarity of the post embedding to the
+resume embedding, computed in memory by ``scoring_service``. BM25 is
+divided by the best score and similarity is min-max scaled over the user's
+contacts, so both lie in 0-1, and they are combined with
+HYBRID_LEXICAL_WEIGHT and HYBRID_VECTOR_WEIGHT.
+"""
+import math
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import func, select
+
+from src.config import config
+from src.lib.postgres import get_db
+from src.lib.tracing import traced
+from src.models.contact_term import ContactTerm
+from src.models.hr import HRContact
+from src.services import openai_service, scoring_service, vector_service
+
+def _bm25_scores(
+    postings: List[Tuple[str, str, int, int]],
+    doc_count: int,
+    avg_length: float,
+    k1: float,
+    b: float
+) -> Dict[str, float]:
+    """
+    BM25 score per contact.
+
+    Args:
+        postings: (hr_id, term, tf, doc_length) for every query term a contact contains
+        doc_count: Number of the user's contacts
+        avg_length: Average document length over the user's contacts
+    """
+    doc_freq: Dict[str, int] = defaultdict(int)
+    for _, term, _, _ in postings:
+        doc_freq[term] += 1
+
+    scores: Dict[str, float] = defaultdict(float)
+    avg_length = avg_length or 1.0
+    for hr_id, term, tf, length in postings:
+        df = doc_freq[term]
+        idf = math.log(1 + (doc_count - df + 0.5) / (df + 0.5))
+        norm = k1 * (1 - b + b * (length or 0) / avg_length)
+        scores[hr_id] += idf * tf * (k1 + 1) / (tf + norm)
+    return scores
+
+def _relative(values: Dict[str, float]) -> Dict[str, float]:
+    """Scale to 0-1 by the largest value, keeping 0 as "no match"."""
+    high = max(values.values(), default=0.0)
+    if high <= 0:
+        return {key: 0.0 for key in values}
+    return {key: value / high for key, value in values.items()}
+
+def _scaled(values: Dict[str, float]) -> Dict[str, float]:
+    """Min-max scale to 0-1 (all 1.0 when every value is equal)."""
+    if not values:
+        return {}
+    low, high = min(values.values()), max(values.values())
+    if high <= low:
+        return {key: 1.0 for key in values}
+    return {key: (value - low) / (high - low) for key, value in values.items()}
+
+@traced()
+def _lexical_scores(user_id: str, resume_text: str) -> Dict[str, float]:
+    """BM25 of the resume's terms against each of the user's contacts."""
+    with get_db() as db:
+        lexemes = func.unnest(func.to_tsvector("english", resume_text)).table_valued("lexeme", "positions", "weights")
+        terms = [term for (term,) in db.execute(select(lexemes.c.lexeme)).all()]
+        if not terms:
+            return {}
+
+        doc_count, avg_length = db.query(
+            func.count(HRContact.id),
+            func.avg(HRContact.doc_length)
+        ).filter(HRContact.user_id == user_id).one()
+        if not doc_count:
+            return {}
+
+        postings = db.query(
+            ContactTerm.hr_id,
+            ContactTerm.term,
+            ContactTerm.tf,
+            HRContact.doc_length
+        ).join(HRContact, HRContact.id == ContactTerm.hr_id).filter(
+            ContactTerm.user_id == user_id,
+            ContactTerm.term.in_(terms)
+        ).all()
+
+    return _bm25_scores(
+        [(str(hr_id), term, tf, length) for hr_id, term, tf, length in postings],
+        doc_count,
+        float(avg_length or 0.0),
+        config.BM25_K1,
+        config.BM25_B
+    )
+
+@traced()
+def _vector_similarities(user_id: str, resume: Dict) -> Dict[str, float]:
+    """
+    Resume similarity of each contact, comparing embeddings of the same version only.
+
+    Contacts still on the previous version during a re-embedding are scored
+    against the resume embedded with that version's model.
+    """
+    similarities: Dict[str, float] = {}
+    for version in vector_service.active_embedding_versions():
+        matrix = scoring_service.get_contact_matrix(user_id, version)
+        if not matrix.hr_ids:
+            continue
+        if tuple(resume["embedding_version"]) == version:
+            vector = resume["embedding"]
+        else:
+            vector = openai_service.create_embedding(resume["resume_text"], model=version[0])
+        similarities.update(zip(matrix.hr_ids, matrix.scores(vector).tolist()))
+    return similarities
+
+@traced()
+def rank_contacts(
+    user_id: str,
+    limit: int = 20,
+    lexical_weight: Optional[float] = None,
+    vector_weight: Optional[float] = None
+) -> List[Dict]:
+    """
+    Rank a user's HR contacts by how well their posts match the user's resume.
+
+    Args:
+        user_id: User's UUID
+        limit: Number of contacts to return
+        lexical_weight: BM25 weight (default HYBRID_LEXICAL_WEIGHT)
+        vector_weight: Cosine similarity weight (default HYBRID_VECTOR_WEIGHT)
+
+    Returns:
+        List of dictionaries with the HRContact, its fused score, BM25 score
+        and cosine similarity (None without a post embedding), best first
+
+    Raises:
+        ValueError: If the user has no resume
+    """
+    lexical_weight = config.HYBRID_LEXICAL_WEIGHT if lexical_weight is None else lexical_weight
+    vector_weight = config.HYBRID_VECTOR_WEIGHT if vector_weight is None else vector_weight
+
+    resume = vector_service.get_resume_by_user_id(user_id)
+    if not resume:
+        raise ValueError(f"Resume not found for user: {user_id}")
+
+    bm25 = _lexical_scores(user_id, resume["resume_text"])
+    similarities = _vector_similarities(user_id, resume)
+    lexical, vector = _relative(bm25), _scaled(similarities)
+
+    # Fuse as arrays so the best ``limit`` are picked with argpartition
+    hr_ids = list(dict.fromkeys([*lexical, *vector]))
+    scores = (
+        lexical_weight * np.fromiter((lexical.get(hr_id, 0.0) for hr_id in hr_ids), dtype=np.float64, count=len(hr_ids))
+        + vector_weight * np.fromiter((vector.get(hr_id, 0.0) for hr_id in hr_ids), dtype=np.float64, count=len(hr_ids))
+    )
+    top = [(hr_ids[i], float(scores[i])) for i in scoring_service.top_k(scores, limit)]
+    if not top:
+        return []
+
+    with get_db() as db:
+        contacts = {
+            str(contact.id): contact
+            for contact in db.query(HRContact).filter(HRContact.id.in_([hr_id for hr_id, _ in top])).all()
+        }
+        for contact in contacts.values():
+            db.expunge(contact)
+
+    return [
+        {
+            "contact": contacts[hr_id],
+            "score": round(score, 4),
+            "bm25": round(bm25.get(hr_id, 0.0), 4),
+            "similarity": round(similarities[hr_id], 4) if hr_id in similarities else None,
+        }
+        for hr_id, score in top
+        if hr_id in contacts
+    ]
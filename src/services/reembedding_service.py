@@ -0,0 +1,234 @@
+"""Background re-embedding after an embedding model or version change.
+
+Every stored embedding records the model and version that produced it. After
+EMBEDDING_MODEL or EMBEDDING_VERSION changes, this worker walks each
+embedding-bearing table in primary-key order and re-embeds the rows that are
+on any other version (or, for contact posts, were never embedded) with
+multi-input embedding calls, committing every batch. It can be stopped and
+restarted at any time: migrated rows carry the current version and are not
+selected again. A row whose text the API rejects (e.g. over the model's
+token limit) is logged and skipped, so it cannot stall the run; it stays
+pending in ``status``. Throughput is capped at REEMBED_TOKENS_PER_MINUTE so live
+traffic keeps its share of the OpenAI budget.
+
+To switch models online:
+
+1. Deploy with the new EMBEDDING_MODEL (or a bumped EMBEDDING_VERSION) and
+   EMBEDDING_PREVIOUS_MODEL / EMBEDDING_PREVIOUS_VERSION set to the old
+   values, so queries also match rows that are not migrated yet.
+2. Run this worker until ``status`` reports nothing pending.
+3. Unset EMBEDDING_PREVIOUS_MODEL.
+
+    python -m src.services.reembedding_service run [--table resumes] [--batch-size 256]
+    python -m src.services.reembedding_service status
+
+Generated emails whose contact (and so job description) has been deleted
+cannot be re-embedded; they stop being served by the semantic cache once the
+previous version is retired.
+"""
+import argparse
+import json
+import logging
+import time
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import bindparam, func, or_, update
+
+from src.config import config
+from src.lib.postgres import get_db
+from src.lib.rate_limiter import TokenBucket, estimate_tokens
+from src.lib.tracing import traced
+from src.models.generated_email import GeneratedEmail
+from src.models.hr import HRContact
+from src.models.resume import Resume
+from src.services import openai_service, vector_service
+
+logger = logging.getLogger(__name__)
+
+class _Target(NamedTuple):
+    model: Any
+    embedding: Any
+    text: Any  # column holding the text the embedding was made from
+    join: Optional[tuple] = None
+
+TARGETS: Dict[str, _Target] = {
+    "resumes": _Target(Resume, Resume.resume_embedding, Resume.resume_text),
+    "hr_contacts": _Target(HRContact, HRContact.post_embedding, HRContact.post_preview),
+    # Emails are embedded by the job description of the contact they were written for
+    "generated_emails": _Target(
+        GeneratedEmail,
+        GeneratedEmail.job_embedding,
+        HRContact.job_description,
+        (HRContact, HRContact.id == GeneratedEmail.hr_id)
+    ),
+}
+
+def _stale(target: _Target, version: vector_service.EmbeddingVersion):
+    """Rows whose embedding is missing or was made by another version."""
+    model = target.model
+    return or_(
+        target.embedding.is_(None),
+        model.embedding_model.is_(None),
+        model.embedding_model != version[0],
+        model.embedding_version.is_(None),
+        model.embedding_version != version[1]
+    )
+
+def _pending_query(db, target: _Target, version: vector_service.EmbeddingVersion):
+    query = db.query(target.model.id, target.text).select_from(target.model)
+    if target.join is not None:
+        query = query.join(*target.join)
+    return query.filter(_stale(target, version), target.text.isnot(None), target.text != "")
+
+def _update_statement(target: _Target, version: vector_service.EmbeddingVersion):
+    table = target.model.__table__
+    values = {
+        target.embedding.key: bindparam("new_embedding"),
+        "embedding_model": version[0],
+        "embedding_version": version[1],
+    }
+    if "updated_at" in table.c:
+        # Not a content change: a newer resume updated_at would retire the user's cached emails
+        values["updated_at"] = table.c.updated_at
+    # Re-checking staleness skips rows rewritten by a live request meanwhile
+    return update(table).where(
+        table.c.id == bindparam("row_id"),
+        _stale(target, version)
+    ).values(values)
+
+def _embed_rows(name: str, rows: List[tuple], model: str) -> List[Tuple[Any, List[float]]]:
+    """
+    Embed a batch of (id, text) rows, retrying row by row if the API rejects the batch.
+
+    Returns:
+        (id, embedding) pairs for the rows that could be embedded
+    """
+    texts = [text for _, text in rows]
+    try:
+        return list(zip([row_id for row_id, _ in rows], openai_service.create_embeddings(texts, model=model)))
+    except openai_service.INPUT_ERRORS as e:
+        if len(rows) == 1:
+            logger.warning(f"Skipping {name} row {rows[0][0]}: embedding rejected: {e}")
+            return []
+    embedded = []
+    for row in rows:
+        embedded.extend(_embed_rows(name, [row], model))
+    return embedded
+
+@traced()
+def reembed_table(
+    name: str,
+    batch_size: int = config.REEMBED_BATCH_SIZE,
+    tokens_per_minute: int = config.REEMBED_TOKENS_PER_MINUTE
+) -> Dict[str, int]:
+    """
+    Re-embed every row of one table that is not on the current embedding version.
+
+    Args:
+        name: Table name (a key of TARGETS)
+        batch_size: Rows read, embedded and committed together
+        tokens_per_minute: Embedding token budget for this worker
+
+    Returns:
+        Counts of rows embedded, rows skipped (rejected by the API) and batches committed
+    """
+    target = TARGETS[name]
+    version = vector_service.current_embedding_version()
+    budget = TokenBucket(tokens_per_minute, tokens_per_minute / 60.0)
+    stats = {"embedded": 0, "skipped": 0, "batches": 0}
+    after = None
+
+    while True:
+        with get_db() as db:
+            query = _pending_query(db, target, version)
+            if after is not None:
+                query = query.filter(target.model.id > after)
+            rows = query.order_by(target.model.id).limit(batch_size).all()
+        if not rows:
+            break
+        after = rows[-1][0]
+
+        time.sleep(budget.reserve(sum(estimate_tokens(text) for _, text in rows), time.monotonic(), 1.0))
+        embedded = _embed_rows(name, rows, version[0])
+
+        if embedded:
+            with get_db() as db:
+                db.execute(_update_statement(target, version), [
+                    {"row_id": row_id, "new_embedding": embedding}
+                    for row_id, embedding in embedded
+                ])
+        stats["embedded"] += len(embedded)
+        stats["skipped"] += len(rows) - len(embedded)
+        stats["batches"] += 1
+        logger.info(f"Re-embedded {stats['embedded']} {name} rows (through {after})")
+
+    return stats
+
+@traced()
+def reembed_all(
+    tables: Optional[List[str]] = None,
+    batch_size: int = config.REEMBED_BATCH_SIZE,
+    tokens_per_minute: int = config.REEMBED_TOKENS_PER_MINUTE
+) -> Dict[str, Dict[str, int]]:
+    """
+    Re-embed stale rows of each table in turn.
+
+    Args:
+        tables: Tables to process (default: all)
+        batch_size: Rows read, embedded and committed together
+        tokens_per_minute: Embedding token budget for this worker
+
+    Returns:
+        Counts per table
+    """
+    return {
+        name: reembed_table(name, batch_size, tokens_per_minute)
+        for name in (tables or list(TARGETS))
+    }
+
+@traced()
+def embedding_status() -> Dict[str, Dict[str, Any]]:
+    """
+    Row counts per embedding version and rows still to re-embed, per table.
+
+    Returns:
+        Dictionary of table name to 'versions' ("model:version" -> rows) and 'pending'
+    """
+    version = vector_service.current_embedding_version()
+    status: Dict[str, Dict[str, Any]] = {}
+    with get_db() as db:
+        for name, target in TARGETS.items():
+            model = target.model
+            counts = (
+                db.query(model.embedding_model, model.embedding_version, func.count(model.id))
+                .filter(target.embedding.isnot(None))
+                .group_by(model.embedding_model, model.embedding_version)
+                .all()
+            )
+            status[name] = {
+                "versions": {f"{m}:{v}": count for m, v, count in counts},
+                "pending": _pending_query(db, target, version).count(),
+            }
+    return status
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Re-embed stored embeddings with the current embedding model")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="Re-embed rows not on the current version")
+    run.add_argument("--table", action="append", dest="tables", choices=list(TARGETS))
+    run.add_argument("--batch-size", type=int, default=config.REEMBED_BATCH_SIZE)
+    run.add_argument("--tokens-per-minute", type=int, default=config.REEMBED_TOKENS_PER_MINUTE)
+
+    commands.add_parser("status", help="Show rows per embedding version and rows pending")
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    if args.command == "run":
+        print(json.dumps(reembed_all(args.tables, args.batch_size, args.tokens_per_minute)))
+    else:
+        print(json.dumps(embedding_status(), indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""In-memory vectorized scoring of a user's HR contacts.
+
+A user's contact post embeddings are loaded once into a contiguous,
+row-normalised float32 matrix and kept in a process-wide LRU cache bounded
+by CONTACT_MATRIX_CACHE_MB. Scoring any query vector (a resume, or several
+variants of one) is then a single matrix-vector product, with top-k picked
+by ``argpartition``, instead of a pgvector query per variant. Matrices are kept per embedding version and
+dropped when the user ingests contacts in this process, and a cheap
+fingerprint query catches changes made by other processes (including the
+re-embedding worker). Only plain column reads are used, so scoring works
+without any pgvector index.
+"""
+import threading
+from collections import OrderedDict
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from src.config import config
+from src.lib import metrics
+from src.lib.singleflight import SingleFlight
+from src.lib.tracing import traced
+from src.services import vector_service
+from src.services.vector_service import EmbeddingVersion
+
+CACHE_LOOKUPS = metrics.counter(
+    "contact_matrix_cache_lookups",
+    "Contact embedding matrix cache lookups by outcome (hit, miss, stale)",
+    ("outcome",)
+)
+CACHE_BYTES = metrics.gauge("contact_matrix_cache_bytes", "Memory held by cached contact embedding matrices")
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the ``k`` highest scores, best first (ties keep index order)."""
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.arange(0)
+    if k < len(scores):
+        top = np.argpartition(-scores, k - 1)[:k]
+    else:
+        top = np.arange(len(scores))
+    return top[np.argsort(-scores[top], kind="stable")]
+
+class ContactMatrix:
+    """A user's contact embeddings as a row-normalised float32 matrix."""
+
+    __slots__ = ("hr_ids", "matrix", "fingerprint")
+
+    def __init__(self, hr_ids: List[str], embeddings: Sequence, fingerprint: tuple):
+        self.hr_ids = hr_ids
+        self.fingerprint = fingerprint
+        if embeddings:
+            matrix = np.ascontiguousarray(np.vstack(embeddings), dtype=np.float32)
+            norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            matrix /= norms
+        else:
+            matrix = np.zeros((0, config.EMBEDDING_DIMENSIONS), dtype=np.float32)
+        self.matrix = matrix
+
+    @property
+    def nbytes(self) -> int:
+        return self.matrix.nbytes
+
+    def scores(self, vector: Sequence[float]) -> np.ndarray:
+        """Cosine similarity of every contact to ``vector``."""
+        query = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm == 0 or not len(self.hr_ids):
+            return np.zeros(len(self.hr_ids), dtype=np.float32)
+        return self.matrix @ (query / norm)
+
+    def top_k(self, vector: Sequence[float], k: int) -> List[Tuple[str, float]]:
+        """The ``k`` most similar contacts, best first."""
+        scores = self.scores(vector)
+        return [(self.hr_ids[i], float(scores[i])) for i in top_k(scores, k)]
+
+_CacheKey = Tuple[str, EmbeddingVersion]
+
+class _MatrixCache:
+    """LRU cache of ContactMatrix per user and embedding version, bounded by total bytes."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[_CacheKey, ContactMatrix]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    @property
+    def bytes(self) -> int:
+        return self._bytes
+
+    def get(self, key: _CacheKey) -> Optional[ContactMatrix]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key: _CacheKey, entry: ContactMatrix) -> None:
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old.nbytes
+            if entry.nbytes > self.max_bytes:
+                return
+            self._entries[key] = entry
+            self._bytes += entry.nbytes
+            while self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted.nbytes
+
+    def invalidate(self, user_id: str) -> None:
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == user_id]:
+                self._bytes -= self._entries.pop(key).nbytes
+
+_cache = _MatrixCache(int(config.CONTACT_MATRIX_CACHE_MB * 1024 * 1024))
+_loads = SingleFlight("contact_matrix")
+
+CACHE_BYTES.set_function(lambda: {(): _cache.bytes})
+
+def invalidate(user_id: str) -> None:
+    """Drop a user's cached matrices (call after their contacts change)."""
+    _cache.invalidate(str(user_id))
+
+def _load(user_id: str, version: EmbeddingVersion, fingerprint: tuple) -> ContactMatrix:
+    hr_ids, embeddings = vector_service.get_contact_embeddings(user_id, version)
+    entry = ContactMatrix(hr_ids, embeddings, fingerprint)
+    _cache.put((user_id, version), entry)
+    return entry
+
+@traced()
+def get_contact_matrix(user_id: str, version: Optional[EmbeddingVersion] = None) -> ContactMatrix:
+    """A user's contact matrix for one embedding version (default: current), cached while unchanged."""
+    user_id = str(user_id)
+    version = tuple(version or vector_service.current_embedding_version())
+    fingerprint = vector_service.get_contact_embedding_fingerprint(user_id, version)
+    entry = _cache.get((user_id, version))
+    if entry is not None and entry.fingerprint == fingerprint:
+        CACHE_LOOKUPS.inc(outcome="hit")
+        return entry
+    CACHE_LOOKUPS.inc(outcome="miss" if entry is None else "stale")
+    return _loads.do(f"{user_id}:{version}:{fingerprint}", lambda: _load(user_id, version, fingerprint))
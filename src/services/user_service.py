@@ -1,11 +1,14 @@
 """User service for registration and user management."""
 from typing import Optional
 from sqlalchemy.exc import IntegrityError
+import uuid
 
 from src.lib.postgres import get_db   
+from src.lib.tracing import traced
 from src.models.user import User
 from src.models.user import User
 
+@traced()
 def register_user(username: str) -> str:
     """
     Register a new user.
@@ -38,6 +41,7 @@ def register_user(username: str) -> str:
         except IntegrityError:
             raise ValueError("User with this username already exists")
 
+@traced()
 def get_user_by_username(username: str) -> Optional[User]:
     """
     Get user by username.
@@ -54,6 +58,7 @@ def get_user_by_username(username: str) -> Optional[User]:
             db.expunge(user)
         return user
 
+@traced()
 def get_user_by_id(user_id: str) -> Optional[User]:
     """
     Get user by ID.
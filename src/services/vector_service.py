@@ -1,10 +1,68 @@
-"""Vector service for PostgreSQL pgvector operations."""
-from typing import List, Optional, Dict
+"""Vector service for PostgreSQL pgvector operations.
+
+Every stored embedding records the model and version that produced it, and
+embeddings are only ever compared with embeddings of the same version. While
+stored rows are being re-embedded for a new model (see reembedding_service),
+queries run once per active version, so rows not yet migrated stay visible.
+"""
+from typing import List, Optional, Dict, Tuple
 import uuid
 
+from sqlalchemy import and_, func, select, text, union_all
+
+from src.config import config
 from src.lib.postgres import get_db
+from src.lib.tracing import traced
+from src.models.hr import HRContact
 from src.models.resume import Resume
+from src.models.user import User
+from src.services import openai_service
+
+# hnsw.ef_search accepts at most this value
+_MAX_EF_SEARCH = 1000
+
+# (embedding model, embedding version)
+EmbeddingVersion = Tuple[str, int]
+
+def current_embedding_version() -> EmbeddingVersion:
+    """Version new embeddings are written with."""
+    return (config.EMBEDDING_MODEL, config.EMBEDDING_VERSION)
+
+def active_embedding_versions() -> List[EmbeddingVersion]:
+    """Versions queries read: the current one, plus the previous one during a re-embedding."""
+    versions = [current_embedding_version()]
+    if config.EMBEDDING_PREVIOUS_MODEL:
+        previous = (config.EMBEDDING_PREVIOUS_MODEL, config.EMBEDDING_PREVIOUS_VERSION)
+        if previous not in versions:
+            versions.append(previous)
+    return versions
 
+def has_embedding_version(model, version: EmbeddingVersion):
+    """Filter clause for rows of ``model`` whose embedding has ``version``."""
+    return and_(model.embedding_model == version[0], model.embedding_version == version[1])
+
+@traced()
+def embed_query(text: str) -> Dict[EmbeddingVersion, List[float]]:
+    """
+    Embed query text for every active embedding version.
+    
+    Args:
+        text: Text to embed
+        
+    Returns:
+        Dictionary of embedding version to embedding, current version first;
+        one API call per distinct model
+    """
+    by_model: Dict[str, List[float]] = {}
+    embeddings: Dict[EmbeddingVersion, List[float]] = {}
+    for version in active_embedding_versions():
+        model = version[0]
+        if model not in by_model:
+            by_model[model] = openai_service.create_embedding(text, model=model)
+        embeddings[version] = by_model[model]
+    return embeddings
+
+@traced()
 def store_resume_embedding(user_id: str, resume_text: str, embedding: List[float]) -> None:
     """
     Store resume embedding in PostgreSQL with pgvector.
@@ -12,8 +70,9 @@ def store_resume_embedding(user_id: str, resume_text: str, embedding: List[float
     Args:
         user_id: User's UUID
         resume_text: Resume text content
-        embedding: Embedding vector (list of floats)
+        embedding: Embedding vector (list of floats) from the current model
     """
+    model, version = current_embedding_version()
     with get_db() as db:
         # Check if resume already exists
         existing_resume = db.query(Resume).filter(Resume.user_id == user_id).first()
@@ -22,15 +81,20 @@ def store_resume_embedding(user_id: str, resume_text: str, embedding: List[float
             # Update existing resume
             existing_resume.resume_text = resume_text
             existing_resume.resume_embedding = embedding
+            existing_resume.embedding_model = model
+            existing_resume.embedding_version = version
         else:
             # Create new resume
             resume = Resume(
                 user_id=uuid.UUID(user_id),
                 resume_text=resume_text,
-                resume_embedding=embedding
+                resume_embedding=embedding,
+                embedding_model=model,
+                embedding_version=version
             )
             db.add(resume)
 
+@traced()
 def get_resume_by_user_id(user_id: str) -> Optional[Dict]:
     """
     Get resume by user ID.
@@ -48,18 +112,25 @@ def get_resume_by_user_id(user_id: str) -> Optional[Dict]:
             return {
                 "user_id": str(resume.user_id),
                 "resume_text": resume.resume_text,
-                "embedding": resume.resume_embedding
+                "embedding": resume.resume_embedding,
+                "embedding_version": (resume.embedding_model, resume.embedding_version)
             }
         
         return None
 
-def search_similar_resume(embedding: List[float], limit: int = 1) -> Optional[Dict]:
+@traced()
+def search_similar_resume(
+    embedding: List[float],
+    limit: int = 1,
+    version: Optional[EmbeddingVersion] = None
+) -> Optional[Dict]:
     """
     Search for similar resume using vector similarity (cosine distance).
     
     Args:
         embedding: Query embedding vector
         limit: Number of results to return
+        version: Embedding version of ``embedding`` (default: current)
         
     Returns:
         Dictionary with user_id and resume_text, or None if not found
@@ -67,7 +138,9 @@ def search_similar_resume(embedding: List[float], limit: int = 1) -> Optional[Di
     with get_db() as db:
         # Use pgvector's cosine distance operator (<=>)
         # Lower distance = more similar
-        result = db.query(Resume).order_by(
+        result = db.query(Resume).filter(
+            has_embedding_version(Resume, version or current_embedding_version())
+        ).order_by(
             Resume.resume_embedding.cosine_distance(embedding)
         ).limit(limit).first()
         
@@ -78,3 +151,98 @@ def search_similar_resume(embedding: List[float], limit: int = 1) -> Optional[Di
             }
         
         return None
+
+@traced()
+def match_resumes(
+    embeddings: Dict[EmbeddingVersion, List[float]],
+    limit: int = 10,
+    offset: int = 0,
+    max_distance: Optional[float] = None,
+    exclude_user_ids: Optional[List[str]] = None
+) -> List[Dict]:
+    """
+    Find the resumes nearest to an embedding (e.g. a job description's).
+    
+    The HNSW index supplies a candidate pool MATCH_RERANK_FACTOR times the
+    requested page (up to the end of the page), which is then re-sorted by
+    exact cosine distance before filtering and paging, so approximate
+    ordering from the index does not leak into the results. During a
+    re-embedding each active version contributes its own pool.
+    
+    Args:
+        embeddings: Query embedding per embedding version (see embed_query)
+        limit: Page size
+        offset: Number of results to skip
+        max_distance: Drop matches farther than this cosine distance
+        exclude_user_ids: Users to leave out
+        
+    Returns:
+        List of dictionaries with user_id, username and distance, nearest first
+    """
+    pool = min((offset + limit) * max(config.MATCH_RERANK_FACTOR, 1), _MAX_EF_SEARCH)
+    with get_db() as db:
+        # The index scan returns at most ef_search rows, so it must cover the pool
+        db.execute(text(f"SET LOCAL hnsw.ef_search = {int(max(pool, min(config.MATCH_EF_SEARCH, _MAX_EF_SEARCH)))}"))
+        
+        pools = []
+        for version, embedding in embeddings.items():
+            distance = Resume.resume_embedding.cosine_distance(embedding)
+            candidates = select(Resume.user_id.label("user_id"), distance.label("distance")).where(
+                has_embedding_version(Resume, version)
+            )
+            if exclude_user_ids:
+                candidates = candidates.where(Resume.user_id.notin_([uuid.UUID(u) for u in exclude_user_ids]))
+            pools.append(candidates.order_by(distance).limit(pool))
+        candidates = (pools[0] if len(pools) == 1 else union_all(*pools)).subquery()
+        
+        query = db.query(
+            candidates.c.user_id,
+            User.username,
+            candidates.c.distance
+        ).join(User, User.id == candidates.c.user_id)
+        if max_distance is not None:
+            query = query.filter(candidates.c.distance <= max_distance)
+        rows = query.order_by(candidates.c.distance, candidates.c.user_id).offset(offset).limit(limit).all()
+        
+        return [
+            {"user_id": str(user_id), "username": username, "distance": float(dist)}
+            for user_id, username, dist in rows
+        ]
+
+@traced()
+def get_contact_embedding_fingerprint(user_id: str, version: EmbeddingVersion) -> tuple:
+    """
+    Cheap fingerprint of a user's contact embeddings of one version.
+    
+    Changes whenever contacts are added or gain (or are re-embedded into)
+    an embedding of ``version``, so cached copies of the embeddings can be
+    checked without reloading them.
+    """
+    with get_db() as db:
+        return tuple(db.query(
+            func.count(HRContact.id),
+            func.count(HRContact.post_embedding).filter(has_embedding_version(HRContact, version)),
+            func.max(HRContact.created_at)
+        ).filter(HRContact.user_id == user_id).one())
+
+@traced()
+def get_contact_embeddings(user_id: str, version: EmbeddingVersion) -> Tuple[List[str], List]:
+    """
+    Load the post embeddings of one version for all of a user's HR contacts.
+    
+    Plain column reads, so this works without any pgvector index.
+    
+    Args:
+        user_id: User's UUID
+        version: Embedding version to load
+        
+    Returns:
+        (HR contact IDs, embeddings) for contacts that have an embedding of ``version``
+    """
+    with get_db() as db:
+        rows = db.query(HRContact.id, HRContact.post_embedding).filter(
+            HRContact.user_id == user_id,
+            HRContact.post_embedding.isnot(None),
+            has_embedding_version(HRContact, version)
+        ).order_by(HRContact.id).all()
+        return [str(hr_id) for hr_id, _ in rows], [embedding for _, embedding in rows]
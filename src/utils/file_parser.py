@@ -6,6 +6,10 @@ from pathlib import Path
 from PyPDF2 import PdfReader
 from docx import Document
 
+from src.lib import deadline
+from src.lib.errors import DeadlineExceededError
+from src.lib.metrics import timed_stage
+
 
 def extract_text_from_pdf(file: BinaryIO) -> str:
     """
@@ -22,11 +26,15 @@ def extract_text_from_pdf(file: BinaryIO) -> str:
         text_parts = []
         
         for page in pdf_reader.pages:
+            # Large PDFs can take seconds; stop between pages once nobody is waiting
+            deadline.check("pdf parse")
             text = page.extract_text()
             if text:
                 text_parts.append(text)
         
         return "\n\n".join(text_parts).strip()
+    except DeadlineExceededError:
+        raise
     except Exception as e:
         raise ValueError(f"Failed to parse PDF: {str(e)}")
 
@@ -77,6 +85,7 @@ def extract_text_from_txt(file: BinaryIO) -> str:
         raise ValueError(f"Failed to parse TXT: {str(e)}")
 
 
+@timed_stage("file_parse")
 def parse_resume_file(file_content: bytes, filename: str) -> str:
     """
     Parse resume file and extract text content.
@@ -0,0 +1,77 @@
+"""Incremental NDJSON framing for streamed request bodies."""
+import zlib
+from typing import Iterator, Tuple
+
+# Decompressed bytes produced per inflate step, so a small gzip body cannot
+# expand into one huge buffer
+_INFLATE_CHUNK = 1024 * 1024
+
+class NDJSONLineReader:
+    """
+    Split an NDJSON byte stream, optionally gzip-compressed (one or more
+    concatenated members), into lines as it arrives.
+
+    Feed body chunks in order; complete lines come back with their 1-based
+    line number (blank lines are counted but skipped), and only the
+    unfinished last line is buffered.
+
+    Args:
+        gzip: Whether the stream is gzip-compressed
+        max_line_bytes: Longest line accepted
+    """
+
+    def __init__(self, gzip: bool = False, max_line_bytes: int = 1024 * 1024):
+        self._decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS) if gzip else None
+        self._buffer = b""
+        self.max_line_bytes = max_line_bytes
+        self.line_number = 0
+
+    def _split(self, data: bytes) -> Iterator[Tuple[int, bytes]]:
+        self._buffer += data
+        start = 0
+        while True:
+            end = self._buffer.find(b"\n", start)
+            if end < 0:
+                break
+            line = self._buffer[start:end]
+            self.line_number += 1
+            if end - start > self.max_line_bytes:
+                raise ValueError(f"Line {self.line_number} is longer than {self.max_line_bytes} bytes")
+            start = end + 1
+            if line.strip():
+                yield self.line_number, line
+        self._buffer = self._buffer[start:]
+        if len(self._buffer) > self.max_line_bytes:
+            raise ValueError(f"Line {self.line_number + 1} is longer than {self.max_line_bytes} bytes")
+
+    def feed(self, data: bytes) -> Iterator[Tuple[int, bytes]]:
+        """
+        Add body bytes and yield the lines they complete.
+
+        Raises:
+            ValueError: If a line exceeds max_line_bytes
+            zlib.error: If the gzip stream is corrupt
+        """
+        if self._decompressor is None:
+            yield from self._split(data)
+            return
+        while data:
+            yield from self._split(self._decompressor.decompress(data, _INFLATE_CHUNK))
+            if self._decompressor.eof:
+                # Concatenated gzip members (cat a.gz b.gz) continue the same stream
+                data = self._decompressor.unused_data
+                if data:
+                    self._decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+            else:
+                data = self._decompressor.unconsumed_tail
+
+    def close(self) -> Iterator[Tuple[int, bytes]]:
+        """Yield whatever is left once the body has ended (a final line without a newline)."""
+        if self._decompressor is not None:
+            yield from self._split(self._decompressor.flush())
+            if not self._decompressor.eof:
+                raise ValueError("Truncated gzip stream")
+        line, self._buffer = self._buffer, b""
+        if line.strip():
+            self.line_number += 1
+            yield self.line_number, line